@@ -3,28 +3,48 @@
 from celery import shared_task
 from .models import City, PointOfInterest, District
 from django.db import transaction
+from django.conf import settings
 import logging
-from difflib import SequenceMatcher
 from django.db.models import Q
 import requests
 import os
 import time
 import geopy.distance
 import pandas as pd
+import numpy as np
 from shapely.geometry import Point
 import geopandas as gpd
+from .services.dedup.candidates import bulk_update_pois, candidate_to_dict, scan_duplicates, stored_candidates
+from .services.dedup.main_city import comparisons_avoided, find_main_city_matches, plan_main_city_merges
+from .services.dedup.keys import duplicate_key_groups, format_key
+from .services.dedup.distance import distance_meters, max_distance_meters
+from .services.dedup.clusters import merge_duplicate_clusters, resolve_cluster
+from .services.dedup.similarity import similar
+from .services.poi_merge import merge_pois
+from .services.geocoding.cache import cached_responses
+from .services.geocoding.engine import batched
+from .services.geocoding.mapbox import first_feature, forward_request, mapbox_token, reverse_request
+from .services.geocoding.offline import OfflineReverseGeocoder, load_address_points
+from .services.enrichment.osm_cache import load_osm_features, bounding_box_from_points, peak_memory_mb
+from .services.enrichment.osm_changes import apply_osm_changes, pois_near_changes
+from .services.enrichment.osm_matching import rank_match_candidates, pois_to_targets, score_name_matrix
+from .services.enrichment.osm_candidates import save_osm_matches
+from .services.enrichment.osm_details import DETAIL_FIELDS, osm_tags_for_pois, fill_poi_details
+from .services.enrichment.osm_index import match_pois_remote
+from .services.enrichment.osm_parallel import match_pois_parallel
+from .services.enrichment.overpass import match_pois_overpass
 
 logger = logging.getLogger(__name__)
 
-def similar(a, b, threshold=0.85):
-    """Return True if strings a and b are similar enough."""
-    if not a or not b:  # Handle None or empty strings
-        return False
-    return SequenceMatcher(None, a.lower(), b.lower()).ratio() > threshold
+# POIs saved per bulk update while geocoding
+GEOCODING_BATCH_SIZE = 100
 
-def detect_duplicate_pois(poi1, poi2):
+def detect_duplicate_pois(poi1, poi2, distance=None, max_distance=None):
     """
     Check if two POIs are potential duplicates based on various criteria.
+    distance is the pair's distance in metres when already computed in bulk
+    (see dedup.distance.pair_distances); max_distance defaults to
+    settings.DUPLICATE_DISTANCE_METERS.
     Returns (is_duplicate, reasons) tuple.
     """
     reasons = []
@@ -34,13 +54,9 @@ def detect_duplicate_pois(poi1, poi2):
     same_category = poi1['category'] == poi2['category']
 
     # Check coordinates if both POIs have them
-    close_coordinates = False
-    if (poi1['latitude'] and poi1['longitude'] and
-        poi2['latitude'] and poi2['longitude']):
-        # Simple distance check (could be improved with proper geo-distance)
-        lat_diff = abs(poi1['latitude'] - poi2['latitude'])
-        lon_diff = abs(poi1['longitude'] - poi2['longitude'])
-        close_coordinates = lat_diff < 0.001 and lon_diff < 0.001  # Roughly 100m
+    if distance is None:
+        distance = distance_meters(poi1, poi2)
+    close_coordinates = distance is not None and distance <= max_distance_meters(max_distance)
 
     # Check address similarity if both have addresses
     address_similarity = similar(poi1['address'], poi2['address'], threshold=0.85)
@@ -62,171 +78,165 @@ def detect_duplicate_pois(poi1, poi2):
     return is_duplicate, reasons
 
 @shared_task
-def find_all_duplicates(city_id):
+def find_all_duplicates(city_id, full=False, semantic=False):
     """
-    Find potential duplicates by comparing all POIs against each other in the city.
-    Returns a list of potential duplicate pairs with their similarity scores.
+    Find potential duplicates by comparing POIs in the city that share a grid
+    cell or name token (see dedup.blocking), rather than every pair.
+    Pairs are stored as DuplicateCandidate rows, and after the first scan only
+    POIs created or edited since the last scan are compared (see dedup.candidates).
+    With semantic=True, embedding neighbours are also stored and returned
+    separately as semantic_duplicates, for review rather than auto-merging.
+    Returns every stored potential duplicate pair, highest name similarity first.
     """
     try:
         city = City.objects.get(id=city_id)
-        logger.info(f"Starting full duplicate detection for {city.name}")
+        logger.info(f"Starting {'full' if full else 'incremental'} duplicate detection for {city.name}")
 
-        # Get all POIs in the city
-        all_pois = PointOfInterest.objects.filter(
-            city=city
-        ).values('id', 'name', 'category', 'latitude', 'longitude', 'address', 'district__name', 'rank')
-
-        duplicates = []
-        processed = set()  # Track processed pairs to avoid duplicates
-        merged_count = 0
-
-        # Compare each POI against all others
-        for i, poi1 in enumerate(all_pois):
-            for poi2 in list(all_pois)[i+1:]:  # Start from i+1 to avoid self-comparisons and duplicates
-                pair_key = tuple(sorted([poi1['id'], poi2['id']]))
-                if pair_key in processed:
-                    continue
-
-                processed.add(pair_key)
-
-                is_duplicate, reasons = detect_duplicate_pois(poi1, poi2)
-
-                if is_duplicate:
-                    # Add location context to the names
-                    poi1_name = poi1['name']
-                    poi2_name = poi2['name']
-                    if poi1['district__name']:
-                        poi1_name += f" ({poi1['district__name']})"
-                    else:
-                        poi1_name += " (Main City)"
-                    if poi2['district__name']:
-                        poi2_name += f" ({poi2['district__name']})"
-                    else:
-                        poi2_name += " (Main City)"
-
-                    duplicates.append({
-                        'poi1_id': poi1['id'],
-                        'poi1_name': poi1_name,
-                        'poi2_id': poi2['id'],
-                        'poi2_name': poi2_name,
-                        'reason': ' & '.join(reasons)
-                    })
+        scan = scan_duplicates(city, detect_duplicate_pois, full=full, semantic=semantic)
+        duplicates = [candidate_to_dict(candidate) for candidate in stored_candidates(city, source='fuzzy')]
 
         logger.info(f"Found {len(duplicates)} potential duplicate pairs in {city.name}")
 
-        return {
+        result = {
             'status': 'success',
             'message': f'Found {len(duplicates)} potential duplicate pairs',
-            'duplicates': duplicates
+            'duplicates': duplicates,
+            'full_scan': scan.full,
+            'changed_pois': scan.changed_pois,
+            'compared_pairs': scan.compared_pairs
         }
+        if semantic:
+            result['semantic_duplicates'] = [
+                candidate_to_dict(candidate) for candidate in stored_candidates(city, source='semantic')
+            ]
+            result['message'] += f", {len(result['semantic_duplicates'])} semantic neighbour pairs"
+        return result
 
     except Exception as e:
         logger.error(f"Error in find_all_duplicates task: {str(e)}")
         raise
 
+@shared_task
+def find_semantic_duplicates(city_id, full=False):
+    """
+    Find duplicate candidates by name and location and by embedding
+    neighbours (see dedup.semantic), e.g. "British Museum" and "The BM, Great Russell St".
+    """
+    return find_all_duplicates(city_id, full=full, semantic=True)
+
 @shared_task
 def dedup_main_city(city_id):
     """
-    Find potential duplicates by comparing main city POIs against all POIs in the city.
-    Returns a list of potential duplicate pairs with their similarity scores.
+    Merge main city POIs into their duplicates elsewhere in the city.
+    Matches are found by comparing main city POIs only with POIs sharing a
+    blocking cell or name token, then all merges are applied in one batch
+    (see dedup.main_city).
+    Returns the duplicate pairs with their merge status, and comparison stats.
     """
     try:
         city = City.objects.get(id=city_id)
         logger.info(f"Starting main city deduplication for {city.name}")
-
-        # Get POIs in the main city area (no district)
-        main_pois = PointOfInterest.objects.filter(
-            city=city,
-            district__isnull=True
-        ).values('id', 'name', 'category', 'latitude', 'longitude', 'address', 'rank')
+        start_time = time.time()
 
         # Get all POIs in the city (including districts)
-        all_pois = PointOfInterest.objects.filter(
+        all_pois = list(PointOfInterest.objects.filter(
             city=city
-        ).values('id', 'name', 'category', 'latitude', 'longitude', 'address', 'district__name', 'rank')
+        ).values('id', 'name', 'category', 'latitude', 'longitude', 'address', 'district__name', 'rank'))
+        main_count = sum(1 for poi in all_pois if not poi['district__name'])
 
-        duplicates = []
-        processed = set()  # Track processed pairs to avoid duplicates
-        merged_count = 0
+        # Phase one: find every main city match against the blocking index
+        matches, compared = find_main_city_matches(all_pois, detect_duplicate_pois)
 
-        # Compare each main city POI against all POIs
-        for main_poi in main_pois:
-            for other_poi in all_pois:
-                # Skip self-comparisons
-                if main_poi['id'] == other_poi['id']:
-                    continue
+        # Phase two: plan merges against up-to-date values and apply them in one transaction
+        plans = plan_main_city_merges(matches)
+        merges = [(other_poi['id'], main_poi['id'], field_selections)  # Keep the non-main city POI
+                  for (main_poi, other_poi, _), field_selections, _ in plans if field_selections is not None]
+        results = iter(merge_pois(city, merges) if merges else [])
 
-                pair_key = tuple(sorted([main_poi['id'], other_poi['id']]))
-                if pair_key in processed:
-                    continue
-
-                processed.add(pair_key)
-
-                is_duplicate, reasons = detect_duplicate_pois(main_poi, other_poi)
-
-                if is_duplicate:
-                    # Add location context to the names
-                    main_poi_name = main_poi['name'] + " (Main City)"
-                    other_poi_name = other_poi['name']
-                    if other_poi['district__name']:
-                        other_poi_name += f" ({other_poi['district__name']})"
-                    else:
-                        other_poi_name += " (Main City)"
-
-                    # Merge the POIs
-                    merge_data = {
-                        'keep_id': other_poi['id'],  # Keep the non-main city POI
-                        'remove_id': main_poi['id'],  # Remove the main city POI
-                        'field_selections': {
-                            'name': main_poi['name'],  # Take name from main city POI
-                            'district': f"{other_poi['district__name']}, Main City",  # Append Main City to district
-                            'rank': min(main_poi['rank'], other_poi['rank'])  # Take lower rank
-                        }
-                    }
-
-                    merge_status = "❌ Merge not attempted"
-                    try:
-                        # Make request to poi_merge endpoint
-                        response = requests.post(
-                            f'http://localhost:8000/city/{city.name}/poi/merge/',
-                            json=merge_data,
-                            headers={'Content-Type': 'application/json'}
-                        )
-
-                        if response.status_code == 200:
-                            merged_count += 1
-                            merge_status = "✅ Successfully merged"
-                        else:
-                            merge_status = f"❌ Merge failed: {response.text}"
-                    except Exception as e:
-                        logger.error(f"Error merging POIs: {str(e)}")
-                        merge_status = f"❌ Merge error: {str(e)}"
-
-                    duplicates.append({
-                        'poi1_id': main_poi['id'],
-                        'poi1_name': main_poi_name,
-                        'poi2_id': other_poi['id'],
-                        'poi2_name': other_poi_name,
-                        'reason': f"{' & '.join(reasons)} | {merge_status}"
-                    })
-
-        logger.info(f"Found {len(duplicates)} potential duplicate pairs in {city.name}, merged {merged_count}")
+        duplicates = []
+        merged_count = 0
+        for (main_poi, other_poi, reasons), field_selections, skip_reason in plans:
+            if field_selections is None:
+                merge_status = f"❌ Merge failed: {skip_reason}"
+            else:
+                merge_result = next(results)
+                if merge_result['status'] == 'merged':
+                    merged_count += 1
+                    merge_status = "✅ Successfully merged"
+                else:
+                    merge_status = f"❌ Merge failed: {merge_result['message']}"
+
+            # Add location context to the names
+            duplicates.append({
+                'poi1_id': main_poi['id'],
+                'poi1_name': main_poi['name'] + " (Main City)",
+                'poi2_id': other_poi['id'],
+                'poi2_name': f"{other_poi['name']} ({other_poi['district__name'] or 'Main City'})",
+                'reason': f"{' & '.join(reasons)} | {merge_status}"
+            })
+
+        stats = {
+            'main_pois': main_count,
+            'total_pois': len(all_pois),
+            'comparisons': compared,
+            'comparisons_avoided': comparisons_avoided(main_count, len(all_pois), compared),
+            'seconds': round(time.time() - start_time, 2)
+        }
+        logger.info(f"Found {len(duplicates)} potential duplicate pairs in {city.name}, merged {merged_count}; "
+                    f"compared {compared} pairs, avoided {stats['comparisons_avoided']}, in {stats['seconds']}s")
 
         return {
             'status': 'success',
             'message': f'Found {len(duplicates)} potential duplicate pairs for main city POIs, merged {merged_count}',
-            'duplicates': duplicates
+            'duplicates': duplicates,
+            'stats': stats
         }
 
     except Exception as e:
         logger.error(f"Error in dedup_main_city task: {str(e)}")
         raise
 
+def geocode_addresses_offline(pois, pbf_file):
+    """
+    Fill addresses from the nearest OSM address point within settings.OFFLINE_GEOCODING_RADIUS_METERS.
+
+    Args:
+        pois: POIs with coordinates but no address
+        pbf_file: Path to the local OSM PBF file
+
+    Returns:
+        list: The POIs that got an address, already saved
+    """
+    if not os.path.isfile(pbf_file):
+        raise ValueError(f"PBF file not found at path: {pbf_file}")
+    radius = settings.OFFLINE_GEOCODING_RADIUS_METERS
+
+    bounding_box = bounding_box_from_points([poi.latitude for poi in pois], [poi.longitude for poi in pois],
+                                            padding_meters=radius)
+    geocoder = OfflineReverseGeocoder(load_address_points(pbf_file, bounding_box=bounding_box))
+    nearest = geocoder.nearest([poi.latitude for poi in pois], [poi.longitude for poi in pois], radius)
+
+    updated = []
+    for poi, match in zip(pois, nearest):
+        if match:
+            poi.address = match[0][:PointOfInterest._meta.get_field('address').max_length]
+            updated.append(poi)
+    for batch in batched(updated, GEOCODING_BATCH_SIZE):
+        bulk_update_pois(batch, ['address'])
+    logger.info(f"Found {len(updated)}/{len(pois)} addresses within {radius}m in {len(geocoder)} OSM address points")
+    return updated
+
 @shared_task
-def geocode_missing_addresses(city_id):
+def geocode_missing_addresses(city_id, pbf_file=None):
     """
     Find POIs with missing addresses but have coordinates, then use Mapbox to get their addresses.
-    Processes one POI at a time to make the task resumable.
+    Requests run concurrently under the geocoding rate limit (see geocoding.engine), cached
+    answers are reused (see geocoding.cache), and addresses are saved in batches as they
+    arrive so an interrupted run keeps its progress.
+
+    With a PBF file (or settings.OFFLINE_GEOCODING_PBF) addresses are first taken from
+    nearby OSM address points (see geocoding.offline), and only the rest go to Mapbox.
+    If the PBF file cannot be read, every POI goes to Mapbox.
     """
     try:
         city = City.objects.get(id=city_id)
@@ -239,56 +249,54 @@ def geocode_missing_addresses(city_id):
             longitude__isnull=False
         ).filter(Q(address='') | Q(address__isnull=True))
 
-        total_pois = pois.count()
+        pois_by_id = {poi.id: poi for poi in pois}
+        total_pois = len(pois_by_id)
         processed_count = 0
         updated_count = 0
+        offline_count = 0
+        cache_stats = {}
 
-        mapbox_token = os.environ.get('MAPBOX_TOKEN')
-        if not mapbox_token:
-            raise ValueError("MAPBOX_TOKEN environment variable not set")
-
-        for poi in pois:
+        pbf_file = pbf_file or settings.OFFLINE_GEOCODING_PBF
+        if pbf_file and pois_by_id:
             try:
-                # Call Mapbox Reverse Geocoding API
-                response = requests.get(
-                    f'https://api.mapbox.com/geocoding/v5/mapbox.places/{poi.longitude},{poi.latitude}.json',
-                    params={
-                        'access_token': mapbox_token,
-                        'types': 'address',
-                        'limit': 1
-                    }
-                )
-
-                if response.status_code == 200:
-                    data = response.json()
-                    if data['features']:
-                        # Get the first (most relevant) result
-                        feature = data['features'][0]
-
-                        # Update the POI with the new address
-                        poi.address = feature['place_name']
-                        poi.save()
-                        updated_count += 1
-                        logger.info(f"Updated address for POI {poi.name}: {poi.address}")
-                    else:
-                        logger.warning(f"No address found for POI {poi.name} at coordinates {poi.latitude}, {poi.longitude}")
-                else:
-                    logger.error(f"Mapbox API error for POI {poi.name}: {response.text}")
-
+                for poi in geocode_addresses_offline(list(pois_by_id.values()), pbf_file):
+                    del pois_by_id[poi.id]
+                    offline_count += 1
             except Exception as e:
-                logger.error(f"Error processing POI {poi.name}: {str(e)}")
+                # A missing or unreadable extract should not stop the online lookup
+                logger.error(f"Offline address lookup in {pbf_file} failed, using Mapbox for all POIs: {str(e)}")
+            processed_count = updated_count = offline_count
+
+        token = mapbox_token() if pois_by_id else None
+        requests_to_run = [
+            reverse_request(poi.id, poi.latitude, poi.longitude, token) for poi in pois_by_id.values()
+        ]
+        for batch in batched(cached_responses(requests_to_run, cache_stats), GEOCODING_BATCH_SIZE):
+            updated = []
+            for response in batch:
+                poi = pois_by_id[response.key]
+                feature = first_feature(response.data)
+                if response.error:
+                    logger.error(f"Mapbox API error for POI {poi.name}: {response.error}")
+                elif feature:
+                    poi.address = feature['place_name']
+                    updated.append(poi)
+                else:
+                    logger.warning(f"No address found for POI {poi.name} at coordinates {poi.latitude}, {poi.longitude}")
 
-            processed_count += 1
-
-            # Log progress every 10 POIs
-            if processed_count % 10 == 0:
-                logger.info(f"Processed {processed_count}/{total_pois} POIs")
+            bulk_update_pois(updated, ['address'])
+            processed_count += len(batch)
+            updated_count += len(updated)
+            logger.info(f"Processed {processed_count}/{total_pois} POIs, updated {updated_count} addresses")
 
         return {
             'status': 'success',
-            'message': f'Processed {processed_count} POIs, updated {updated_count} addresses',
+            'message': f'Processed {processed_count} POIs, updated {updated_count} addresses '
+                       f'({offline_count} from OSM)',
             'processed_count': processed_count,
-            'updated_count': updated_count
+            'updated_count': updated_count,
+            'offline_count': offline_count,
+            'cache': cache_stats
         }
 
     except Exception as e:
@@ -299,7 +307,9 @@ def geocode_missing_addresses(city_id):
 def geocode_missing_coordinates(city_id):
     """
     Find POIs with missing coordinates but have addresses, then use Mapbox to get their coordinates.
-    Processes one POI at a time to make the task resumable.
+    Requests run concurrently under the geocoding rate limit (see geocoding.engine), cached
+    answers are reused (see geocoding.cache), and coordinates are saved in batches as they
+    arrive so an interrupted run keeps its progress.
     """
     try:
         city = City.objects.get(id=city_id)
@@ -312,13 +322,12 @@ def geocode_missing_coordinates(city_id):
             address__isnull=False
         ).exclude(address='')
 
-        total_pois = pois.count()
+        token = mapbox_token()
+        pois_by_id = {poi.id: poi for poi in pois}
+        total_pois = len(pois_by_id)
         processed_count = 0
         updated_count = 0
-
-        mapbox_token = os.environ.get('MAPBOX_TOKEN')
-        if not mapbox_token:
-            raise ValueError("MAPBOX_TOKEN environment variable not set")
+        cache_stats = {}
 
         # Check if city has valid coordinates for proximity biasing
         has_valid_coords = (
@@ -327,61 +336,38 @@ def geocode_missing_coordinates(city_id):
             -180 <= float(city.longitude) <= 180 and
             -90 <= float(city.latitude) <= 90
         )
-
-        for poi in pois:
-            try:
-                # Construct search query with POI name and address
-                search_text = f"{poi.name}, {poi.address}, {city.name}"
-
-                # Base params
-                params = {
-                    'access_token': mapbox_token,
-                    'limit': 1,
-                    'types': 'address,poi',  # Look for both addresses and points of interest
-                }
-
-                # Add proximity only if city has valid coordinates
-                if has_valid_coords:
-                    params['proximity'] = f"{city.longitude},{city.latitude}"
-
-                # Call Mapbox Forward Geocoding API
-                response = requests.get(
-                    'https://api.mapbox.com/geocoding/v5/mapbox.places/' + search_text + '.json',
-                    params=params
-                )
-
-                if response.status_code == 200:
-                    data = response.json()
-                    if data['features']:
-                        # Get the first (most relevant) result
-                        feature = data['features'][0]
-                        coordinates = feature['geometry']['coordinates']
-
-                        # Update the POI with the new coordinates
-                        poi.longitude = coordinates[0]
-                        poi.latitude = coordinates[1]
-                        poi.save()
-                        updated_count += 1
-                        logger.info(f"Updated coordinates for POI {poi.name}: ({poi.latitude}, {poi.longitude})")
-                    else:
-                        logger.warning(f"No coordinates found for POI {poi.name} with address {poi.address}")
+        proximity = (city.longitude, city.latitude) if has_valid_coords else None
+
+        # Look for both addresses and points of interest, searching with POI name and address
+        requests_to_run = [
+            forward_request(poi.id, f"{poi.name}, {poi.address}, {city.name}", token,
+                            types='address,poi', proximity=proximity)
+            for poi in pois_by_id.values()
+        ]
+        for batch in batched(cached_responses(requests_to_run, cache_stats), GEOCODING_BATCH_SIZE):
+            updated = []
+            for response in batch:
+                poi = pois_by_id[response.key]
+                feature = first_feature(response.data)
+                if response.error:
+                    logger.error(f"Mapbox API error for POI {poi.name}: {response.error}")
+                elif feature:
+                    poi.longitude, poi.latitude = feature['geometry']['coordinates'][:2]
+                    updated.append(poi)
                 else:
-                    logger.error(f"Mapbox API error for POI {poi.name}: {response.text}")
+                    logger.warning(f"No coordinates found for POI {poi.name} with address {poi.address}")
 
-            except Exception as e:
-                logger.error(f"Error processing POI {poi.name}: {str(e)}")
-
-            processed_count += 1
-
-            # Log progress every 10 POIs
-            if processed_count % 10 == 0:
-                logger.info(f"Processed {processed_count}/{total_pois} POIs")
+            bulk_update_pois(updated, ['latitude', 'longitude'])
+            processed_count += len(batch)
+            updated_count += len(updated)
+            logger.info(f"Processed {processed_count}/{total_pois} POIs, updated {updated_count} coordinates")
 
         return {
             'status': 'success',
             'message': f'Processed {processed_count} POIs, updated {updated_count} coordinates',
             'processed_count': processed_count,
-            'updated_count': updated_count
+            'updated_count': updated_count,
+            'cache': cache_stats
         }
 
     except Exception as e:
@@ -398,76 +384,64 @@ def geocode_city_coordinates(city_id):
         city = City.objects.get(id=city_id)
         logger.info(f"Starting city coordinate lookup for {city.name}")
 
-        mapbox_token = os.environ.get('MAPBOX_TOKEN')
-        if not mapbox_token:
-            raise ValueError("MAPBOX_TOKEN environment variable not set")
+        token = mapbox_token()
 
-        # Construct search query with city name and country
+        # Construct search query with city name and country, limited to cities/places
         search_text = f"{city.name}, {city.country}" if city.country else city.name
+        response = list(cached_responses([forward_request(city.id, search_text, token, types='place')]))[0]
 
-        # Call Mapbox Forward Geocoding API
-        response = requests.get(
-            'https://api.mapbox.com/geocoding/v5/mapbox.places/' + search_text + '.json',
-            params={
-                'access_token': mapbox_token,
-                'limit': 1,
-                'types': 'place',  # Limit to cities/places
+        if response.error:
+            logger.error(f"Mapbox API error for city {city.name}: {response.error}")
+            return {
+                'status': 'error',
+                'message': f'API error: {response.error}'
             }
-        )
 
-        if response.status_code == 200:
-            data = response.json()
-            if data['features']:
-                # Get the first (most relevant) result
-                feature = data['features'][0]
-                coordinates = feature['geometry']['coordinates']
-
-                # Update the city with the new coordinates
-                city.longitude = coordinates[0]
-                city.latitude = coordinates[1]
-
-                # If country wasn't set, get it from the context
-                if not city.country:
-                    for context in feature.get('context', []):
-                        if context.get('id', '').startswith('country.'):
-                            city.country = context['text']
-                            break
-
-                city.save()
-                logger.info(f"Updated coordinates for {city.name}: ({city.latitude}, {city.longitude})")
-
-                return {
-                    'status': 'success',
-                    'message': f'Updated coordinates for {city.name}',
-                    'coordinates': {
-                        'latitude': city.latitude,
-                        'longitude': city.longitude
-                    },
-                    'country': city.country
-                }
-            else:
-                logger.warning(f"No coordinates found for city {city.name}")
-                return {
-                    'status': 'warning',
-                    'message': f'No coordinates found for {city.name}'
-                }
-        else:
-            logger.error(f"Mapbox API error for city {city.name}: {response.text}")
+        feature = first_feature(response.data)
+        if not feature:
+            logger.warning(f"No coordinates found for city {city.name}")
             return {
-                'status': 'error',
-                'message': f'API error: {response.text}'
+                'status': 'warning',
+                'message': f'No coordinates found for {city.name}'
             }
 
+        # Update the city with the new coordinates
+        city.longitude, city.latitude = feature['geometry']['coordinates'][:2]
+
+        # If country wasn't set, get it from the context
+        if not city.country:
+            for context in feature.get('context', []):
+                if context.get('id', '').startswith('country.'):
+                    city.country = context['text']
+                    break
+
+        city.save()
+        logger.info(f"Updated coordinates for {city.name}: ({city.latitude}, {city.longitude})")
+
+        return {
+            'status': 'success',
+            'message': f'Updated coordinates for {city.name}',
+            'coordinates': {
+                'latitude': city.latitude,
+                'longitude': city.longitude
+            },
+            'country': city.country
+        }
+
     except Exception as e:
         logger.error(f"Error in geocode_city_coordinates task: {str(e)}")
         raise
 
 @shared_task
-def fetch_osm_ids(city_id):
+def fetch_osm_ids(city_id, tiled=False):
     """
     Find POIs without OSM IDs and try to match them using Overpass API.
-    Searches for POIs within 5 meters of our coordinates.
-    Processes one POI at a time to make the task resumable.
+
+    By default searches for POIs within 5 meters of our coordinates, one POI at
+    a time, which makes the task resumable but needs a query per POI. With
+    tiled=True (task arguments {"tiled": true}) the city's POI extent is split
+    into tiles, each tile is fetched with one bbox query, and POIs are matched
+    locally with the same distance and name rules as find_osm_ids_local.
     """
     try:
         city = City.objects.get(id=city_id)
@@ -481,12 +455,15 @@ def fetch_osm_ids(city_id):
             longitude__isnull=False
         )
 
+        if tiled:
+            return _fetch_osm_ids_tiled(list(pois))
+
         total_pois = pois.count()
         processed_count = 0
         updated_count = 0
 
         # Overpass API endpoint
-        overpass_url = "https://overpass-api.de/api/interpreter"
+        overpass_url = settings.OVERPASS_URL
 
         for poi in pois:
             try:
@@ -541,53 +518,41 @@ def fetch_osm_ids(city_id):
         logger.error(f"Error in fetch_osm_ids task: {str(e)}")
         raise
 
-def load_osm_data_from_pbf(pbf_file):
+def _fetch_osm_ids_tiled(pois):
+    """Match POIs to OSM features with one Overpass query per tile and save the OSM IDs and candidates in bulk."""
+    candidates, stats = match_pois_overpass(pois_to_targets(pois))
+    matched_pois = save_osm_matches(pois, candidates, source='overpass')
+
+    return {
+        'status': 'success',
+        'message': f'Processed {len(pois)} POIs in {stats["tiles"]} tiles, updated {len(matched_pois)} with OSM IDs',
+        'processed_count': len(pois),
+        'updated_count': len(matched_pois),
+        **stats
+    }
+
+
+def load_osm_data_from_pbf(pbf_file, bounding_box=None):
     """
     Load OSM data from PBF file including POIs and buildings, with preprocessing.
+    The parsed and projected features are cached on disk (see osm_cache), so only
+    the first call for a given extract parses the PBF.
     
     Args:
         pbf_file: Path to the local OSM PBF file
+        bounding_box: Optional (min_lon, min_lat, max_lon, max_lat) to clip the data to
         
     Returns:
         tuple: (osm_pois_4326, osm_pois_3857) - OSM data in WGS84 and Web Mercator projections
     """
-    from pyrosm import OSM
-    import pandas as pd
-    
-    # Initialize Pyrosm and load the data
-    logger.info("Loading OSM data with Pyrosm...")
-    osm = OSM(pbf_file)
-
-    # Load multiple types of OSM data
-    osm_pois = osm.get_pois()
-    logger.info(f"Loaded {len(osm_pois)} POIs from OSM")
-
-    # Also load buildings which might contain POIs
-    try:
-        osm_buildings = osm.get_buildings()
-        logger.info(f"Loaded {len(osm_buildings)} buildings from OSM")
-        # Combine POIs and buildings
-        osm_pois = pd.concat([osm_pois, osm_buildings], ignore_index=True)
-        logger.info(f"Combined total: {len(osm_pois)} OSM features")
-    except Exception as e:
-        logger.warning(f"Could not load buildings: {e}")
-
-    # Remove duplicates based on ID if any and reset indices
-    osm_pois = osm_pois.drop_duplicates(subset=['id'], keep='first').reset_index(drop=True)
-
-    # Ensure OSM POIs are in WGS 84
-    osm_pois = osm_pois.to_crs("EPSG:4326")
-
-    # Pre-project OSM data to Web Mercator for efficient distance calculations
-    logger.info("Projecting OSM data to Web Mercator for distance calculations...")
-    osm_projected = osm_pois.to_crs("EPSG:3857")
-    
-    return osm_pois, osm_projected
+    return load_osm_features(pbf_file, bounding_box=bounding_box)
 
 
 def find_best_name_match_from_nearby(poi_name, nearby_osm_pois, threshold=60):
     """
     Given multiple nearby OSM POIs, find the one with the best name match using thefuzz fuzzy matching.
+    All candidates and name fields are scored in one batch (see score_name_matrix);
+    the first candidate with the highest score wins.
 
     Args:
         poi_name: Name of the target POI
@@ -596,40 +561,37 @@ def find_best_name_match_from_nearby(poi_name, nearby_osm_pois, threshold=60):
 
     Returns the best matching row or None if no good match found.
     """
-    from thefuzz import fuzz
-    import pandas as pd
-
-    if poi_name is None or poi_name.strip() == "":
+    if poi_name is None or poi_name.strip() == "" or len(nearby_osm_pois) == 0:
         return None
 
-    poi_name_clean = poi_name.strip()
-
-    # Name fields to check in order of preference
-    name_fields = ['name', 'name:en', 'brand', 'addr:housename']
+    scores = score_name_matrix([poi_name], nearby_osm_pois)[0]
+    best = int(np.argmax(scores))
+    if scores[best] > 0 and scores[best] >= threshold:
+        return nearby_osm_pois.iloc[best]
+    return None
 
-    best_score = 0
-    best_match = None
 
-    # For each OSM POI, calculate the best score across all its name fields
-    for idx in nearby_osm_pois.index:
-        osm_poi = nearby_osm_pois.loc[idx]
-        poi_best_score = 0
+def find_osm_features_within(osm_projected, target_point_projected, radius_meters):
+    """
+    Find OSM features within a radius of a projected point using a spatial index.
 
-        # Check each name field for this POI
-        for field in name_fields:
-            if field in osm_poi and pd.notna(osm_poi[field]):
-                osm_name = str(osm_poi[field]).strip()
-                if osm_name:  # Only process non-empty names
-                    # Use token_sort_ratio for better handling of word order differences
-                    score = fuzz.token_sort_ratio(poi_name_clean, osm_name)
-                    poi_best_score = max(poi_best_score, score)
+    The STRtree behind osm_projected.sindex is built on first use and cached by
+    geopandas on the frame, so each lookup costs a tree query plus distances to
+    the few candidates it returns, instead of a distance to every feature.
 
-        # Update global best if this POI's score is better
-        if poi_best_score > best_score and poi_best_score >= threshold:
-            best_score = poi_best_score
-            best_match = osm_poi
+    Args:
+        osm_projected: GeoDataFrame of OSM POIs in EPSG:3857
+        target_point_projected: Target point geometry (EPSG:3857)
+        radius_meters: Search radius in meters
 
-    return best_match if best_score >= threshold else None
+    Returns:
+        tuple: (positions, distances) - integer positions into osm_projected in
+        ascending order, and the matching distances in meters
+    """
+    positions = osm_projected.sindex.query(target_point_projected, predicate='dwithin', distance=radius_meters)
+    positions = np.sort(positions)
+    distances = osm_projected.geometry.iloc[positions].distance(target_point_projected).to_numpy()
+    return positions, distances
 
 
 def find_closest_osm_poi_optimized(target_point_projected, osm_pois, osm_projected, radius_meters=20, poi_name=None):
@@ -649,18 +611,15 @@ def find_closest_osm_poi_optimized(target_point_projected, osm_pois, osm_project
     import pandas as pd
 
     try:
-        # Calculate distances in meters using pre-projected data
-        distances = osm_projected.geometry.distance(target_point_projected)
+        # Only measure distances to features the spatial index places within the radius
+        positions, distances = find_osm_features_within(osm_projected, target_point_projected, radius_meters)
 
-        # Filter by radius
-        within_radius_mask = distances <= radius_meters
-
-        if not within_radius_mask.any():
+        if len(positions) == 0:
             return None, None, None
 
         # Get nearby POIs from original (unprojected) data for tag extraction
-        nearby = osm_pois[within_radius_mask].copy()
-        nearby['distance_meters'] = distances[within_radius_mask]
+        nearby = osm_pois.iloc[positions].copy()
+        nearby['distance_meters'] = distances
 
         # Filter to only include nodes and ways (exclude relations)
         if 'osm_type' in nearby.columns:
@@ -787,15 +746,49 @@ def find_closest_osm_poi(poi_lat, poi_lon, osm_pois, osm_projected, radius_meter
         return None, None, None
 
 
+def match_osm_ids(targets, pbf_file, bounding_box=None):
+    """
+    Match POIs to OSM features, through the shared OSM index server when
+    settings.OSM_INDEX_URL is set, otherwise by loading the features in this process.
+
+    Args:
+        targets: DataFrame with poi_id, name, latitude and longitude columns
+        pbf_file: Path to the local OSM PBF file
+        bounding_box: Optional (min_lon, min_lat, max_lon, max_lat) to load OSM data for
+
+    Returns:
+        DataFrame of ranked candidates (poi_id, rank, osm_id, distance, score, tags),
+        rank 0 being the match
+    """
+    index_url = settings.OSM_INDEX_URL
+    if index_url:
+        try:
+            return match_pois_remote(index_url, pbf_file, targets, bounding_box)
+        except requests.RequestException as e:
+            logger.warning(f"OSM index at {index_url} unavailable, matching in-process: {e}")
+
+    osm_pois, osm_projected = load_osm_data_from_pbf(pbf_file, bounding_box)
+    return rank_match_candidates(targets, osm_pois, osm_projected)
+
+
 @shared_task
-def find_osm_ids_local(city_id, pois=None, pbf_file=None):
+def find_osm_ids_local(city_id, pois=None, pbf_file=None, bounding_box=None, max_workers=1):
     """
     Find POIs without OSM IDs by searching a local OSM PBF file using Pyrosm.
-    Searches for nodes within 5 meters of each POI's coordinates.
+    Matches all POIs in one batch against nodes and ways within 20 meters.
+    With max_workers > 1 the matching runs in a process pool and this process
+    writes all the results.
 
     Args:
         city_id: ID of the city to process
+        pois: POIs to match (list or queryset)
         pbf_file: Path to the local OSM PBF file
+        bounding_box: (min_lon, min_lat, max_lon, max_lat) to load OSM data for.
+            Defaults to the extent of the given POIs; pass the same box for every
+            chunk of a city so they share one cache entry.
+        max_workers: Number of processes to match with. Process pools cannot be
+            started from Celery's prefork workers, so only raise this when calling
+            from the Prefect flow or a script.
     """
     try:
         if not pbf_file:
@@ -805,8 +798,6 @@ def find_osm_ids_local(city_id, pois=None, pbf_file=None):
         if not os.path.isfile(pbf_file):
             raise ValueError(f"PBF file not found at path: {pbf_file}")
 
-        from pyrosm import OSM
-
         city = City.objects.get(id=city_id)
         logger.info(f"Starting local OSM ID lookup for {city.name} using PBF file: {pbf_file}")
 
@@ -825,123 +816,176 @@ def find_osm_ids_local(city_id, pois=None, pbf_file=None):
 
         logger.info(f"Found {total_pois} POIs to process in {city.name}")
 
-        # Load OSM data
-        osm_pois, osm_projected = load_osm_data_from_pbf(pbf_file)
-
-        # Process each POI
-        processed_count = 0
-        updated_count = 0
+        pois = list(pois)
+        if bounding_box is None:
+            bounding_box = bounding_box_from_points(
+                [poi.latitude for poi in pois], [poi.longitude for poi in pois]
+            )
+
+        # Match every POI in one spatial join (20m radius, best name match wins)
+        parallel_stats = None
+        if max_workers > 1 and not settings.OSM_INDEX_URL:
+            candidates, parallel_stats = match_pois_parallel(
+                pois_to_targets(pois), pbf_file, bounding_box, max_workers=max_workers
+            )
+        else:
+            candidates = match_osm_ids(pois_to_targets(pois), pbf_file, bounding_box)
 
-        logger.info(f"Found {len(pois)} POIs to process in {city.name}")
+        # Save the winners as osm_id and keep the top candidates for later review
+        matched_pois = save_osm_matches(pois, candidates, source='pbf')
 
-        # Pre-compute all target projections to avoid repeated coordinate transformations
-        logger.info("Pre-computing POI coordinate projections...")
-        poi_coords = [(poi.latitude, poi.longitude, poi.name, poi.id) for poi in pois]
+        processed_count = len(pois)
+        updated_count = len(matched_pois)
 
-        from shapely.geometry import Point
-        import geopandas as gpd
+        logger.info(f"\nTask complete for {city.name}:")
+        logger.info(f"- Total POIs processed: {processed_count}")
+        logger.info(f"- POIs updated with OSM IDs: {updated_count}")
+        logger.info(f"- POIs without matches: {processed_count - updated_count}")
+        logger.info(f"- Peak memory: {peak_memory_mb()} MB")
 
-        # Create all target points at once
-        target_points = [Point(lon, lat) for lat, lon, name, poi_id in poi_coords]
-        target_gdf = gpd.GeoDataFrame(
-            {"geometry": target_points, "poi_name": [name for lat, lon, name, poi_id in poi_coords], "poi_id": [poi_id for lat, lon, name, poi_id in poi_coords]},
-            crs="EPSG:4326"
-        )
-        target_projected = target_gdf.to_crs("EPSG:3857")
+        result = {
+            'status': 'success',
+            'message': f'Processed {processed_count} POIs, updated {updated_count} with OSM IDs',
+            'processed_count': processed_count,
+            'updated_count': updated_count,
+            'peak_memory_mb': peak_memory_mb()
+        }
+        if parallel_stats:
+            logger.info(f"- Speed-up: {parallel_stats['speedup']}x on {parallel_stats['workers']} workers")
+            result.update(parallel_stats)
+        return result
 
-        for i, poi in enumerate(pois):
-            try:
-                # Use pre-computed projection for this POI
-                target_point_projected = target_projected.iloc[i]
+    except Exception as e:
+        logger.error(f"Error in find_osm_ids_local task: {str(e)}")
+        raise
 
-                # Single search with 20m radius (prioritizes closer matches and better name matches)
-                osm_id_string, distance_meters, tags = find_closest_osm_poi_optimized(
-                    target_point_projected.geometry, osm_pois, osm_projected, poi_name=poi.name
-                )
+@shared_task
+def fill_details_from_osm(city_id, pbf_file=None):
+    """
+    Fill empty hours, phone, website and address fields of POIs matched to OSM
+    from the tags of their matched features, saving all changes in bulk.
 
-                if osm_id_string:
-                    # Update the POI
-                    poi.osm_id = osm_id_string
-                    poi.save()
-                    updated_count += 1
+    Args:
+        city_id: ID of the city to process
+        pbf_file: Optional PBF file to look up POIs matched before candidates were stored
+    """
+    try:
+        city = City.objects.get(id=city_id)
+        logger.info(f"Filling POI details from OSM tags for {city.name}")
 
-            except Exception as e:
-                logger.error(f"Error processing POI {poi.name}: {str(e)}")
+        missing_details = Q()
+        for field in DETAIL_FIELDS:
+            missing_details |= Q(**{f'{field}__isnull': True}) | Q(**{field: ''})
+        pois = list(PointOfInterest.objects.filter(city=city, osm_id__isnull=False).filter(missing_details))
 
-            processed_count += 1
-            if processed_count % 100 == 0:
-                logger.info(f"Progress: {processed_count}/{total_pois} POIs processed, {updated_count} matches found")
+        tags_by_poi = osm_tags_for_pois(pois, pbf_file)
+        updated_pois, filled = fill_poi_details(pois, tags_by_poi)
 
-        logger.info(f"\nTask complete for {city.name}:")
-        logger.info(f"- Total POIs processed: {processed_count}")
-        logger.info(f"- POIs updated with OSM IDs: {updated_count}")
-        logger.info(f"- POIs without matches: {processed_count - updated_count}")
+        logger.info(f"Filled details for {len(updated_pois)}/{len(pois)} POIs in {city.name}: {filled}")
 
         return {
             'status': 'success',
-            'message': f'Processed {processed_count} POIs, updated {updated_count} with OSM IDs',
-            'processed_count': processed_count,
-            'updated_count': updated_count
+            'message': f'Processed {len(pois)} POIs, updated {len(updated_pois)} from OSM tags',
+            'processed_count': len(pois),
+            'updated_count': len(updated_pois),
+            'filled': filled
         }
 
     except Exception as e:
-        logger.error(f"Error in find_osm_ids_local task: {str(e)}")
+        logger.error(f"Error in fill_details_from_osm task: {str(e)}")
         raise
 
 @shared_task
-def find_duplicate_keys(city_id):
+def refresh_osm_from_changes(city_id, pbf_file=None, change_files=None):
     """
-    Find POIs with duplicate keys, where key is {name}-{latitude}-{longitude}.
-    Only considers POIs that have both latitude and longitude.
+    Apply OsmChange (.osc.gz) files to the cached OSM features of a PBF extract
+    and re-match only the city's POIs near a feature that changed.
+
+    The features are reloaded in this process rather than through the OSM index
+    server, since a running server still holds the features from before the update.
+
+    Args:
+        city_id: ID of the city to process
+        pbf_file: Path to the local OSM PBF file the cache was built from
+        change_files: Paths to .osc or .osc.gz files, oldest first
     """
     try:
+        if not pbf_file:
+            raise ValueError("No PBF file path provided")
+        if not change_files:
+            raise ValueError("No change files provided")
+
         city = City.objects.get(id=city_id)
-        logger.info(f"Starting duplicate key detection for {city.name}")
+        logger.info(f"Applying {len(change_files)} OSM change files to the cache of {pbf_file} for {city.name}")
 
-        # Get POIs with coordinates
-        pois = PointOfInterest.objects.filter(
+        changed = apply_osm_changes(pbf_file, change_files)
+
+        pois = list(PointOfInterest.objects.filter(
             city=city,
             latitude__isnull=False,
             longitude__isnull=False
-        ).values('id', 'name', 'latitude', 'longitude', 'category', 'district__name')
+        ))
+        affected_ids = set(pois_near_changes(pois_to_targets(pois), changed))
+        affected = [poi for poi in pois if poi.id in affected_ids]
 
-        # Group POIs by their key
-        poi_groups = {}
-        for poi in pois:
-            # Format coordinates to fixed precision to avoid floating point issues
-            lat = "{:.6f}".format(float(poi['latitude']))
-            lon = "{:.6f}".format(float(poi['longitude']))
-            name = str(poi['name'] or '')
+        matched_pois = []
+        if affected:
+            bounding_box = bounding_box_from_points(
+                [poi.latitude for poi in affected], [poi.longitude for poi in affected]
+            )
+            osm_pois, osm_projected = load_osm_data_from_pbf(pbf_file, bounding_box)
+            candidates = rank_match_candidates(pois_to_targets(affected), osm_pois, osm_projected)
+            matched_pois = save_osm_matches(affected, candidates, source='pbf')
+
+        logger.info(f"{len(changed)} changed OSM features, re-matched {len(affected)}/{len(pois)} POIs in {city.name}")
+
+        return {
+            'status': 'success',
+            'message': f'Re-matched {len(affected)} POIs near {len(changed)} changed OSM features, '
+                       f'{len(matched_pois)} with OSM IDs',
+            'changed_features': len(changed),
+            'processed_count': len(affected),
+            'updated_count': len(matched_pois)
+        }
 
-            key = f"{name}-{lat}-{lon}"
-            if key not in poi_groups:
-                poi_groups[key] = []
-            poi_groups[key].append(poi)
+    except Exception as e:
+        logger.error(f"Error in refresh_osm_from_changes task: {str(e)}")
+        raise
+
+@shared_task
+def find_duplicate_keys(city_id):
+    """
+    Find POIs with duplicate keys, where key is {name}-{latitude}-{longitude}.
+    Only considers POIs that have both latitude and longitude. Keys are grouped
+    by the database (see dedup.keys), so only duplicate POIs are loaded.
+    """
+    try:
+        city = City.objects.get(id=city_id)
+        logger.info(f"Starting duplicate key detection for {city.name}")
 
-        # Find groups with duplicates
+        # Group by key in the database and only fetch the members of duplicate groups
         duplicates = []
-        for key, group in poi_groups.items():
-            if len(group) > 1:
-                # Format POI info for display
-                poi_list = []
-                for poi in group:
-                    poi_name = str(poi['name'] or '')
-                    district = str(poi['district__name'] or 'Main City')
-
-                    poi_list.append({
-                        'id': int(poi['id']),
-                        'name': f"{poi_name} ({district})",
-                        'category': str(poi['category'] or ''),
-                        'latitude': "{:.6f}".format(float(poi['latitude'])),
-                        'longitude': "{:.6f}".format(float(poi['longitude']))
-                    })
-
-                duplicates.append({
-                    'key': key,
-                    'count': len(group),
-                    'pois': poi_list
+        for group in duplicate_key_groups(city):
+            # Format POI info for display
+            poi_list = []
+            for poi in group:
+                poi_name = str(poi['name'] or '')
+                district = str(poi['district__name'] or 'Main City')
+
+                poi_list.append({
+                    'id': int(poi['id']),
+                    'name': f"{poi_name} ({district})",
+                    'category': str(poi['category'] or ''),
+                    'latitude': "{:.6f}".format(float(poi['latitude'])),
+                    'longitude': "{:.6f}".format(float(poi['longitude']))
                 })
 
+            duplicates.append({
+                'key': format_key(group[0]),
+                'count': len(group),
+                'pois': poi_list
+            })
+
         logger.info(f"Found {len(duplicates)} duplicate key groups in {city.name}")
 
         return {
@@ -959,6 +1003,7 @@ def auto_merge_duplicates(city_id, duplicates_data=None):
     """
     Automatically merge general duplicate POIs using best-value logic.
     Uses provided duplicates data or calls find_all_duplicates if not provided.
+    Overlapping pairs are grouped into clusters, and each cluster is merged in one transaction.
     """
     try:
         city = City.objects.get(id=city_id)
@@ -979,64 +1024,22 @@ def auto_merge_duplicates(city_id, duplicates_data=None):
             duplicates = duplicates_result.get('duplicates', [])
 
         total_pairs = len(duplicates)
-        merged_count = 0
-        errors = []
-
         logger.info(f"Found {total_pairs} duplicate pairs to process")
 
-        for i, duplicate_pair in enumerate(duplicates, 1):
-            try:
-                poi1_id = duplicate_pair['poi1_id']
-                poi2_id = duplicate_pair['poi2_id']
-
-                logger.info(f"Processing pair {i}/{total_pairs}: {duplicate_pair['poi1_name']} ↔ {duplicate_pair['poi2_name']}")
-
-                # Get full POI data
-                poi1 = PointOfInterest.objects.get(id=poi1_id)
-                poi2 = PointOfInterest.objects.get(id=poi2_id)
-
-                # Determine which POI to keep and which to remove using best-value logic
-                keep_poi, remove_poi, field_selections = _determine_best_merge(poi1, poi2)
-
-                # Prepare merge data
-                merge_data = {
-                    'keep_id': keep_poi.id,
-                    'remove_id': remove_poi.id,
-                    'field_selections': field_selections
-                }
-
-                # Make request to poi_merge endpoint
-                response = requests.post(
-                    f'http://localhost:8000/city/{city.name}/poi/merge/',
-                    json=merge_data,
-                    headers={'Content-Type': 'application/json'}
-                )
-
-                if response.status_code == 200:
-                    merged_count += 1
-                    logger.info(f"✅ Successfully merged {remove_poi.name} into {keep_poi.name}")
-                else:
-                    error_msg = f"❌ Merge failed for POIs {poi1_id}/{poi2_id}: {response.text}"
-                    logger.error(error_msg)
-                    errors.append(error_msg)
-
-            except PointOfInterest.DoesNotExist as e:
-                error_msg = f"❌ POI not found for pair {poi1_id}/{poi2_id}: {str(e)}"
-                logger.error(error_msg)
-                errors.append(error_msg)
-            except Exception as e:
-                error_msg = f"❌ Error processing pair {poi1_id}/{poi2_id}: {str(e)}"
-                logger.error(error_msg)
-                errors.append(error_msg)
+        # Merge connected pairs (A~B, B~C) as one cluster, so no merge refers to a deleted POI
+        result = merge_duplicate_clusters(
+            city, [(pair['poi1_id'], pair['poi2_id']) for pair in duplicates]
+        )
 
-        logger.info(f"Auto-merge complete for {city.name}: merged {merged_count}/{total_pairs} pairs")
+        logger.info(f"Auto-merge complete for {city.name}: merged {result['merged_count']} POIs "
+                    f"in {result['cluster_count']} clusters from {total_pairs} pairs")
 
         return {
             'status': 'success',
-            'message': f'Processed {total_pairs} duplicate pairs, successfully merged {merged_count}',
+            'message': f'Processed {total_pairs} duplicate pairs in {result["cluster_count"]} clusters, '
+                       f'merged {result["merged_count"]} POIs',
             'total_pairs': total_pairs,
-            'merged_count': merged_count,
-            'errors': errors
+            **result
         }
 
     except Exception as e:
@@ -1052,77 +1055,12 @@ def _determine_best_merge(poi1, poi2):
     Returns:
         tuple: (keep_poi, remove_poi, field_selections)
     """
+    keep_poi, remove_pois, field_selections = resolve_cluster([poi1, poi2])
 
-    # Start with poi1 as default keeper
-    keep_poi = poi1
-    remove_poi = poi2
-    field_selections = {}
-
-    # Helper function to choose better value
-    def choose_better_value(val1, val2, field_name):
-        # Non-null wins over null
-        if val1 and not val2:
-            return val1
-        if val2 and not val1:
-            return val2
-
-        # If both are null or both are non-null
-        if not val1 and not val2:
-            return val1  # Both null, doesn't matter
-
-        # Both have values - apply field-specific logic
-        if field_name == 'rank':
-            # Lower rank (number) is better
-            return min(val1, val2) if val1 is not None and val2 is not None else (val1 or val2)
-        elif field_name in ['description', 'address', 'hours']:
-            # Longer text is usually better
-            str1 = str(val1 or '')
-            str2 = str(val2 or '')
-            return val1 if len(str1) >= len(str2) else val2
-        else:
-            # For other fields, prefer poi1's value (arbitrary but consistent)
-            return val1
-
-    # Determine best values for each field
-    fields_to_compare = [
-        'name', 'category', 'sub_category', 'description',
-        'latitude', 'longitude', 'address', 'phone',
-        'website', 'hours', 'rank'
-    ]
-
-    for field in fields_to_compare:
-        val1 = getattr(poi1, field, None)
-        val2 = getattr(poi2, field, None)
-
-        best_val = choose_better_value(val1, val2, field)
-
-        # If the best value comes from the remove_poi, we need to update field_selections
-        if best_val == val2:
-            field_selections[field] = best_val
-
-    # Handle district separately (it's a ForeignKey)
-    district1 = poi1.district
-    district2 = poi2.district
-
-    # Prefer non-null district, or keep poi1's district
-    if district2 and not district1:
-        field_selections['district'] = district2.name
-    elif district1 and district2 and district1 != district2:
-        # Both have districts - this is a judgment call, keep poi1's
-        pass
-
-    # Handle coordinates as a pair
-    if poi1.latitude and poi1.longitude and (not poi2.latitude or not poi2.longitude):
-        # poi1 has complete coordinates, poi2 doesn't
-        pass
-    elif poi2.latitude and poi2.longitude and (not poi1.latitude or not poi1.longitude):
-        # poi2 has complete coordinates, poi1 doesn't
-        field_selections['coordinates'] = f"{poi2.latitude},{poi2.longitude}"
-
-    logger.info(f"Merge decision: keeping POI {keep_poi.id} ({keep_poi.name}), removing POI {remove_poi.id} ({remove_poi.name})")
+    logger.info(f"Merge decision: keeping POI {keep_poi.id} ({keep_poi.name}), removing POI {remove_pois[0].id} ({remove_pois[0].name})")
     logger.info(f"Field selections: {field_selections}")
 
-    return keep_poi, remove_poi, field_selections
+    return keep_poi, remove_pois[0], field_selections
 
 
 # Data transformation tasks will be added here
@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand
+from collections import Counter
+from itertools import combinations
+import random
+import time
+from cities.enrich_tasks import detect_duplicate_pois
+from cities.services.dedup.blocking import MAX_NAME_BLOCK_SIZE, candidate_pairs, name_tokens
+
+WORDS = ['Red', 'Lion', 'Cafe', 'Nero', 'Pub', 'Kings', 'Arms', 'Museum', 'Tower', 'Bridge', 'Market', 'Garden',
+         'Royal', 'Oak', 'Crown', 'Anchor', 'Star', 'Bell', 'Swan', 'Rose', 'Plough', 'George', 'Castle', 'Hall']
+
+
+def synthetic_pois(count, rng):
+    """Scatter POIs with random names over a city-sized area (about 30km square)."""
+    pois = []
+    for poi_id in range(count):
+        has_coordinates = rng.random() > 0.1
+        pois.append({
+            'id': poi_id,
+            'name': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))) + f" {rng.randint(1, count)}",
+            'category': rng.choice(['see', 'eat', 'drink', 'shop', 'sleep']),
+            'latitude': 51.5 + rng.uniform(-0.135, 0.135) if has_coordinates else None,
+            'longitude': -0.12 + rng.uniform(-0.22, 0.22) if has_coordinates else None,
+            'address': f"{rng.randint(1, 200)} High Street" if rng.random() > 0.5 else None,
+        })
+    return pois
+
+
+# Example: python manage.py benchmark_duplicates --sizes 1000 5000 20000 --all-pairs-limit 2000
+# Recall is only checked against all pairs up to --all-pairs-limit, so the output says how many
+# name blocks were split at each size; lower --max-block-size to check splitting on small sizes
+class Command(BaseCommand):
+    help = 'Times blocking-based duplicate detection on synthetic cities of growing size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 2000, 5000, 10000],
+                            help='Number of synthetic POIs per run')
+        parser.add_argument('--all-pairs-limit', type=int, default=2000,
+                            help='Also time the all-pairs comparison and check recall for sizes up to this')
+        parser.add_argument('--max-block-size', type=int, default=MAX_NAME_BLOCK_SIZE,
+                            help='Name blocks larger than this are split further')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        previous = None
+
+        for size in options['sizes']:
+            pois = synthetic_pois(size, rng)
+
+            start = time.perf_counter()
+            pairs = candidate_pairs(pois, max_block_size=options['max_block_size'])
+            flagged = {(i, j) for i, j in pairs if detect_duplicate_pois(pois[i], pois[j])[0]}
+            blocked_time = time.perf_counter() - start
+
+            token_counts = Counter(token for poi in pois for token in name_tokens(poi['name']))
+            split = sum(count > options['max_block_size'] for count in token_counts.values())
+            line = (f"{size:>6} POIs: {len(pairs):>9} candidate pairs, {split} name blocks split, "
+                    f"{len(flagged)} duplicates, "
+                    f"{blocked_time:.3f}s ({blocked_time / size * 1000:.3f} ms/POI)")
+            if previous:
+                previous_size, previous_time = previous
+                line += f", time x{blocked_time / max(previous_time, 1e-9):.1f} for size x{size / previous_size:.1f}"
+            self.stdout.write(line)
+            previous = (size, blocked_time)
+
+            if size <= options['all_pairs_limit']:
+                start = time.perf_counter()
+                all_pairs = {
+                    (i, j) for i, j in combinations(range(size), 2)
+                    if detect_duplicate_pois(pois[i], pois[j])[0]
+                }
+                all_pairs_time = time.perf_counter() - start
+                self.stdout.write(f"        all pairs: {all_pairs_time:.3f}s, "
+                                  f"speed-up {all_pairs_time / max(blocked_time, 1e-9):.1f}x, "
+                                  f"recall {len(all_pairs & flagged)}/{len(all_pairs)}")
+                if all_pairs - flagged:
+                    self.stderr.write(self.style.ERROR(f"Blocking missed {len(all_pairs - flagged)} duplicates"))
+                else:
+                    self.stdout.write(self.style.SUCCESS('        blocking found every duplicate'))
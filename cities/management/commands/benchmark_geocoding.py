@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+import random
+import time
+from cities.services.geocoding.batch import iter_batch_responses
+from cities.services.geocoding.engine import iter_responses
+from cities.services.geocoding.fake_server import FakeMapboxServer
+from cities.services.geocoding.mapbox import first_feature, forward_request, reverse_request
+
+# Example: python manage.py benchmark_geocoding --queries 2000 --latency 0.1 --rate 10
+class Command(BaseCommand):
+    help = 'Compares per-lookup and batch geocoding against a local fake Mapbox server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=1000, help='Number of lookups (half forward, half reverse)')
+        parser.add_argument('--latency', type=float, default=0.05, help='Simulated round trip per HTTP request in seconds')
+        parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight at once')
+        parser.add_argument('--rate', type=float, default=0, help='Requests started per second (0 for no limit)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Queries per batch request')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        server = FakeMapboxServer(('127.0.0.1', 0), latency=options['latency'])
+        server.start()
+
+        try:
+            with override_settings(**server.settings_overrides()):
+                # Lookups around central London, like a city import's POIs
+                requests = []
+                for i in range(options['queries']):
+                    latitude, longitude = 51.5 + rng.uniform(-0.1, 0.1), -0.12 + rng.uniform(-0.15, 0.15)
+                    if i % 2:
+                        requests.append(reverse_request(i, latitude, longitude, 'benchmark'))
+                    else:
+                        requests.append(forward_request(i, f"Place {i}, {i % 300} High Street, London", 'benchmark',
+                                                        types='address', proximity=(-0.1276, 51.5072)))
+                engine_options = {'concurrency': options['concurrency'], 'rate': options['rate']}
+
+                self.stdout.write(f"{len(requests)} lookups, {options['latency'] * 1000:.0f}ms latency, "
+                                  f"{options['concurrency']} in flight, rate limit {options['rate'] or 'none'}")
+                timings = {}
+                answers = {}
+                for label, run in (
+                    ('Per lookup', lambda: iter_responses(requests, **engine_options)),
+                    ('Batch', lambda: iter_batch_responses(requests, batch_size=options['batch_size'], **engine_options)),
+                ):
+                    server.reset_counts()
+                    start = time.perf_counter()
+                    responses = list(run())
+                    timings[label] = time.perf_counter() - start
+                    answers[label] = {response.key: first_feature(response.data) for response in responses}
+                    errors = sum(1 for response in responses if response.error)
+                    self.stdout.write(f"{label + ':':12} {timings[label]:.2f}s, {server.http_requests} HTTP requests, "
+                                      f"{len(requests) / max(timings[label], 1e-9):.0f} lookups/s, {errors} errors")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.stdout.write(f"Speed-up: {timings['Per lookup'] / max(timings['Batch'], 1e-9):.1f}x")
+        mismatches = sum(1 for key, feature in answers['Per lookup'].items() if answers['Batch'].get(key) != feature)
+        if mismatches:
+            self.stderr.write(self.style.ERROR(f"{mismatches} lookups got different answers"))
+        else:
+            self.stdout.write(self.style.SUCCESS('Both backends returned identical features'))
@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand
+import time
+import numpy as np
+import geopandas as gpd
+import pandas as pd
+from cities.enrich_tasks import find_osm_features_within
+from cities.services.enrichment.osm_matching import find_match_candidates
+
+# Example: python manage.py benchmark_osm_matching --features 500000 --pois 1000
+class Command(BaseCommand):
+    help = 'Compares the spatial-index OSM lookup against a linear distance scan on synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--features', type=int, default=200000, help='Number of synthetic OSM features')
+        parser.add_argument('--pois', type=int, default=500, help='Number of POIs to match')
+        parser.add_argument('--radius', type=float, default=20, help='Search radius in meters')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        radius = options['radius']
+
+        # Scatter features over a 30km square around central London (EPSG:3857 meters)
+        center_x, center_y = -14200.0, 6711000.0
+        xs = center_x + rng.uniform(-15000, 15000, options['features'])
+        ys = center_y + rng.uniform(-15000, 15000, options['features'])
+        osm_projected = gpd.GeoDataFrame(
+            {'id': np.arange(options['features'])},
+            geometry=gpd.points_from_xy(xs, ys),
+            crs="EPSG:3857"
+        )
+
+        # Place each POI a few meters away from a random feature
+        picks = rng.integers(0, options['features'], options['pois'])
+        targets = gpd.points_from_xy(
+            xs[picks] + rng.uniform(-10, 10, options['pois']),
+            ys[picks] + rng.uniform(-10, 10, options['pois'])
+        )
+
+        self.stdout.write(f"{options['features']} features, {options['pois']} POIs, {radius}m radius")
+
+        start = time.perf_counter()
+        linear_results = []
+        for target in targets:
+            distances = osm_projected.geometry.distance(target)
+            linear_results.append(set(np.flatnonzero((distances <= radius).to_numpy())))
+        linear_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        osm_projected.sindex
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed_results = []
+        for target in targets:
+            positions, _ = find_osm_features_within(osm_projected, target, radius)
+            indexed_results.append(set(positions))
+        query_time = time.perf_counter() - start
+
+        # Whole batch in a single spatial join
+        osm_pois = osm_projected.assign(osm_type='node')
+        target_lonlat = gpd.GeoSeries(targets, crs="EPSG:3857").to_crs("EPSG:4326")
+        batch_targets = pd.DataFrame({
+            'poi_id': np.arange(len(targets)),
+            'name': None,
+            'latitude': target_lonlat.y,
+            'longitude': target_lonlat.x,
+        })
+        start = time.perf_counter()
+        candidates = find_match_candidates(batch_targets, osm_pois, osm_projected, radius)
+        batch_time = time.perf_counter() - start
+
+        mismatches = sum(1 for a, b in zip(linear_results, indexed_results) if a != b)
+
+        self.stdout.write(f"Linear scan:   {linear_time:.3f}s ({linear_time / len(targets) * 1000:.2f} ms/POI)")
+        self.stdout.write(f"Spatial index: {query_time:.3f}s ({query_time / len(targets) * 1000:.3f} ms/POI) "
+                          f"+ {build_time:.3f}s one-off index build")
+        self.stdout.write(f"Batch join:    {batch_time:.3f}s for {len(candidates)} candidate pairs")
+        self.stdout.write(f"Speed-up: {linear_time / max(query_time + build_time, 1e-9):.1f}x including build")
+
+        if mismatches:
+            self.stderr.write(self.style.ERROR(f"{mismatches} POIs got different candidates"))
+        else:
+            self.stdout.write(self.style.SUCCESS('Both methods found identical candidates'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from cities.services.geocoding.fake_server import FakeMapboxServer, DEFAULT_PORT
+
+# Example: python manage.py fake_mapbox_server --latency 0.1
+# then export the printed settings (and any MAPBOX_TOKEN) before running an import offline
+class Command(BaseCommand):
+    help = 'Serves deterministic answers to Mapbox geocoding and batch geocoding requests over localhost HTTP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', type=str, default='127.0.0.1', help='Address to bind to')
+        parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port to listen on')
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before each response')
+
+    def handle(self, *args, **options):
+        server = FakeMapboxServer((options['host'], options['port']), latency=options['latency'])
+
+        self.stdout.write(self.style.SUCCESS(f'Fake Mapbox listening on {server.base_url}'))
+        for name, value in server.settings_overrides().items():
+            self.stdout.write(f'{name}={value}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write(f'Shutting down fake Mapbox after {server.http_requests} requests '
+                              f'answering {server.queries} queries')
+        finally:
+            server.server_close()
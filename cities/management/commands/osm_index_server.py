@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from cities.services.enrichment.osm_index import OsmIndexServer, DEFAULT_PORT
+
+# Example: python manage.py osm_index_server --pbf great-britain-latest.osm.pbf --port 8765
+# then set OSM_INDEX_URL=http://127.0.0.1:8765 for Celery workers and Prefect flows
+class Command(BaseCommand):
+    help = 'Serves OSM POI matching from one shared in-memory index over localhost HTTP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pbf', action='append', default=[], help='PBF file to preload (repeatable)')
+        parser.add_argument('--host', type=str, default='127.0.0.1', help='Address to bind to')
+        parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port to listen on')
+        parser.add_argument('--cache-dir', type=str, help='OSM cache directory (defaults to OSM_CACHE_DIR)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Loading {len(options['pbf'])} PBF file(s)...")
+        server = OsmIndexServer((options['host'], options['port']), options['pbf'], options.get('cache_dir'))
+
+        host, port = server.server_address[:2]
+        self.stdout.write(self.style.SUCCESS(f'OSM index listening on http://{host}:{port}'))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write('Shutting down OSM index')
+        finally:
+            server.server_close()
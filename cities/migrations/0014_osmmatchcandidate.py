@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cities', '0013_pointofinterest_osm_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OsmMatchCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('osm_id', models.CharField(help_text='OpenStreetMap ID, prefixed with the element type', max_length=50)),
+                ('osm_type', models.CharField(max_length=10)),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('distance', models.FloatField(help_text='Distance from the POI in meters')),
+                ('name_score', models.FloatField(help_text='Best fuzzy name score across OSM name fields (0-100)')),
+                ('tags', models.JSONField(blank=True, default=dict)),
+                ('source', models.CharField(choices=[('pbf', 'PBF extract'), ('overpass', 'Overpass API')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('poi', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='osm_candidates', to='cities.pointofinterest')),
+            ],
+            options={
+                'ordering': ['poi', 'rank'],
+                'indexes': [models.Index(fields=['poi', 'rank'], name='cities_osmm_poi_id_5cece5_idx')],
+                'unique_together': {('poi', 'osm_id')},
+            },
+        ),
+    ]
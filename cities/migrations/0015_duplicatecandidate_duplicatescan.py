@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cities', '0014_osmmatchcandidate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateScan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('full', models.BooleanField(default=False, help_text='Whether every POI was compared, not only changed ones')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('changed_pois', models.IntegerField(default=0)),
+                ('compared_pairs', models.IntegerField(default=0)),
+                ('candidate_count', models.IntegerField(default=0)),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_scans', to='cities.city')),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DuplicateCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(help_text='Name similarity of the pair (0-1)')),
+                ('reasons', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_candidates', to='cities.city')),
+                ('poi1', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_candidates_as_first', to='cities.pointofinterest')),
+                ('poi2', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_candidates_as_second', to='cities.pointofinterest')),
+            ],
+            options={
+                'ordering': ['-score', 'poi1', 'poi2'],
+                'indexes': [models.Index(fields=['city', '-score'], name='cities_dupl_city_id_389059_idx')],
+                'unique_together': {('poi1', 'poi2')},
+            },
+        ),
+    ]
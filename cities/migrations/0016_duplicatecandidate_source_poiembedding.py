@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cities', '0015_duplicatecandidate_duplicatescan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='duplicatecandidate',
+            name='source',
+            field=models.CharField(choices=[('fuzzy', 'Name and location match'), ('semantic', 'Embedding neighbours')], default='fuzzy', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='duplicatecandidate',
+            name='score',
+            field=models.FloatField(help_text='Name similarity, or embedding cosine similarity for semantic pairs (0-1)'),
+        ),
+        migrations.CreateModel(
+            name='PoiEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=200)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('vector', models.BinaryField(help_text='Normalised float32 vector')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('model_name', 'content_hash')},
+            },
+        ),
+    ]
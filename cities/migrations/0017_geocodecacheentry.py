@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cities', '0016_duplicatecandidate_source_poiembedding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query_key', models.CharField(help_text='SHA-256 of the normalised query', max_length=64, unique=True)),
+                ('kind', models.CharField(choices=[('forward', 'Forward'), ('reverse', 'Reverse')], max_length=10)),
+                ('query', models.TextField(help_text='Normalised query, for reference')),
+                ('response', models.JSONField(help_text='Provider response, kept even when it has no features')),
+                ('fetched_at', models.DateTimeField(db_index=True)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('last_hit_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'geocode cache entries',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cities', '0017_geocodecacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='duplicatescan',
+            name='source',
+            field=models.CharField(choices=[('fuzzy', 'Name and location match'), ('semantic', 'Name and location match, and embedding neighbours')], default='fuzzy', max_length=20),
+        ),
+    ]
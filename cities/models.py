@@ -155,6 +155,135 @@ class PointOfInterest(models.Model):
         data['osm_id'] = self.osm_id
         return data
 
+class OsmMatchCandidate(models.Model):
+    """
+    A ranked OSM feature found near a POI by a matching run. Rank 0 is the
+    feature that was saved as the POI's osm_id.
+    """
+    SOURCES = [
+        ('pbf', 'PBF extract'),
+        ('overpass', 'Overpass API'),
+    ]
+
+    poi = models.ForeignKey(PointOfInterest, on_delete=models.CASCADE, related_name='osm_candidates')
+    osm_id = models.CharField(max_length=50, help_text="OpenStreetMap ID, prefixed with the element type")
+    osm_type = models.CharField(max_length=10)
+    rank = models.PositiveSmallIntegerField()
+    distance = models.FloatField(help_text="Distance from the POI in meters")
+    name_score = models.FloatField(help_text="Best fuzzy name score across OSM name fields (0-100)")
+    tags = models.JSONField(default=dict, blank=True)
+    source = models.CharField(max_length=20, choices=SOURCES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['poi', 'rank']
+        unique_together = [['poi', 'osm_id']]
+        indexes = [
+            models.Index(fields=['poi', 'rank']),
+        ]
+
+    def __str__(self):
+        return f"{self.osm_id} for {self.poi.name} (rank {self.rank})"
+
+    def to_dict(self):
+        """Convert the model instance to a dictionary."""
+        return model_to_dict(self, exclude=['poi'])
+
+class DuplicateCandidate(models.Model):
+    """
+    A pair of POIs flagged as possible duplicates by find_all_duplicates.
+    poi1 always has the lower ID, so each pair is stored once.
+    """
+    SOURCES = [
+        ('fuzzy', 'Name and location match'),
+        ('semantic', 'Embedding neighbours'),
+    ]
+
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='duplicate_candidates')
+    poi1 = models.ForeignKey(PointOfInterest, on_delete=models.CASCADE, related_name='duplicate_candidates_as_first')
+    poi2 = models.ForeignKey(PointOfInterest, on_delete=models.CASCADE, related_name='duplicate_candidates_as_second')
+    score = models.FloatField(help_text="Name similarity, or embedding cosine similarity for semantic pairs (0-1)")
+    reasons = models.JSONField(default=list, blank=True)
+    source = models.CharField(max_length=20, choices=SOURCES, default='fuzzy')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-score', 'poi1', 'poi2']
+        unique_together = [['poi1', 'poi2']]
+        indexes = [
+            models.Index(fields=['city', '-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.poi1.name} ~ {self.poi2.name} ({self.score:.2f})"
+
+class DuplicateScan(models.Model):
+    """
+    A run of find_all_duplicates over a city. POIs updated after the last
+    finished scan started are the only ones compared by the next incremental scan.
+    Semantic scans also run the fuzzy comparison, but only they move the
+    watermark of the embedding comparison.
+    """
+    SOURCES = [
+        ('fuzzy', 'Name and location match'),
+        ('semantic', 'Name and location match, and embedding neighbours'),
+    ]
+
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='duplicate_scans')
+    source = models.CharField(max_length=20, choices=SOURCES, default='fuzzy')
+    full = models.BooleanField(default=False, help_text="Whether every POI was compared, not only changed ones")
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    changed_pois = models.IntegerField(default=0)
+    compared_pairs = models.IntegerField(default=0)
+    candidate_count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Duplicate scan of {self.city.name} at {self.started_at}"
+
+class PoiEmbedding(models.Model):
+    """
+    A cached sentence embedding of a POI's text, keyed by a hash of that text
+    so unchanged POIs are not embedded again.
+    """
+    model_name = models.CharField(max_length=200)
+    content_hash = models.CharField(max_length=64)
+    vector = models.BinaryField(help_text="Normalised float32 vector")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [['model_name', 'content_hash']]
+
+    def __str__(self):
+        return f"{self.model_name} embedding {self.content_hash[:12]}"
+
+class GeocodeCacheEntry(models.Model):
+    """
+    A cached geocoding response, shared across imports and cities. Forward
+    queries are keyed by their normalised text, reverse ones by rounded coordinates.
+    """
+    KINDS = [
+        ('forward', 'Forward'),
+        ('reverse', 'Reverse'),
+    ]
+
+    query_key = models.CharField(max_length=64, unique=True, help_text="SHA-256 of the normalised query")
+    kind = models.CharField(max_length=10, choices=KINDS)
+    query = models.TextField(help_text="Normalised query, for reference")
+    response = models.JSONField(help_text="Provider response, kept even when it has no features")
+    fetched_at = models.DateTimeField(db_index=True)
+    hit_count = models.PositiveIntegerField(default=0)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'geocode cache entries'
+
+    def __str__(self):
+        return f"{self.kind} {self.query[:80]}"
+
 class Validation(models.Model):
     """
     Track specific errors that occur when building entries in the dataset.
@@ -8,6 +8,9 @@ This allows the same logic to be used by both Celery tasks and Prefect workflows
 
 from django.db import transaction
 from ..models import City, PointOfInterest, District, Validation
+from .dedup.candidates import bulk_update_pois
+from .dedup.clusters import MERGE_FIELDS
+from .dedup.ingest import MERGE, FLAG, absorb_poi, flag_duplicates, get_import_index
 from mwapi.errors import APIError
 from data_processing.wikivoyage_scraper import WikivoyageScraper
 from typing import List, Tuple, Dict, Optional, Any
@@ -120,7 +123,8 @@ def create_or_get_district(district_name: str, city: City, parent_district_id: O
 
 @transaction.atomic
 def process_pois(city: City, pois: List, clear_existing: bool = False, 
-                district_name: Optional[str] = None, parent_district_id: Optional[int] = None) -> List[PointOfInterest]:
+                district_name: Optional[str] = None, parent_district_id: Optional[int] = None,
+                deduplicate: bool = True) -> List[PointOfInterest]:
     """
     Process POIs for a city or district.
     
@@ -130,6 +134,7 @@ def process_pois(city: City, pois: List, clear_existing: bool = False,
         clear_existing: Whether to clear existing POIs for this city
         district_name: Name of the district (None for root city)
         parent_district_id: ID of the parent district (None for root districts)
+        deduplicate: Merge or flag POIs that duplicate ones already in the city (see dedup.ingest)
         
     Returns:
         List of created PointOfInterest objects
@@ -150,12 +155,17 @@ def process_pois(city: City, pois: List, clear_existing: bool = False,
             return None
         return val.strip() if isinstance(val, str) else val
     
+    # Check incoming POIs against the city's POIs so duplicates are not created
+    poi_index = get_import_index(city, reset=clear_existing and not district_name) if deduplicate else None
+    merged_pois = {}
+    flagged = []
+
     # Create new POIs
     db_pois = []
     for poi in pois:
         coords = poi.coordinates or (None, None)
         
-        db_pois.append(PointOfInterest(
+        new_poi = PointOfInterest(
             city=city,
             district=current_district,  # Will be None for root city POIs
             name=poi.name,
@@ -169,12 +179,32 @@ def process_pois(city: City, pois: List, clear_existing: bool = False,
             website=clean_value(poi.website),
             hours=clean_value(poi.hours),
             rank=poi.rank
-        ))
+        )
+
+        if poi_index is not None:
+            existing, match = poi_index.find(new_poi)
+            if match == MERGE:
+                absorb_poi(existing, new_poi)
+                if existing.pk:
+                    merged_pois[existing.pk] = existing
+                continue
+            if match == FLAG:
+                flagged.append((new_poi, existing))
+            poi_index.add(new_poi)
+
+        db_pois.append(new_poi)
 
     # Bulk create POIs
     if db_pois:
         PointOfInterest.objects.bulk_create(db_pois)
         logger.info(f"Created {len(db_pois)} POIs for {city.name}{' / ' + district_name if district_name else ''}")
+
+    if merged_pois:
+        bulk_update_pois(list(merged_pois.values()), MERGE_FIELDS + ['district'])
+        logger.info(f"Merged duplicate listings into {len(merged_pois)} existing POIs in {city.name}")
+    if flagged:
+        flag_duplicates(city, flagged)
+        logger.info(f"Flagged {len(flagged)} possible duplicate POIs in {city.name}")
     
     return db_pois
 
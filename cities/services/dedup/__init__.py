@@ -0,0 +1,7 @@
+"""
+Services module for POI duplicate detection and resolution.
+
+This package contains service modules that find and merge duplicate POIs
+separate from views and tasks, so the same logic can be used by Celery tasks,
+Prefect workflows and views.
+"""
@@ -0,0 +1,219 @@
+"""
+Service module for generating duplicate candidate pairs by blocking.
+
+Comparing every POI with every other one is quadratic. Instead POIs are put
+into blocks that any duplicate pair must share, and only pairs within a block
+reach detect_duplicate_pois:
+
+- POIs with coordinates go into grid cells at least as wide as the distance
+  threshold in metres, and are paired with POIs in their own and the
+  neighbouring cells.
+- Every POI goes into one block per normalised name token, so POIs without
+  coordinates, or with similar addresses but distant coordinates, still meet.
+- Outside the grid a duplicate needs similar addresses, so POIs with an
+  address also go into character blocks, for names that are similar without
+  sharing a word ("Colosseum" and "Coloseum"). Two strings above the
+  similarity threshold have so many characters in common that one of the few
+  rarest characters of each must be shared (see _prefix_length), so each POI
+  is only indexed under those.
+
+Name tokens shared by more than MAX_NAME_BLOCK_SIZE POIs ("cafe", "museum")
+are too common to compare whole, so those blocks are split without losing a
+duplicate: POIs without an address are dropped from them (outside the grid a
+duplicate needs similar addresses), and the rest are only paired if their
+names pass the same Indel-ratio bound detect_duplicate_pois filters with,
+scored for the whole block at once in C.
+
+With a focus set, only pairs involving at least one focused position are
+generated, so new or edited POIs can be compared against the rest of a city
+without pairing the unchanged POIs with each other again.
+"""
+
+import logging
+import math
+from collections import defaultdict
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .distance import grid_cell_size, max_distance_meters
+from .similarity import DEFAULT_THRESHOLD, normalise_text, prepare_text
+
+logger = logging.getLogger(__name__)
+
+MAX_NAME_BLOCK_SIZE = 50
+
+# Rows of an oversized block scored per rapidfuzz call
+SCORE_CHUNK_SIZE = 1000
+
+# Tokens that say nothing about which place a name refers to
+STOP_TOKENS = {'the', 'a', 'an', 'of', 'and', 'de', 'la', 'le', 'el', 'der', 'die', 'das'}
+
+Pair = Tuple[int, int]
+
+
+def name_tokens(name: Optional[str]) -> Set[str]:
+    """Return the lower-cased, accent-stripped word tokens of a name, without stop words."""
+    if not name:
+        return set()
+    return {token for token in normalise_text(name).split() if token not in STOP_TOKENS and len(token) > 1}
+
+
+def _block_pairs(members: List[int], focus: Optional[Set[int]] = None) -> Iterable[Pair]:
+    """Yield the pairs within a block, or only those involving a focused position."""
+    if focus is None:
+        return combinations(members, 2)
+    focused = [i for i in members if i in focus]
+    return ((min(i, j), max(i, j)) for i in focused for j in members if j != i)
+
+
+def _cross_pairs(members: List[int], others: Iterable[int], focus: Optional[Set[int]] = None) -> Iterable[Pair]:
+    """Yield the pairs between two neighbouring blocks, or only those involving a focused position."""
+    return (
+        (min(i, j), max(i, j)) for i in members for j in others
+        if focus is None or i in focus or j in focus
+    )
+
+
+def _grid_pairs(pois: List[dict], radius_meters: float, focus: Optional[Set[int]] = None) -> Set[Pair]:
+    """Pair POIs with coordinates that fall in the same or adjacent grid cells."""
+    located = [(position, float(poi['latitude']), float(poi['longitude']))
+               for position, poi in enumerate(pois) if poi['latitude'] and poi['longitude']]
+    if not located:
+        return set()
+    lat_size, lon_size = grid_cell_size(radius_meters, max(abs(lat) for _, lat, _ in located))
+
+    cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+    for position, lat, lon in located:
+        cells[(math.floor(lat / lat_size), math.floor(lon / lon_size))].append(position)
+
+    pairs = set()
+    for (row, column), members in cells.items():
+        pairs.update(_block_pairs(members, focus))
+        # Only look at half the neighbours so each pair of cells is visited once
+        for neighbour in ((row, column + 1), (row + 1, column - 1), (row + 1, column), (row + 1, column + 1)):
+            pairs.update(_cross_pairs(members, cells.get(neighbour, ()), focus))
+    return pairs
+
+
+def _similar_name_pairs(pois: List[dict], members: List[int], focus: Optional[Set[int]] = None,
+                        threshold: float = DEFAULT_THRESHOLD) -> Set[Pair]:
+    """
+    Pair the members of a name or character block whose names could be similar.
+
+    Outside the grid a pair is only a duplicate if both names and both addresses are
+    similar, so members without an address are left out, and names are scored with
+    rapidfuzz's Indel ratio in C, which is never below the SequenceMatcher ratio that
+    detect_duplicate_pois confirms with (see similarity.ratio_above).
+    """
+    from rapidfuzz import fuzz, process
+
+    addressed = [position for position in members if pois[position].get('address')]
+    if len(addressed) < 2:
+        return set()
+    names = [prepare_text(pois[position]['name']) for position in addressed]
+    rows = [index for index, position in enumerate(addressed) if focus is None or position in focus]
+
+    pairs = set()
+    # Score a slice of rows at a time so a huge block does not need its whole matrix in memory
+    for start in range(0, len(rows), SCORE_CHUNK_SIZE):
+        chunk = rows[start:start + SCORE_CHUNK_SIZE]
+        scores = process.cdist([names[index] for index in chunk], names, scorer=fuzz.ratio,
+                               score_cutoff=threshold * 100 - 1e-9, dtype=np.float64, workers=-1)
+        for row, column in zip(*np.nonzero(scores)):
+            i, j = addressed[chunk[row]], addressed[column]
+            if i != j:
+                pairs.add((min(i, j), max(i, j)))
+    return pairs
+
+
+def _char_tokens(text: str) -> List[Tuple[str, int]]:
+    """Return the characters of text numbered by occurrence, e.g. 'aba' -> a1, b1, a2."""
+    seen: Dict[str, int] = defaultdict(int)
+    tokens = []
+    for char in text:
+        seen[char] += 1
+        tokens.append((char, seen[char]))
+    return tokens
+
+
+def _prefix_length(length: int, threshold: float) -> int:
+    """
+    Return how many of a string's rarest characters must be indexed so that any string
+    similar to it above the threshold shares one of them.
+
+    A ratio 2M/(la+lb) above t needs lb > la*t/(2-t), so more than la*t/(2-t) characters
+    in common, and two sets with at least k common members share one of their first
+    (size - k + 1) members in any fixed order.
+    """
+    overlap = math.floor(length * threshold / (2 - threshold) - 1e-9) + 1
+    return max(length - overlap + 1, 1)
+
+
+def _fuzzy_name_pairs(pois: List[dict], focus: Optional[Set[int]] = None,
+                      threshold: float = DEFAULT_THRESHOLD) -> Set[Pair]:
+    """Pair POIs with an address whose names could be similar, whether or not they share a word."""
+    tokens = {
+        position: _char_tokens(prepare_text(poi['name']))
+        for position, poi in enumerate(pois) if poi.get('address') and poi['name']
+    }
+    frequency: Dict[Tuple[str, int], int] = defaultdict(int)
+    for position_tokens in tokens.values():
+        for token in position_tokens:
+            frequency[token] += 1
+
+    blocks: Dict[Tuple[str, int], List[int]] = defaultdict(list)
+    for position, position_tokens in tokens.items():
+        rarest = sorted(position_tokens, key=lambda token: (frequency[token], token))
+        for token in rarest[:_prefix_length(len(position_tokens), threshold)]:
+            blocks[token].append(position)
+
+    pairs = set()
+    for members in blocks.values():
+        if len(members) > 1:
+            pairs.update(_similar_name_pairs(pois, members, focus, threshold))
+    return pairs
+
+
+def _name_pairs(pois: List[dict], max_block_size: int, focus: Optional[Set[int]] = None) -> Set[Pair]:
+    """Pair POIs sharing a name token, splitting tokens that are too common."""
+    blocks: Dict[str, List[int]] = defaultdict(list)
+    for position, poi in enumerate(pois):
+        for token in name_tokens(poi['name']):
+            blocks[token].append(position)
+
+    pairs = set()
+    split = 0
+    for members in blocks.values():
+        if len(members) > max_block_size:
+            split += 1
+            pairs.update(_similar_name_pairs(pois, members, focus))
+            continue
+        pairs.update(_block_pairs(members, focus))
+    if split:
+        logger.info(f"Split {split} name blocks with more than {max_block_size} POIs by name similarity")
+    return pairs
+
+
+def candidate_pairs(pois: List[dict], radius_meters: Optional[float] = None,
+                    max_block_size: int = MAX_NAME_BLOCK_SIZE,
+                    focus: Optional[Set[int]] = None) -> List[Pair]:
+    """
+    Return the position pairs (i, j), i < j, of POIs that share a grid, name or character block.
+
+    Args:
+        pois: POI dicts with name, latitude and longitude keys
+        radius_meters: Distance threshold of duplicate detection (defaults to settings.DUPLICATE_DISTANCE_METERS)
+        max_block_size: Name blocks larger than this are split further
+        focus: Only return pairs involving one of these positions (default: all pairs)
+
+    Returns:
+        Sorted list of candidate pairs of positions into pois
+    """
+    pairs = _grid_pairs(pois, max_distance_meters(radius_meters), focus)
+    pairs |= _name_pairs(pois, max_block_size, focus)
+    pairs |= _fuzzy_name_pairs(pois, focus)
+    total = len(pois) * (len(pois) - 1) // 2
+    logger.info(f"Blocking kept {len(pairs)} of {total} possible pairs for {len(pois)} POIs")
+    return sorted(pairs)
@@ -0,0 +1,178 @@
+"""
+Service module for persisting duplicate candidates.
+
+find_all_duplicates stores the pairs it flags as DuplicateCandidate rows, so
+the UI can page through them without rescanning the city. Each scan is
+recorded as a DuplicateScan. An incremental scan only compares POIs created
+or edited since the last finished scan started against the rest of the city
+(see the focus argument of blocking.candidate_pairs): their old candidates are
+dropped and replaced, while candidates between unchanged POIs are kept.
+Candidates of deleted POIs go with them. This relies on every change to a
+POI bumping updated_at: save() does, but bulk_update skips auto_now fields, so
+code saving POIs in bulk must use bulk_update_pois.
+
+A semantic scan also stores embedding neighbours (see dedup.semantic) that
+the fuzzy detector missed, with source 'semantic'. They are for review only:
+find_all_duplicates does not return them among the pairs auto-merged. Scans
+record their source, and each source is rescanned from its own last scan and
+only replaces its own candidates, so a fuzzy scan neither hides POIs changed
+since the last semantic scan nor drops semantic candidates.
+"""
+
+import logging
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from django.db.models import Q
+from django.utils import timezone
+
+from ...models import City, DuplicateCandidate, DuplicateScan, PointOfInterest
+from .blocking import candidate_pairs
+from .distance import pair_distances
+from .semantic import TEXT_FIELDS, semantic_pairs
+from .similarity import similarity_score
+
+logger = logging.getLogger(__name__)
+
+POI_FIELDS = ('id', 'name', 'category', 'latitude', 'longitude', 'address', 'district__name', 'rank')
+
+Detector = Callable[..., Tuple[bool, List[str]]]
+
+
+def bulk_update_pois(pois: List[PointOfInterest], fields: List[str], batch_size: int = 500):
+    """Save the given fields of many POIs, bumping updated_at so the next incremental scan compares them."""
+    now = timezone.now()
+    for poi in pois:
+        poi.updated_at = now
+    PointOfInterest.objects.bulk_update(pois, list(fields) + ['updated_at'], batch_size=batch_size)
+
+
+def last_scan(city: City, source: Optional[str] = None) -> Optional[DuplicateScan]:
+    """Return the city's most recent finished scan, optionally of one source, if any."""
+    scans = city.duplicate_scans.filter(finished_at__isnull=False)
+    if source:
+        scans = scans.filter(source=source)
+    return scans.order_by('-started_at').first()
+
+
+def _changed_pois(city: City, pois: List[dict], previous: Optional[DuplicateScan],
+                  source: str) -> Tuple[List[int], Optional[Set[int]]]:
+    """
+    Find the POIs to compare again since the previous scan, dropping their candidates of one source.
+
+    Returns:
+        The changed POI IDs, and their positions in pois (None when every POI is compared)
+    """
+    candidates = city.duplicate_candidates.filter(source=source)
+    if previous is None:
+        candidates.delete()
+        return [poi['id'] for poi in pois], None
+
+    # POIs saved while the previous scan ran are compared again, as they may have been missed
+    changed_ids = list(city.points_of_interest.filter(
+        updated_at__gte=previous.started_at
+    ).values_list('id', flat=True))
+    changed = set(changed_ids)
+    candidates.filter(Q(poi1_id__in=changed_ids) | Q(poi2_id__in=changed_ids)).delete()
+    return changed_ids, {position for position, poi in enumerate(pois) if poi['id'] in changed}
+
+
+def scan_duplicates(city: City, detect: Detector, full: bool = False, semantic: bool = False) -> DuplicateScan:
+    """
+    Compare the city's new and edited POIs and store the duplicate pairs found.
+
+    Every scan runs the fuzzy comparison, so it is incremental from the last scan of
+    any source; the embedding comparison is incremental from the last semantic scan.
+
+    Args:
+        city: City to scan
+        detect: Function taking two POI dicts and their distance in metres, returning (is_duplicate, reasons)
+        full: Compare every POI and rebuild all candidates, as the first scan does
+        semantic: Also store embedding neighbours the detector did not flag
+
+    Returns:
+        The finished DuplicateScan
+    """
+    previous = None if full else last_scan(city)
+    scan = DuplicateScan.objects.create(city=city, full=previous is None, source='semantic' if semantic else 'fuzzy')
+
+    fields = POI_FIELDS + TEXT_FIELDS if semantic else POI_FIELDS
+    pois = list(PointOfInterest.objects.filter(city=city).values(*fields))
+    changed_ids, focus = _changed_pois(city, pois, previous, 'fuzzy')
+
+    pairs = candidate_pairs(pois, focus=focus) if focus is None or focus else []
+    candidates = {}
+    for (i, j), distance in zip(pairs, pair_distances(pois, pairs)):
+        poi1, poi2 = sorted((pois[i], pois[j]), key=lambda poi: poi['id'])
+        is_duplicate, reasons = detect(poi1, poi2, distance=distance)
+        if is_duplicate:
+            candidates[(i, j)] = DuplicateCandidate(
+                city=city,
+                poi1_id=poi1['id'],
+                poi2_id=poi2['id'],
+                score=similarity_score(poi1['name'], poi2['name']),
+                reasons=reasons
+            )
+    # A pair now matched by name replaces a semantic candidate stored for it earlier
+    DuplicateCandidate.objects.bulk_create(
+        candidates.values(), batch_size=500, update_conflicts=True, unique_fields=['poi1', 'poi2'],
+        update_fields=['score', 'reasons', 'source']
+    )
+    new_count = len(candidates)
+
+    if semantic:
+        previous_semantic = None if full else last_scan(city, source='semantic')
+        semantic_ids, semantic_focus = _changed_pois(city, pois, previous_semantic, 'semantic')
+        neighbours = semantic_pairs(pois, focus=semantic_focus) if semantic_focus is None or semantic_focus else {}
+        semantic_candidates = []
+        for (i, j), similarity in neighbours.items():
+            if (i, j) not in candidates:
+                poi1, poi2 = sorted((pois[i], pois[j]), key=lambda poi: poi['id'])
+                semantic_candidates.append(DuplicateCandidate(
+                    city=city,
+                    poi1_id=poi1['id'],
+                    poi2_id=poi2['id'],
+                    score=similarity,
+                    reasons=[f"Similar embeddings (cosine {similarity:.2f})"],
+                    source='semantic'
+                ))
+        # Pairs already stored as fuzzy candidates stay fuzzy
+        DuplicateCandidate.objects.bulk_create(semantic_candidates, batch_size=500, ignore_conflicts=True)
+        new_count += len(semantic_candidates)
+        logger.info(f"Compared embeddings of {len(semantic_ids)} changed POIs in {city.name}")
+
+    scan.changed_pois = len(changed_ids)
+    scan.compared_pairs = len(pairs)
+    scan.candidate_count = city.duplicate_candidates.count()
+    scan.finished_at = timezone.now()
+    scan.save()
+
+    logger.info(f"{'Full' if scan.full else 'Incremental'} duplicate scan of {city.name}: compared "
+                f"{len(pairs)} pairs for {len(changed_ids)} changed POIs, found {new_count} new pairs, "
+                f"{scan.candidate_count} stored")
+    return scan
+
+
+def _display_name(poi: PointOfInterest) -> str:
+    """Return the POI name with its district, or Main City, in brackets."""
+    return f"{poi.name} ({poi.district.name if poi.district else 'Main City'})"
+
+
+def candidate_to_dict(candidate: DuplicateCandidate) -> Dict[str, object]:
+    """Return a candidate in the format find_all_duplicates has always returned, plus its score."""
+    return {
+        'poi1_id': candidate.poi1_id,
+        'poi1_name': _display_name(candidate.poi1),
+        'poi2_id': candidate.poi2_id,
+        'poi2_name': _display_name(candidate.poi2),
+        'reason': ' & '.join(candidate.reasons),
+        'score': round(candidate.score, 3),
+        'source': candidate.source,
+    }
+
+
+def stored_candidates(city: City, source: Optional[str] = None):
+    """Return the city's stored candidates, highest score first, with their POIs and districts loaded."""
+    candidates = city.duplicate_candidates.select_related('poi1__district', 'poi2__district')
+    if source:
+        candidates = candidates.filter(source=source)
+    return candidates.order_by('-score', 'poi1_id', 'poi2_id')
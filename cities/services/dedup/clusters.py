@@ -0,0 +1,186 @@
+"""
+Service module for resolving duplicate POIs cluster by cluster.
+
+Duplicate pairs overlap: when A~B and B~C, merging the pairs one at a time
+deletes B before the second pair is reached. Pairs are instead grouped into
+connected clusters with a union-find structure, and each cluster is merged in
+one step: the best value of every field is chosen across all members,
+written to one kept POI, and the other members are deleted, all clusters in
+one merge_pois transaction.
+"""
+
+import logging
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+from ...models import City, PointOfInterest
+from ..poi_merge import merge_pois
+
+logger = logging.getLogger(__name__)
+
+# Fields compared across a cluster, in the order _determine_best_merge used
+MERGE_FIELDS = [
+    'name', 'category', 'sub_category', 'description',
+    'latitude', 'longitude', 'address', 'phone',
+    'website', 'hours', 'rank'
+]
+
+
+class UnionFind:
+    """Disjoint sets with path compression and union by size, remembering insertion order."""
+
+    def __init__(self):
+        self.parent: Dict[Hashable, Hashable] = {}
+        self.size: Dict[Hashable, int] = {}
+
+    def add(self, item: Hashable):
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+
+    def find(self, item: Hashable) -> Hashable:
+        self.add(item)
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a: Hashable, b: Hashable):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+
+    def groups(self) -> List[List[Hashable]]:
+        """Return the sets with more than one member, each in insertion order."""
+        groups: Dict[Hashable, List[Hashable]] = {}
+        for item in self.parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return [members for members in groups.values() if len(members) > 1]
+
+
+def cluster_pairs(pairs: Iterable[Tuple[int, int]]) -> List[List[int]]:
+    """
+    Group duplicate pairs into connected clusters.
+
+    Args:
+        pairs: (poi1_id, poi2_id) pairs
+
+    Returns:
+        Clusters of POI IDs, each ordered by first appearance in pairs
+    """
+    union_find = UnionFind()
+    for a, b in pairs:
+        union_find.union(a, b)
+    return union_find.groups()
+
+
+def better_value(val1, val2, field_name: str):
+    """
+    Choose the better of two field values: non-null over null, the lower rank,
+    longer text for descriptions, addresses and hours, otherwise the first value.
+    """
+    # Non-null wins over null
+    if val1 and not val2:
+        return val1
+    if val2 and not val1:
+        return val2
+
+    # If both are null or both are non-null
+    if not val1 and not val2:
+        return val1  # Both null, doesn't matter
+
+    # Both have values - apply field-specific logic
+    if field_name == 'rank':
+        # Lower rank (number) is better
+        return min(val1, val2)
+    elif field_name in ['description', 'address', 'hours']:
+        # Longer text is usually better
+        return val1 if len(str(val1)) >= len(str(val2)) else val2
+    else:
+        # For other fields, prefer the earlier value (arbitrary but consistent)
+        return val1
+
+
+def resolve_cluster(pois: List[PointOfInterest]) -> Tuple[PointOfInterest, List[PointOfInterest], dict]:
+    """
+    Choose the POI to keep and the best values across a cluster.
+
+    The first POI is kept. Field selections use the poi_merge format: field
+    values, plus 'district' as a district name and 'coordinates' as "lat,lon".
+
+    Args:
+        pois: Members of one cluster, in order of preference
+
+    Returns:
+        tuple: (keep_poi, remove_pois, field_selections)
+    """
+    keep_poi, remove_pois = pois[0], pois[1:]
+    field_selections = {}
+
+    for field in MERGE_FIELDS:
+        best_val = getattr(keep_poi, field, None)
+        for poi in remove_pois:
+            best_val = better_value(best_val, getattr(poi, field, None), field)
+        if best_val != getattr(keep_poi, field, None):
+            field_selections[field] = best_val
+
+    # Prefer the kept POI's district, otherwise the first member that has one
+    if not keep_poi.district:
+        district = next((poi.district for poi in remove_pois if poi.district), None)
+        if district:
+            field_selections['district'] = district.name
+
+    # Take coordinates as a pair from the first member with both, if the kept POI lacks them
+    if not (keep_poi.latitude and keep_poi.longitude):
+        located = next((poi for poi in remove_pois if poi.latitude and poi.longitude), None)
+        if located:
+            field_selections['coordinates'] = f"{located.latitude},{located.longitude}"
+
+    return keep_poi, remove_pois, field_selections
+
+
+def merge_duplicate_clusters(city: City, pairs: Iterable[Tuple[int, int]]) -> Dict[str, object]:
+    """
+    Merge every cluster of duplicate POIs in a city.
+
+    Args:
+        city: City the POIs belong to
+        pairs: (poi1_id, poi2_id) duplicate pairs
+
+    Returns:
+        Dictionary with cluster_count, merged_count (POIs removed) and errors
+    """
+    clusters = cluster_pairs(pairs)
+    pois_by_id = PointOfInterest.objects.select_related('district').filter(city=city).in_bulk(
+        [poi_id for cluster in clusters for poi_id in cluster]
+    )
+
+    merges = []
+    errors = []
+    for cluster in clusters:
+        pois = [pois_by_id[poi_id] for poi_id in cluster if poi_id in pois_by_id]
+        missing = [poi_id for poi_id in cluster if poi_id not in pois_by_id]
+        if missing:
+            errors.append(f"❌ POIs not found in cluster {cluster}: {missing}")
+        if len(pois) < 2:
+            continue
+        keep_poi, remove_pois, field_selections = resolve_cluster(pois)
+        # The kept POI takes the cluster's best values once, the other members are only removed
+        merges.extend(
+            (keep_poi.id, poi.id, field_selections if i == 0 else {}) for i, poi in enumerate(remove_pois)
+        )
+        logger.info(f"Merging {', '.join(poi.name for poi in remove_pois)} into {keep_poi.name}")
+
+    results = merge_pois(city, merges) if merges else []
+    errors.extend(f"❌ {result['message']}" for result in results if result['status'] != 'merged')
+
+    return {
+        'cluster_count': len(clusters),
+        'merged_count': sum(result['status'] == 'merged' for result in results),
+        'errors': errors
+    }
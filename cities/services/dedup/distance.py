@@ -0,0 +1,83 @@
+"""
+Service module for metric distances between POIs.
+
+Duplicate detection used to call two POIs close when both coordinate
+differences were under 0.001 degrees. That box is about 111m north-south but
+only about 69m east-west in London, and narrows further towards the poles.
+Distances are instead great-circle distances in metres, computed with a NumPy
+haversine kernel for many pairs at once, and compared with
+settings.DUPLICATE_DISTANCE_METERS.
+"""
+
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+EARTH_RADIUS_METERS = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_METERS / 180
+
+
+def max_distance_meters(radius_meters: Optional[float] = None) -> float:
+    """Return the given distance threshold, or settings.DUPLICATE_DISTANCE_METERS."""
+    return float(radius_meters if radius_meters is not None else settings.DUPLICATE_DISTANCE_METERS)
+
+
+def haversine_meters(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Return the great-circle distances in metres between two sets of points.
+
+    Args:
+        lat1, lon1: Coordinates in degrees of the first points (scalars or arrays)
+        lat2, lon2: Coordinates in degrees of the second points, broadcast against the first
+
+    Returns:
+        Array of distances, NaN where a coordinate is missing
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=float)) for value in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def distance_meters(poi1: dict, poi2: dict) -> Optional[float]:
+    """Return the distance in metres between two POI dicts, or None if either lacks coordinates."""
+    if not (poi1['latitude'] and poi1['longitude'] and poi2['latitude'] and poi2['longitude']):
+        return None
+    return float(haversine_meters(poi1['latitude'], poi1['longitude'], poi2['latitude'], poi2['longitude']))
+
+
+def coordinate_arrays(pois: Sequence[dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the latitudes and longitudes of POI dicts as float arrays, NaN where missing."""
+    lats = np.array([poi['latitude'] if poi['latitude'] and poi['longitude'] else np.nan for poi in pois], dtype=float)
+    lons = np.array([poi['longitude'] if poi['latitude'] and poi['longitude'] else np.nan for poi in pois], dtype=float)
+    return lats, lons
+
+
+def pair_distances(pois: Sequence[dict], pairs: List[Tuple[int, int]]) -> List[Optional[float]]:
+    """
+    Return the distance in metres of every pair of positions into pois, in one vectorised pass.
+
+    Returns:
+        One distance per pair, None where either POI lacks coordinates
+    """
+    if not pairs:
+        return []
+    lats, lons = coordinate_arrays(pois)
+    first, second = np.array(pairs).T
+    distances = haversine_meters(lats[first], lons[first], lats[second], lons[second])
+    return [None if np.isnan(distance) else float(distance) for distance in distances]
+
+
+def grid_cell_size(radius_meters: float, max_abs_latitude: float) -> Tuple[float, float]:
+    """
+    Return (latitude, longitude) cell sizes in degrees at least radius_meters wide everywhere up to max_abs_latitude.
+
+    A degree of longitude shrinks with the cosine of the latitude, so longitude
+    cells are widened for the POI furthest from the equator. The 1% margin
+    covers the difference between the haversine and this flat approximation.
+    """
+    lat_size = radius_meters / METERS_PER_DEGREE * 1.01
+    cos_latitude = max(math.cos(math.radians(min(abs(max_abs_latitude), 89.0))), 1e-6)
+    return lat_size, min(lat_size / cos_latitude, 360.0)
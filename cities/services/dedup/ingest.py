@@ -0,0 +1,140 @@
+"""
+Service module for catching duplicate POIs while a city is imported.
+
+The same listing often appears on the main city page and on a district page.
+process_pois checks every incoming POI against an index of the city's POIs,
+keyed by normalised name, before bulk-creating them:
+
+- Same normalised name within settings.DUPLICATE_DISTANCE_METERS: the incoming POI is merged
+  into the existing one (empty fields filled, district taken, best values kept)
+  instead of being created.
+- Same normalised name and category, but one of them has no coordinates: the
+  POI is created and the pair is flagged with a Validation record.
+
+The Prefect import flow keeps one index for the whole import with
+import_poi_index; otherwise each process_pois call builds one from the database.
+"""
+
+import contextlib
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from ...models import City, PointOfInterest, Validation
+from .clusters import MERGE_FIELDS, better_value
+from .distance import haversine_meters, max_distance_meters
+from .similarity import normalise_text
+
+logger = logging.getLogger(__name__)
+
+MERGE = 'merge'
+FLAG = 'flag'
+
+# Indexes shared by every process_pois call of an import, keyed by root city name
+_active_indexes: Dict[str, Optional['ImportPoiIndex']] = {}
+_active_indexes_lock = threading.Lock()
+
+
+def _has_coordinates(poi: PointOfInterest) -> bool:
+    return poi.latitude is not None and poi.longitude is not None
+
+
+class ImportPoiIndex:
+    """In-memory index of a city's POIs by normalised name."""
+
+    def __init__(self, radius_meters: Optional[float] = None):
+        self.radius_meters = max_distance_meters(radius_meters)
+        self.by_name: Dict[str, List[PointOfInterest]] = defaultdict(list)
+
+    @classmethod
+    def for_city(cls, city: City) -> 'ImportPoiIndex':
+        """Build an index from the POIs already saved for a city."""
+        index = cls()
+        for poi in city.points_of_interest.select_related('district'):
+            index.add(poi)
+        return index
+
+    def add(self, poi: PointOfInterest):
+        """Add a saved or pending POI to the index."""
+        name = normalise_text(poi.name or '')
+        if name:
+            self.by_name[name].append(poi)
+
+    def find(self, poi: PointOfInterest) -> Tuple[Optional[PointOfInterest], Optional[str]]:
+        """
+        Find a likely duplicate of an incoming POI.
+
+        Returns:
+            tuple: (existing_poi, MERGE or FLAG), or (None, None) if there is no match
+        """
+        name = normalise_text(poi.name or '')
+        namesakes = self.by_name.get(name, ())
+        located = [existing for existing in namesakes if _has_coordinates(existing)]
+        if _has_coordinates(poi) and located:
+            distances = haversine_meters(poi.latitude, poi.longitude,
+                                         [existing.latitude for existing in located],
+                                         [existing.longitude for existing in located])
+            for existing, distance in zip(located, distances):
+                if distance <= self.radius_meters:
+                    return existing, MERGE
+
+        flagged = next((
+            existing for existing in namesakes
+            if not (_has_coordinates(poi) and _has_coordinates(existing)) and existing.category == poi.category
+        ), None)
+        return (flagged, FLAG) if flagged else (None, None)
+
+
+def absorb_poi(existing: PointOfInterest, incoming: PointOfInterest):
+    """Merge an unsaved incoming POI into an existing one, keeping the best value of each field."""
+    for field in MERGE_FIELDS:
+        setattr(existing, field, better_value(getattr(existing, field), getattr(incoming, field), field))
+    # Like dedup_main_city, a listing found on a district page belongs to that district
+    if existing.district is None and incoming.district is not None:
+        existing.district = incoming.district
+
+
+@contextlib.contextmanager
+def import_poi_index(city_name: str):
+    """Share one POI index between all process_pois calls for a city until the block exits."""
+    with _active_indexes_lock:
+        _active_indexes[city_name] = None
+    try:
+        yield
+    finally:
+        with _active_indexes_lock:
+            _active_indexes.pop(city_name, None)
+
+
+def get_import_index(city: City, reset: bool = False) -> ImportPoiIndex:
+    """
+    Return the shared index of an active import of this city, or a new one built from the database.
+
+    Args:
+        city: Root city being imported
+        reset: Rebuild the shared index, e.g. after the city's POIs were cleared
+    """
+    with _active_indexes_lock:
+        shared = city.name in _active_indexes
+        index = _active_indexes.get(city.name)
+        if index is None or reset:
+            index = ImportPoiIndex.for_city(city)
+            if shared:
+                _active_indexes[city.name] = index
+    return index
+
+
+def flag_duplicates(city: City, flagged: List[Tuple[PointOfInterest, PointOfInterest]]):
+    """Record incoming POIs that may duplicate existing ones as Validation entries."""
+    Validation.objects.bulk_create([
+        Validation(
+            parent=city,
+            context='WikiImport',
+            aggregate='DuplicatePOI',
+            specialized_aggregate='NameMatchWithoutCoordinates',
+            description=(f"{incoming.name} ({incoming.category}) may duplicate POI "
+                         f"{existing.id or 'in this import'}: {existing.name}")[:500]
+        )
+        for incoming, existing in flagged
+    ])
@@ -0,0 +1,66 @@
+"""
+Service module for finding POIs with identical keys.
+
+A key is a POI's name and its coordinates rounded to 6 decimals. Grouping is
+done by the database: one GROUP BY ... HAVING COUNT(*) > 1 finds the duplicate
+keys, and only the members of those groups are fetched, streamed in key order.
+Memory use therefore depends on the number of duplicates, not on the size of
+the city.
+"""
+
+from itertools import groupby
+from typing import Dict, Iterator, List
+
+from django.db.models import Count, Exists, FloatField, OuterRef, QuerySet, Value
+from django.db.models.functions import Coalesce, Round
+
+from ...models import City, PointOfInterest
+
+KEY_PRECISION = 6
+
+KEY_FIELDS = ('key_name', 'key_latitude', 'key_longitude')
+
+
+def _keyed_pois(city: City) -> QuerySet:
+    """Return the city's POIs with coordinates, annotated with their key fields."""
+    return PointOfInterest.objects.filter(
+        city=city,
+        latitude__isnull=False,
+        longitude__isnull=False
+    ).annotate(
+        key_name=Coalesce('name', Value('')),
+        key_latitude=Round('latitude', KEY_PRECISION, output_field=FloatField()),
+        key_longitude=Round('longitude', KEY_PRECISION, output_field=FloatField()),
+    )
+
+
+def duplicate_key_groups(city: City, chunk_size: int = 2000) -> Iterator[List[Dict]]:
+    """
+    Yield the groups of POIs sharing a name and rounded coordinates.
+
+    Args:
+        city: City to search
+        chunk_size: Rows fetched from the database at a time
+
+    Yields:
+        Lists of POI dicts (id, name, category, latitude, longitude,
+        district__name and the key fields), one list per duplicate key
+    """
+    duplicate_keys = _keyed_pois(city).values(*KEY_FIELDS).annotate(
+        member_count=Count('id')
+    ).filter(member_count__gt=1)
+
+    members = _keyed_pois(city).filter(
+        Exists(duplicate_keys.filter(**{field: OuterRef(field) for field in KEY_FIELDS}))
+    ).order_by(*KEY_FIELDS, 'id').values(
+        'id', 'name', 'category', 'latitude', 'longitude', 'district__name', *KEY_FIELDS
+    )
+
+    for _, group in groupby(members.iterator(chunk_size=chunk_size),
+                            key=lambda poi: tuple(poi[field] for field in KEY_FIELDS)):
+        yield list(group)
+
+
+def format_key(poi: Dict) -> str:
+    """Return the {name}-{latitude}-{longitude} key of a keyed POI dict."""
+    return f"{poi['key_name']}-{poi['key_latitude']:.{KEY_PRECISION}f}-{poi['key_longitude']:.{KEY_PRECISION}f}"
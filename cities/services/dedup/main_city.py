@@ -0,0 +1,102 @@
+"""
+Service module for folding main city POIs into their district duplicates.
+
+The same listing often appears on a city's main page and on a district page.
+dedup_main_city merges each main city POI (one without a district) into a
+duplicate found elsewhere in the city, keeping the other POI. It works in two
+phases:
+
+1. find_main_city_matches compares main city POIs only with the POIs sharing a
+   blocking grid cell or name token (see dedup.blocking), instead of with
+   every POI in the city.
+2. plan_main_city_merges walks the matches in order, tracking the values each
+   kept POI will have after its earlier merges, and skips matches whose POIs
+   were already merged away. The planned merges are then applied in one
+   merge_pois transaction.
+"""
+
+import logging
+from typing import Callable, Dict, List, Set, Tuple
+
+from .blocking import candidate_pairs
+from .distance import pair_distances
+
+logger = logging.getLogger(__name__)
+
+# (main_poi, other_poi, reasons) for each detected duplicate
+Match = Tuple[dict, dict, List[str]]
+
+
+def find_main_city_matches(pois: List[dict], detect: Callable) -> Tuple[List[Match], int]:
+    """
+    Find duplicates of main city POIs among all the city's POIs.
+
+    Args:
+        pois: POI dicts of the whole city, with id, name, category, latitude,
+            longitude, address, district__name and rank keys
+        detect: Function taking two POI dicts and their distance in metres, returning (is_duplicate, reasons)
+
+    Returns:
+        tuple: (matches in main city POI order then city order, number of pairs compared)
+    """
+    main_positions = {position for position, poi in enumerate(pois) if not poi['district__name']}
+    pairs = candidate_pairs(pois, focus=main_positions)
+
+    matches = []
+    for (i, j), distance in zip(pairs, pair_distances(pois, pairs)):
+        # Between two main city POIs, the earlier one is the one folded into the other
+        main, other = (i, j) if i in main_positions else (j, i)
+        is_duplicate, reasons = detect(pois[main], pois[other], distance=distance)
+        if is_duplicate:
+            matches.append((main, other, reasons))
+
+    matches.sort(key=lambda match: match[:2])
+    return [(pois[main], pois[other], reasons) for main, other, reasons in matches], len(pairs)
+
+
+def plan_main_city_merges(matches: List[Match]) -> List[Tuple[Match, Dict, str]]:
+    """
+    Plan one merge per match, each main city POI into the other POI.
+
+    The kept POI takes the main city POI's name, the district
+    "<district>, Main City" and the lower of the two ranks, computed from the
+    values earlier merges into it will have left rather than the stale rows.
+
+    Returns:
+        One (match, field_selections, skip_reason) per match; field_selections
+        is None when the match is skipped
+    """
+    current: Dict[int, dict] = {}
+    removed: Set[int] = set()
+    plans = []
+
+    for match in matches:
+        main_poi, other_poi, _ = match
+        if main_poi['id'] in removed or other_poi['id'] in removed:
+            plans.append((match, None, "POI already merged"))
+            continue
+
+        # A main city POI may itself have been the kept POI of an earlier merge
+        merged = current.get(main_poi['id'], main_poi)
+        kept = current.setdefault(other_poi['id'], {
+            'name': other_poi['name'], 'rank': other_poi['rank'], 'district__name': other_poi['district__name']
+        })
+        district = kept['district__name']
+        field_selections = {
+            'name': merged['name'],  # Take name from main city POI
+            # Append Main City to district, once
+            'district': district if str(district).endswith(', Main City') else f"{district}, Main City",
+            'rank': min(merged['rank'], kept['rank'])  # Take lower rank
+        }
+        kept.update(name=field_selections['name'], rank=field_selections['rank'],
+                    district__name=field_selections['district'])
+        removed.add(main_poi['id'])
+        plans.append((match, field_selections, None))
+
+    return plans
+
+
+def comparisons_avoided(main_count: int, total_count: int, compared: int) -> int:
+    """Return how many fewer pairs were compared than by comparing each main city POI with every POI."""
+    all_pairs = main_count * (total_count - 1) - main_count * (main_count - 1) // 2
+    return max(all_pairs - compared, 0)
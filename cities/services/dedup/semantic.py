@@ -0,0 +1,232 @@
+"""
+Service module for finding near-duplicate POIs by meaning rather than spelling.
+
+Fuzzy name matching misses pairs like "British Museum" and "The BM, Great
+Russell St". In semantic mode every POI's name, sub-category, address and
+first sentence of description are embedded with a local sentence-embedding
+model (settings.DEDUP_EMBEDDING_MODEL, run on the CPU with transformers, in
+batches). Each POI's nearest neighbours by cosine similarity above
+settings.DEDUP_SEMANTIC_THRESHOLD are surfaced as duplicate candidates for
+review.
+
+Embeddings are cached in PoiEmbedding, keyed by model and a hash of the
+embedded text, so only new or edited POIs are embedded on later runs.
+Neighbours are found with CosineAnnIndex, a random-hyperplane LSH index over
+the city's vectors that re-ranks the POIs sharing a bucket exactly. Small
+cities are searched exhaustively.
+"""
+
+import hashlib
+import logging
+import math
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from ...models import PoiEmbedding
+
+logger = logging.getLogger(__name__)
+
+# Fields semantic_pairs needs on top of the ones duplicate detection loads
+TEXT_FIELDS = ('sub_category', 'description')
+
+DEFAULT_NEIGHBOURS = 5
+
+# Below this many POIs the index compares every pair, which is fast enough and exact
+EXACT_SEARCH_LIMIT = 2000
+
+MAX_TOKENS = 128
+
+
+def first_sentence(text: Optional[str]) -> str:
+    """Return the first sentence of a text."""
+    if not text:
+        return ''
+    return re.split(r'(?<=[.!?])\s+', text.strip(), maxsplit=1)[0]
+
+
+def poi_text(poi: dict) -> str:
+    """Return the text embedded for a POI dict: name, sub-category, address and first sentence of description."""
+    parts = [poi.get('name'), poi.get('sub_category'), poi.get('address'), first_sentence(poi.get('description'))]
+    return '. '.join(part.strip() for part in parts if part and part.strip())
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class SentenceEncoder:
+    """Mean-pooled sentence embeddings from a transformers model, on the CPU."""
+
+    def __init__(self, model_name: str):
+        from transformers import AutoModel, AutoTokenizer
+
+        self.model_name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).eval()
+
+    def encode(self, texts: Sequence[str], batch_size: int = 64) -> np.ndarray:
+        """Return the normalised float32 embeddings of texts, one row per text."""
+        import torch
+
+        batches = []
+        with torch.no_grad():
+            for start in range(0, len(texts), batch_size):
+                inputs = self.tokenizer(list(texts[start:start + batch_size]), padding=True, truncation=True,
+                                        max_length=MAX_TOKENS, return_tensors='pt')
+                hidden = self.model(**inputs).last_hidden_state
+                mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                batches.append(torch.nn.functional.normalize(pooled, dim=1).numpy().astype(np.float32))
+        return np.vstack(batches)
+
+
+@lru_cache(maxsize=2)
+def get_encoder(model_name: str) -> SentenceEncoder:
+    """Load an encoder once per process."""
+    logger.info(f"Loading sentence embedding model {model_name}")
+    return SentenceEncoder(model_name)
+
+
+def embed_pois(pois: Sequence[dict], model_name: Optional[str] = None, encoder=None,
+               batch_size: int = 64) -> np.ndarray:
+    """
+    Return the embeddings of POI dicts, reusing cached ones.
+
+    Args:
+        pois: POI dicts with name, sub_category, address and description keys
+        model_name: Embedding model (defaults to settings.DEDUP_EMBEDDING_MODEL)
+        encoder: Object with an encode(texts, batch_size) method (defaults to the model's SentenceEncoder)
+        batch_size: Texts embedded per forward pass
+
+    Returns:
+        Array of normalised vectors, one row per POI
+    """
+    model_name = model_name or settings.DEDUP_EMBEDDING_MODEL
+    texts = [poi_text(poi) for poi in pois]
+    hashes = [content_hash(text) for text in texts]
+
+    unique_hashes = list(dict.fromkeys(hashes))
+    vectors: Dict[str, np.ndarray] = {}
+    for start in range(0, len(unique_hashes), 500):
+        for embedding in PoiEmbedding.objects.filter(model_name=model_name,
+                                                     content_hash__in=unique_hashes[start:start + 500]):
+            vectors[embedding.content_hash] = np.frombuffer(bytes(embedding.vector), dtype=np.float32)
+
+    missing = [digest for digest in unique_hashes if digest not in vectors]
+    if missing:
+        text_by_hash = dict(zip(hashes, texts))
+        encoded = (encoder or get_encoder(model_name)).encode([text_by_hash[digest] for digest in missing], batch_size)
+        vectors.update(zip(missing, encoded))
+        PoiEmbedding.objects.bulk_create([
+            PoiEmbedding(model_name=model_name, content_hash=digest,
+                         vector=np.asarray(vectors[digest], dtype=np.float32).tobytes())
+            for digest in missing
+        ], batch_size=500, ignore_conflicts=True)
+
+    logger.info(f"Embedded {len(missing)} POI texts, reused {len(unique_hashes) - len(missing)} cached embeddings")
+    if not hashes:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack([vectors[digest] for digest in hashes])
+
+
+class CosineAnnIndex:
+    """
+    Approximate nearest-neighbour index over normalised vectors.
+
+    Each of n_tables hash tables buckets the vectors by the signs of their
+    projections on n_bits random hyperplanes, so similar vectors tend to share
+    a bucket in at least one table. A query is compared exactly against the
+    vectors sharing any of its buckets.
+    """
+
+    def __init__(self, vectors: np.ndarray, n_tables: int = 8, n_bits: Optional[int] = None,
+                 exact_limit: int = EXACT_SEARCH_LIMIT, seed: int = 0):
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        self.tables: Optional[List[Dict[int, np.ndarray]]] = None
+        if len(self.vectors) <= exact_limit:
+            return
+
+        n_bits = n_bits or max(4, min(16, int(math.log2(len(self.vectors) / 8))))
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((n_tables, self.vectors.shape[1], n_bits)).astype(np.float32)
+        self.codes = self._codes(self.vectors)
+        self.tables = []
+        for table_codes in self.codes:
+            buckets = defaultdict(list)
+            for position, code in enumerate(table_codes):
+                buckets[code].append(position)
+            self.tables.append({code: np.array(members) for code, members in buckets.items()})
+
+    def _codes(self, vectors: np.ndarray) -> np.ndarray:
+        """Return the bucket code of every vector in every table, shape (n_tables, len(vectors))."""
+        powers = 1 << np.arange(self.planes.shape[2])
+        return np.stack([((vectors @ planes) > 0) @ powers for planes in self.planes])
+
+    def _candidates(self, position: int) -> np.ndarray:
+        return np.unique(np.concatenate([
+            table[code] for table, code in zip(self.tables, self.codes[:, position])
+        ]))
+
+    def query(self, positions: Iterable[int], k: int = DEFAULT_NEIGHBOURS) -> List[List[Tuple[int, float]]]:
+        """
+        Return the k nearest neighbours of indexed vectors, excluding themselves.
+
+        Returns:
+            One list of (position, cosine similarity) per query, most similar first
+        """
+        positions = list(positions)
+        results = []
+        for start in range(0, len(positions), 256):
+            chunk = positions[start:start + 256]
+            if self.tables is None:
+                similarities = self.vectors[chunk] @ self.vectors.T
+                candidate_rows = [(np.arange(len(self.vectors)), row) for row in similarities]
+            else:
+                candidate_rows = []
+                for position in chunk:
+                    candidates = self._candidates(position)
+                    candidate_rows.append((candidates, self.vectors[candidates] @ self.vectors[position]))
+
+            for position, (candidates, similarities) in zip(chunk, candidate_rows):
+                keep = candidates != position
+                candidates, similarities = candidates[keep], similarities[keep]
+                top = np.argsort(-similarities)[:k]
+                results.append([(int(candidates[i]), float(similarities[i])) for i in top])
+        return results
+
+
+def semantic_pairs(pois: Sequence[dict], focus: Optional[Set[int]] = None, k: int = DEFAULT_NEIGHBOURS,
+                   threshold: Optional[float] = None, model_name: Optional[str] = None,
+                   encoder=None) -> Dict[Tuple[int, int], float]:
+    """
+    Find pairs of POIs whose embeddings are nearest neighbours above a similarity threshold.
+
+    Args:
+        pois: POI dicts with name, sub_category, address and description keys
+        focus: Only look up the neighbours of these positions (default: every POI)
+        k: Neighbours looked up per POI
+        threshold: Minimum cosine similarity (defaults to settings.DEDUP_SEMANTIC_THRESHOLD)
+        model_name: Embedding model (defaults to settings.DEDUP_EMBEDDING_MODEL)
+        encoder: Encoder to use instead of loading the model
+
+    Returns:
+        Dictionary of position pairs (i, j), i < j, to their cosine similarity
+    """
+    if len(pois) < 2:
+        return {}
+    threshold = settings.DEDUP_SEMANTIC_THRESHOLD if threshold is None else threshold
+    index = CosineAnnIndex(embed_pois(pois, model_name=model_name, encoder=encoder))
+
+    positions = sorted(focus) if focus is not None else range(len(pois))
+    pairs = {}
+    for position, neighbours in zip(positions, index.query(positions, k)):
+        for neighbour, similarity in neighbours:
+            if similarity >= threshold:
+                pairs[(min(position, neighbour), max(position, neighbour))] = similarity
+    logger.info(f"Found {len(pairs)} semantic neighbour pairs above {threshold} among {len(pois)} POIs")
+    return pairs
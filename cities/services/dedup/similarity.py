@@ -0,0 +1,91 @@
+"""
+Service module for comparing POI names and addresses.
+
+detect_duplicate_pois compares the same names and addresses many times. Text
+is prepared once per distinct string and cached, and pairs are scored with
+rapidfuzz's C implementation of the Indel ratio. That ratio is never below
+difflib's SequenceMatcher ratio (it counts the longest common subsequence,
+SequenceMatcher a subset of it), so a pair it rejects is always rejected by
+difflib too, and only the few pairs above the threshold are confirmed with
+SequenceMatcher. Decisions are therefore the same as the original
+SequenceMatcher(None, a.lower(), b.lower()).ratio() > threshold check.
+
+normalise_text goes further (accents, punctuation, leading articles). It is
+used for blocking keys, and by similar(..., normalise=True) for callers that
+want looser matching than the original check.
+"""
+
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Optional
+
+DEFAULT_THRESHOLD = 0.85
+
+# Leading words dropped by normalise_text, so "The British Museum" matches "British Museum"
+LEADING_ARTICLES = ('the ', 'le ', 'la ', 'les ', 'el ', 'los ', 'las ', 'il ', 'der ', 'die ', 'das ')
+
+CACHE_SIZE = 100000
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def prepare_text(text: str) -> str:
+    """Return the lower-cased text that similar() compares by default."""
+    return text.lower()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalise_text(text: str) -> str:
+    """Return text lower-cased, without accents, punctuation, extra spaces or a leading article."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    text = ' '.join(re.sub(r'[^\w\s]', ' ', text).split())
+    for article in LEADING_ARTICLES:
+        if text.startswith(article):
+            return text[len(article):]
+    return text
+
+
+def ratio_above(a: str, b: str, threshold: float = DEFAULT_THRESHOLD) -> bool:
+    """Return True if SequenceMatcher's ratio of two prepared strings is above the threshold."""
+    from rapidfuzz import fuzz
+
+    # The Indel ratio is an upper bound of SequenceMatcher's ratio, so this only skips sure rejections
+    if fuzz.ratio(a, b) < threshold * 100 - 1e-9:
+        return False
+    return SequenceMatcher(None, a, b).ratio() > threshold
+
+
+def similar(a: Optional[str], b: Optional[str], threshold: float = DEFAULT_THRESHOLD,
+            normalise: bool = False) -> bool:
+    """
+    Return True if strings a and b are similar enough.
+
+    Args:
+        a: First string, None and empty strings never match
+        b: Second string
+        threshold: Minimum SequenceMatcher ratio (0-1), exclusive
+        normalise: Compare normalise_text forms instead of lower-cased text
+
+    Returns:
+        Whether the pair is above the threshold
+    """
+    if not a or not b:
+        return False
+    prepare = normalise_text if normalise else prepare_text
+    return ratio_above(prepare(a), prepare(b), threshold)
+
+
+def similarity_score(a: Optional[str], b: Optional[str], normalise: bool = False) -> float:
+    """Return SequenceMatcher's ratio (0-1) of two strings, 0 if either is empty."""
+    if not a or not b:
+        return 0.0
+    prepare = normalise_text if normalise else prepare_text
+    return SequenceMatcher(None, prepare(a), prepare(b)).ratio()
+
+
+def clear_caches():
+    """Drop the cached prepared strings."""
+    prepare_text.cache_clear()
+    normalise_text.cache_clear()
@@ -0,0 +1,336 @@
+"""
+Service module for the on-disk OSM feature cache.
+
+Parsing a Geofabrik PBF with Pyrosm takes minutes, and every OSM matching task
+used to repeat it. This module stores the loaded and projected features as
+GeoParquet, keyed by the PBF's path, size, mtime and content hash, so that
+tasks, flow runs and cities sharing the same extract only pay for one parse.
+
+Loads can be clipped to a bounding box (usually the extent of a city's POIs)
+and only the columns the matcher uses are kept, which keeps a worker's peak
+memory to the size of one city rather than a whole country extract.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import resource
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, Any
+
+import pandas as pd
+import geopandas as gpd
+from shapely.geometry import box
+from django.conf import settings
+
+from .osm_matching import NAME_FIELDS, TAG_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cached table layout changes so stale files are not reused
+CACHE_FORMAT_VERSION = 4
+
+PROJECTED_GEOMETRY_COLUMN = 'geometry_3857'
+
+# Columns kept from Pyrosm output; every other tag column is dropped on load
+FEATURE_COLUMNS = ['id', 'osm_type', 'geometry'] + NAME_FIELDS + TAG_FIELDS
+
+# Bounding boxes are snapped outwards to this grid (degrees) so that runs over
+# slightly different POI extents share a cache entry
+BOUNDING_BOX_GRID = 0.01
+
+METERS_PER_DEGREE = 111320
+
+BoundingBox = Tuple[float, float, float, float]
+
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Features already loaded by this process, keyed by cache file name
+_loaded_features: Dict[str, Tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]] = {}
+_loaded_features_lock = threading.Lock()
+MAX_LOADED_FEATURES = 2
+
+
+def get_cache_dir(cache_dir: Optional[str] = None) -> Path:
+    """Return the OSM cache directory, creating it if needed."""
+    path = Path(cache_dir or settings.OSM_CACHE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _hash_file(path: str) -> str:
+    """Return the SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def pbf_fingerprint(pbf_file: str, cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Fingerprint a PBF file by path, size, mtime and content hash.
+
+    Hashing a country extract takes a few seconds, so hashes are remembered in
+    a small index keyed by (path, size, mtime) and only recomputed when the
+    file on disk changes.
+
+    Args:
+        pbf_file: Path to the OSM PBF file
+        cache_dir: Cache directory (defaults to settings.OSM_CACHE_DIR)
+
+    Returns:
+        Dictionary with path, size, mtime_ns and sha256
+    """
+    path = os.path.abspath(pbf_file)
+    stat = os.stat(path)
+    stat_key = f"{path}|{stat.st_size}|{stat.st_mtime_ns}"
+
+    index_path = get_cache_dir(cache_dir) / 'fingerprints.json'
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        index = {}
+
+    sha256 = index.get(stat_key)
+    if not sha256:
+        logger.info(f"Hashing PBF file {path} for the OSM cache...")
+        sha256 = _hash_file(path)
+        index[stat_key] = sha256
+        _write_atomic(index_path, json.dumps(index, indent=2).encode())
+
+    return {
+        'path': path,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': sha256,
+    }
+
+
+def _write_atomic(path: Path, data: bytes):
+    """Write bytes to path via a temporary file so readers never see partial data."""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def bounding_box_from_points(latitudes: Iterable[float], longitudes: Iterable[float],
+                             padding_meters: float = 100) -> Optional[BoundingBox]:
+    """
+    Return the (min_lon, min_lat, max_lon, max_lat) extent of some points, padded by a margin.
+
+    Args:
+        latitudes: Point latitudes
+        longitudes: Point longitudes
+        padding_meters: Margin added on every side, should be at least the match radius
+
+    Returns:
+        Bounding box tuple, or None if there are no points
+    """
+    latitudes = [float(lat) for lat in latitudes if lat is not None]
+    longitudes = [float(lon) for lon in longitudes if lon is not None]
+    if not latitudes or not longitudes:
+        return None
+
+    lat_padding = padding_meters / METERS_PER_DEGREE
+    lon_padding = padding_meters / (METERS_PER_DEGREE * max(math.cos(math.radians(max(map(abs, latitudes)))), 0.01))
+    return (
+        min(longitudes) - lon_padding,
+        min(latitudes) - lat_padding,
+        max(longitudes) + lon_padding,
+        max(latitudes) + lat_padding,
+    )
+
+
+def bounding_box_around(latitude: float, longitude: float, radius_km: float) -> BoundingBox:
+    """Return the bounding box of a square of radius_km around a point, e.g. City.latitude/longitude."""
+    return bounding_box_from_points([latitude], [longitude], padding_meters=radius_km * 1000)
+
+
+def _snap_bounding_box(bounding_box: Optional[BoundingBox]) -> Optional[BoundingBox]:
+    """Snap a bounding box outwards to BOUNDING_BOX_GRID."""
+    if bounding_box is None:
+        return None
+    min_lon, min_lat, max_lon, max_lat = bounding_box
+    return (
+        round(math.floor(min_lon / BOUNDING_BOX_GRID) * BOUNDING_BOX_GRID, 6),
+        round(math.floor(min_lat / BOUNDING_BOX_GRID) * BOUNDING_BOX_GRID, 6),
+        round(math.ceil(max_lon / BOUNDING_BOX_GRID) * BOUNDING_BOX_GRID, 6),
+        round(math.ceil(max_lat / BOUNDING_BOX_GRID) * BOUNDING_BOX_GRID, 6),
+    )
+
+
+def _contains(outer: Optional[BoundingBox], inner: Optional[BoundingBox]) -> bool:
+    """Return True if the outer bounding box (None meaning the whole extract) covers the inner one."""
+    if outer is None:
+        return True
+    if inner is None:
+        return False
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+def peak_memory_mb() -> float:
+    """Return this process's peak resident set size in megabytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def _prune_columns(features: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    """Keep only FEATURE_COLUMNS so tag columns never reach the cache or the matcher."""
+    return features[[column for column in FEATURE_COLUMNS if column in features.columns]]
+
+
+def _parse_pbf(pbf_file: str, bounding_box: Optional[BoundingBox] = None) -> gpd.GeoDataFrame:
+    """
+    Parse POIs and buildings from a PBF file with Pyrosm.
+
+    Args:
+        pbf_file: Path to the OSM PBF file
+        bounding_box: Optional (min_lon, min_lat, max_lon, max_lat) to clip the parse to
+
+    Returns:
+        GeoDataFrame of OSM features in EPSG:4326 with FEATURE_COLUMNS only
+    """
+    from pyrosm import OSM
+
+    logger.info(f"Loading OSM data with Pyrosm (bounding box: {bounding_box or 'full extract'})...")
+    osm = OSM(pbf_file, bounding_box=list(bounding_box) if bounding_box else None)
+
+    # Name and tag fields that Pyrosm does not turn into columns by default
+    extra_attributes = ['name:en', 'brand', 'cuisine', 'contact:phone', 'contact:website']
+
+    # Load multiple types of OSM data, dropping unused tag columns straight away
+    osm_pois = _prune_columns(osm.get_pois(extra_attributes=extra_attributes))
+    logger.info(f"Loaded {len(osm_pois)} POIs from OSM")
+
+    # Also load buildings which might contain POIs
+    try:
+        osm_buildings = _prune_columns(osm.get_buildings(extra_attributes=extra_attributes))
+        logger.info(f"Loaded {len(osm_buildings)} buildings from OSM")
+        # Combine POIs and buildings
+        osm_pois = pd.concat([osm_pois, osm_buildings], ignore_index=True)
+        logger.info(f"Combined total: {len(osm_pois)} OSM features")
+    except Exception as e:
+        logger.warning(f"Could not load buildings: {e}")
+
+    # Remove duplicates based on ID if any and reset indices
+    osm_pois = osm_pois.drop_duplicates(subset=['id'], keep='first').reset_index(drop=True)
+
+    # Ensure OSM POIs are in WGS 84 (Pyrosm already returns EPSG:4326)
+    if osm_pois.crs is None:
+        return osm_pois.set_crs("EPSG:4326")
+    if osm_pois.crs.to_epsg() != 4326:
+        return osm_pois.to_crs("EPSG:4326")
+    return osm_pois
+
+
+def _to_parquet_safe(features: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    """Coerce mixed-type tag columns to strings so they can be written to Parquet."""
+    features = features.copy()
+    for column in features.columns:
+        if column in ('geometry', PROJECTED_GEOMETRY_COLUMN) or features[column].dtype != object:
+            continue
+        features[column] = features[column].map(
+            lambda value: value if value is None or isinstance(value, str) or pd.isna(value) else str(value)
+        )
+    return features
+
+
+def _split_projection(features: gpd.GeoDataFrame) -> Tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+    """Split a cached table into the (EPSG:4326, EPSG:3857) frames the matcher expects."""
+    projected_geometry = features[PROJECTED_GEOMETRY_COLUMN].rename('geometry')
+    osm_pois = features.drop(columns=[PROJECTED_GEOMETRY_COLUMN])
+    osm_projected = osm_pois.set_geometry(projected_geometry)
+    return osm_pois, osm_projected
+
+
+def _find_cached_table(cache_dir: Path, sha256: str, bounding_box: Optional[BoundingBox]) -> Optional[Path]:
+    """Find a cached table of this extract whose bounding box covers the requested one."""
+    for manifest_path in sorted(cache_dir.glob(f"{sha256[:32]}-*-v{CACHE_FORMAT_VERSION}.json")):
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        cached_box = tuple(manifest['bounding_box']) if manifest.get('bounding_box') else None
+        table_path = manifest_path.with_suffix('.parquet')
+        if _contains(cached_box, bounding_box) and table_path.exists():
+            return table_path
+    return None
+
+
+def load_osm_features(pbf_file: str, cache_dir: Optional[str] = None,
+                      bounding_box: Optional[BoundingBox] = None) -> Tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+    """
+    Load OSM features for a PBF file, parsing it only if no cached copy exists.
+
+    Args:
+        pbf_file: Path to the local OSM PBF file
+        cache_dir: Cache directory (defaults to settings.OSM_CACHE_DIR)
+        bounding_box: Optional (min_lon, min_lat, max_lon, max_lat) to clip the features to.
+            It is snapped outwards to a 0.01 degree grid; a cached table covering a larger
+            area (or the whole extract) is reused and clipped instead of re-parsing.
+
+    Returns:
+        tuple: (osm_pois_4326, osm_pois_3857) - OSM data in WGS84 and Web Mercator projections
+    """
+    fingerprint = pbf_fingerprint(pbf_file, cache_dir)
+    bounding_box = _snap_bounding_box(bounding_box)
+    box_key = 'full' if bounding_box is None else hashlib.sha1(json.dumps(bounding_box).encode()).hexdigest()[:12]
+    cache_name = f"{fingerprint['sha256'][:32]}-{box_key}-v{CACHE_FORMAT_VERSION}"
+    cache_dir = get_cache_dir(cache_dir)
+
+    with _loaded_features_lock:
+        if cache_name in _loaded_features:
+            logger.info(f"Using OSM features already loaded in this process ({cache_name})")
+            return _loaded_features[cache_name]
+
+        table_path = _find_cached_table(cache_dir, fingerprint['sha256'], bounding_box)
+        if table_path:
+            logger.info(f"Loading cached OSM features from {table_path}")
+            features = gpd.read_parquet(table_path, bbox=bounding_box)
+            if bounding_box is not None:
+                features = features[features.intersects(box(*bounding_box))].reset_index(drop=True)
+        else:
+            logger.info(f"No OSM cache for {fingerprint['path']}, parsing PBF file")
+            features = _parse_pbf(pbf_file, bounding_box)
+
+            # Pre-project OSM data to Web Mercator for efficient distance calculations
+            logger.info("Projecting OSM data to Web Mercator for distance calculations...")
+            features[PROJECTED_GEOMETRY_COLUMN] = features.geometry.to_crs("EPSG:3857")
+
+            cache_path = cache_dir / f"{cache_name}.parquet"
+            tmp_path = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.tmp")
+            _to_parquet_safe(features).to_parquet(tmp_path, write_covering_bbox=True)
+            os.replace(tmp_path, cache_path)
+            _write_atomic(
+                cache_path.with_suffix('.json'),
+                json.dumps({
+                    **fingerprint,
+                    'bounding_box': bounding_box,
+                    'feature_count': len(features),
+                }, indent=2).encode()
+            )
+            logger.info(f"Cached {len(features)} OSM features to {cache_path}")
+
+        loaded = _split_projection(features)
+
+        while len(_loaded_features) >= MAX_LOADED_FEATURES:
+            _loaded_features.pop(next(iter(_loaded_features)))
+        _loaded_features[cache_name] = loaded
+
+    logger.info(f"Loaded {len(features)} OSM features, peak memory {peak_memory_mb()} MB")
+    return loaded
+
+
+def clear_loaded_features():
+    """Drop features held in memory by this process (the on-disk cache is kept)."""
+    with _loaded_features_lock:
+        _loaded_features.clear()
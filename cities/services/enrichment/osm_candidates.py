@@ -0,0 +1,89 @@
+"""
+Service module for persisting ranked OSM match candidates.
+
+Every matching run stores the top-k candidates of each POI, so re-checks and
+manual corrections can pick another candidate with one indexed query instead
+of reloading OSM data.
+"""
+
+import logging
+from typing import List
+
+import pandas as pd
+import reversion
+from django.db import transaction
+
+from ...models import OsmMatchCandidate, PointOfInterest
+
+logger = logging.getLogger(__name__)
+
+
+def save_osm_matches(pois: List[PointOfInterest], candidates: pd.DataFrame, source: str) -> List[PointOfInterest]:
+    """
+    Save the rank 0 candidate of each POI as its osm_id and replace its stored candidates.
+
+    Args:
+        pois: POIs that were matched in this run
+        candidates: Ranked candidates with poi_id, rank, osm_id, distance, score and tags columns
+        source: Where the candidates came from ('pbf' or 'overpass')
+
+    Returns:
+        List of POIs whose osm_id was set
+    """
+    best = candidates[candidates['rank'] == 0]
+    osm_ids = dict(zip(best['poi_id'], best['osm_id']))
+
+    matched_pois = []
+    for poi in pois:
+        if poi.id in osm_ids:
+            poi.osm_id = osm_ids[poi.id]
+            matched_pois.append(poi)
+
+    new_candidates = [
+        OsmMatchCandidate(
+            poi_id=int(row.poi_id),
+            osm_id=row.osm_id,
+            osm_type=row.osm_id.split('/', 1)[0],
+            rank=int(row.rank),
+            distance=float(row.distance),
+            name_score=float(row.score),
+            tags=row.tags or {},
+            source=source,
+        )
+        for row in candidates.itertuples(index=False)
+    ]
+
+    with transaction.atomic():
+        PointOfInterest.objects.bulk_update(matched_pois, ['osm_id'], batch_size=500)
+        OsmMatchCandidate.objects.filter(poi__in=[poi.id for poi in pois]).delete()
+        OsmMatchCandidate.objects.bulk_create(new_candidates, batch_size=500)
+
+    logger.info(f"Saved {len(new_candidates)} OSM candidates for {len(pois)} POIs ({source})")
+    return matched_pois
+
+
+def select_osm_candidate(candidate: OsmMatchCandidate) -> PointOfInterest:
+    """
+    Use a stored candidate as its POI's OSM ID, promoting it to rank 0.
+
+    Args:
+        candidate: The candidate to select
+
+    Returns:
+        The updated POI
+    """
+    poi = candidate.poi
+    others = list(poi.osm_candidates.exclude(id=candidate.id).order_by('rank'))
+
+    with transaction.atomic(), reversion.create_revision():
+        poi.osm_id = candidate.osm_id
+        poi.save()
+        reversion.set_comment(f"Selected OSM candidate {candidate.osm_id}")
+
+        # Re-rank so the selected candidate comes first and the rest keep their order
+        candidate.rank = 0
+        for rank, other in enumerate(others, start=1):
+            other.rank = rank
+        OsmMatchCandidate.objects.bulk_update([candidate] + others, ['rank'])
+
+    return poi
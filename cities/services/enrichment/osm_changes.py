@@ -0,0 +1,244 @@
+"""
+Service module for refreshing the OSM feature cache from change files.
+
+Geofabrik publishes daily OsmChange (.osc.gz) diffs for every extract. Rather
+than downloading and parsing a new PBF, apply_osm_changes applies the node and
+way creates, modifies and deletes of one or more diffs to the cached tables of
+an extract in place, and returns the features that changed so only the POIs
+near them need to be matched again (see pois_near_changes).
+
+Way geometries are rebuilt from the node locations in the same change files,
+falling back to the cached geometry when only a way's tags changed. A node
+that moves without its ways appearing in the diff does not move those ways.
+"""
+
+import gzip
+import json
+import logging
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from shapely.geometry import LineString, Point, Polygon, box
+
+from . import osm_cache
+from .osm_matching import NAME_FIELDS, TAG_FIELDS, DEFAULT_RADIUS_METERS
+
+logger = logging.getLogger(__name__)
+
+# Tags that make Pyrosm keep a feature as a POI or building; other elements are not cached
+FEATURE_TAG_KEYS = ['amenity', 'shop', 'tourism', 'leisure', 'historic', 'building', 'office', 'craft']
+
+CHANGE_ACTIONS = ('create', 'modify', 'delete')
+
+ElementKey = Tuple[str, int]
+
+
+def _open_change_file(path: str):
+    """Open an OsmChange file, decompressing .gz files."""
+    return gzip.open(path, 'rb') if str(path).endswith('.gz') else open(path, 'rb')
+
+
+def parse_change_files(change_files: List[str]) -> Tuple[Dict[ElementKey, Optional[dict]], Dict[int, Tuple[float, float]]]:
+    """
+    Parse OsmChange files into the final state of every changed node and way.
+
+    Files are applied in the order given and elements in document order, so the
+    last change to an element wins. Relations are ignored.
+
+    Args:
+        change_files: Paths to .osc or .osc.gz files, oldest first
+
+    Returns:
+        tuple: (elements, node_locations) - elements maps (osm_type, id) to a dict
+        with tags (and lon/lat for nodes, node refs for ways), or None if the
+        element was deleted; node_locations maps node IDs to (lon, lat)
+    """
+    elements: Dict[ElementKey, Optional[dict]] = {}
+    node_locations: Dict[int, Tuple[float, float]] = {}
+
+    for change_file in change_files:
+        with _open_change_file(change_file) as f:
+            for _, action in ET.iterparse(f, events=('end',)):
+                if action.tag not in CHANGE_ACTIONS:
+                    continue
+                for element in action:
+                    if element.tag not in ('node', 'way'):
+                        continue
+                    key = (element.tag, int(element.get('id')))
+                    if action.tag == 'delete':
+                        elements[key] = None
+                        if element.tag == 'node':
+                            node_locations.pop(key[1], None)
+                        continue
+
+                    state = {'tags': {tag.get('k'): tag.get('v') for tag in element.iter('tag')}}
+                    if element.tag == 'node':
+                        state['lon'], state['lat'] = float(element.get('lon')), float(element.get('lat'))
+                        node_locations[key[1]] = (state['lon'], state['lat'])
+                    else:
+                        state['refs'] = [int(nd.get('ref')) for nd in element.iter('nd')]
+                    elements[key] = state
+                # Elements are handled per action block, so free them as we go
+                action.clear()
+
+    logger.info(f"Parsed {len(elements)} changed nodes and ways from {len(change_files)} change files")
+    return elements, node_locations
+
+
+def _is_feature(tags: dict) -> bool:
+    """Return True if an element's tags make it a cached POI or building."""
+    return any(tags.get(key) for key in FEATURE_TAG_KEYS)
+
+
+def _way_geometry(refs: List[int], node_locations: Dict[int, Tuple[float, float]]):
+    """Build a way's geometry from node locations, or None if any node is unknown."""
+    if len(refs) < 2 or any(ref not in node_locations for ref in refs):
+        return None
+    coords = [node_locations[ref] for ref in refs]
+    if refs[0] == refs[-1] and len(refs) >= 4:
+        return Polygon(coords)
+    return LineString(coords)
+
+
+def _changed_rows(elements: Dict[ElementKey, Optional[dict]], node_locations: Dict[int, Tuple[float, float]],
+                  cached: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    """Build feature rows (EPSG:4326, FEATURE_COLUMNS) for created and modified elements that are still features."""
+    cached_geometry = dict(zip(zip(cached['osm_type'], cached['id'].astype(int)), cached.geometry))
+
+    rows, geometries = [], []
+    for (osm_type, osm_id), state in elements.items():
+        if state is None or not _is_feature(state['tags']):
+            continue
+        if osm_type == 'node':
+            geometry = Point(state['lon'], state['lat'])
+        else:
+            geometry = _way_geometry(state['refs'], node_locations) or cached_geometry.get((osm_type, osm_id))
+            if geometry is None:
+                logger.warning(f"Skipping way/{osm_id}: its nodes are not in the change files or the cache")
+                continue
+        row = {'id': osm_id, 'osm_type': osm_type}
+        for field in NAME_FIELDS + TAG_FIELDS:
+            row[field] = state['tags'].get(field)
+        rows.append(row)
+        geometries.append(geometry)
+
+    columns = [column for column in osm_cache.FEATURE_COLUMNS if column != 'geometry']
+    return gpd.GeoDataFrame(pd.DataFrame(rows, columns=columns), geometry=geometries, crs="EPSG:4326")
+
+
+def _apply_to_table(features: gpd.GeoDataFrame, elements: Dict[ElementKey, Optional[dict]],
+                    node_locations: Dict[int, Tuple[float, float]],
+                    bounding_box: Optional[osm_cache.BoundingBox]) -> Tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+    """
+    Apply parsed changes to one cached table.
+
+    Returns:
+        tuple: (features, changed) - the updated table, and the removed and added
+        rows (EPSG:4326) whose locations need re-matching
+    """
+    keys = pd.Series(list(zip(features['osm_type'], features['id'].astype(int))), index=features.index)
+    touched = keys.isin(set(elements))
+    removed = features[touched]
+
+    added = _changed_rows(elements, node_locations, features)
+    if bounding_box is not None and len(added):
+        added = added[added.intersects(box(*bounding_box))]
+    added = added.reset_index(drop=True)
+    added[osm_cache.PROJECTED_GEOMETRY_COLUMN] = added.geometry.to_crs("EPSG:3857")
+    added = osm_cache._to_parquet_safe(added)
+
+    updated = pd.concat([features[~touched], added], ignore_index=True)
+    updated = gpd.GeoDataFrame(updated, geometry='geometry', crs="EPSG:4326")
+
+    changed = pd.concat(
+        [removed[['id', 'osm_type', 'geometry']], added[['id', 'osm_type', 'geometry']]], ignore_index=True
+    )
+    return updated, gpd.GeoDataFrame(changed, geometry='geometry', crs="EPSG:4326")
+
+
+def apply_osm_changes(pbf_file: str, change_files: List[str], cache_dir: Optional[str] = None) -> gpd.GeoDataFrame:
+    """
+    Apply OsmChange files to every cached table of a PBF extract in place.
+
+    Change files already applied to a table (by content hash, recorded in its
+    manifest) are skipped, so a directory of daily diffs can be re-applied safely.
+
+    Args:
+        pbf_file: Path to the OSM PBF file whose cache should be refreshed
+        change_files: Paths to .osc or .osc.gz files, oldest first
+        cache_dir: Cache directory (defaults to settings.OSM_CACHE_DIR)
+
+    Returns:
+        GeoDataFrame (EPSG:4326) of the old and new versions of every changed feature
+    """
+    fingerprint = osm_cache.pbf_fingerprint(pbf_file, cache_dir)
+    cache_path = osm_cache.get_cache_dir(cache_dir)
+    change_hashes = {change_file: osm_cache._hash_file(change_file) for change_file in change_files}
+
+    changed_tables = []
+    manifests = sorted(cache_path.glob(f"{fingerprint['sha256'][:32]}-*-v{osm_cache.CACHE_FORMAT_VERSION}.json"))
+    for manifest_path in manifests:
+        table_path = manifest_path.with_suffix('.parquet')
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if not table_path.exists():
+            continue
+
+        pending = [change_file for change_file in change_files
+                   if change_hashes[change_file] not in manifest.get('applied_changes', [])]
+        if not pending:
+            logger.info(f"{table_path.name} is already up to date")
+            continue
+
+        elements, node_locations = parse_change_files(pending)
+        bounding_box = tuple(manifest['bounding_box']) if manifest.get('bounding_box') else None
+        features, changed = _apply_to_table(gpd.read_parquet(table_path), elements, node_locations, bounding_box)
+
+        tmp_path = table_path.with_name(f".{table_path.name}.tmp")
+        features.to_parquet(tmp_path, write_covering_bbox=True)
+        tmp_path.replace(table_path)
+        manifest['applied_changes'] = manifest.get('applied_changes', []) + [change_hashes[f] for f in pending]
+        manifest['feature_count'] = len(features)
+        osm_cache._write_atomic(manifest_path, json.dumps(manifest, indent=2).encode())
+
+        logger.info(f"Applied {len(pending)} change files to {table_path.name}: {len(changed)} changed feature versions")
+        changed_tables.append(changed)
+
+    # Features loaded before the update are stale
+    osm_cache.clear_loaded_features()
+
+    if not changed_tables:
+        return gpd.GeoDataFrame({'id': [], 'osm_type': []}, geometry=[], crs="EPSG:4326")
+    changed = pd.concat(changed_tables, ignore_index=True)
+    return gpd.GeoDataFrame(changed, geometry='geometry', crs="EPSG:4326")
+
+
+def pois_near_changes(targets: pd.DataFrame, changed: gpd.GeoDataFrame,
+                      radius_meters: float = DEFAULT_RADIUS_METERS) -> List[int]:
+    """
+    Return the IDs of POIs within the match radius of a changed feature's old or new location.
+
+    Args:
+        targets: DataFrame with poi_id, latitude and longitude columns
+        changed: Output of apply_osm_changes
+        radius_meters: Match radius in meters
+
+    Returns:
+        List of poi_id values to re-match
+    """
+    if len(targets) == 0 or len(changed) == 0:
+        return []
+
+    target_geometry = gpd.GeoSeries(
+        gpd.points_from_xy(targets['longitude'], targets['latitude']), crs="EPSG:4326"
+    ).to_crs("EPSG:3857")
+    changed_projected = changed.geometry.to_crs("EPSG:3857")
+
+    target_idx, _ = changed_projected.sindex.query(
+        target_geometry.to_numpy(), predicate='dwithin', distance=radius_meters
+    )
+    return targets['poi_id'].to_numpy()[np.unique(target_idx)].tolist()
+
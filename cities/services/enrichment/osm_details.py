@@ -0,0 +1,135 @@
+"""
+Service module for filling POI details from matched OSM features.
+
+Matched OSM features often carry opening hours, phone numbers, websites and
+addresses. Empty hours, phone, website and address fields are filled from the
+tags stored with each POI's winning OSM match candidate, falling back to the
+cached feature table for POIs matched before candidates were stored. This
+saves a Mapbox reverse-geocoding call for every address found locally.
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.db.models import F
+
+from ...models import OsmMatchCandidate, PointOfInterest
+from ..dedup.candidates import bulk_update_pois
+from .osm_cache import load_osm_features, bounding_box_from_points
+from .osm_matching import feature_tags, feature_osm_ids
+
+logger = logging.getLogger(__name__)
+
+DETAIL_FIELDS = ['hours', 'phone', 'website', 'address']
+
+
+def _field_limit(field: str) -> int:
+    """Return the max_length of a PointOfInterest field."""
+    return PointOfInterest._meta.get_field(field).max_length
+
+
+def _first_value(tags: dict, *keys: str) -> Optional[str]:
+    """Return the first non-empty tag value, taking the first entry of ';' separated lists."""
+    for key in keys:
+        value = (tags.get(key) or '').split(';')[0].strip()
+        if value:
+            return value
+    return None
+
+
+def format_address(tags: dict) -> Optional[str]:
+    """Build a one-line address from addr:* tags, e.g. '12 High Street, SW1A 1AA London'."""
+    if tags.get('addr:full'):
+        return tags['addr:full'].strip()
+    street = tags.get('addr:street')
+    if not street:
+        return None
+    first_line = ' '.join(part for part in [tags.get('addr:housenumber'), street] if part)
+    second_line = ' '.join(part for part in [tags.get('addr:postcode'), tags.get('addr:city')] if part)
+    return ', '.join(line for line in [first_line, second_line] if line)
+
+
+def details_from_tags(tags: dict) -> Dict[str, str]:
+    """
+    Map OSM tags to PointOfInterest detail fields.
+
+    Args:
+        tags: OSM tags of the matched feature
+
+    Returns:
+        Dictionary with any of hours, phone, website and address, values that do
+        not fit the model fields are left out
+    """
+    website = _first_value(tags, 'website', 'contact:website', 'url')
+    if website and not website.startswith(('http://', 'https://')):
+        website = f"https://{website}"
+
+    details = {
+        'hours': _first_value(tags, 'opening_hours'),
+        'phone': _first_value(tags, 'phone', 'contact:phone'),
+        'website': website,
+        'address': format_address(tags),
+    }
+    return {
+        field: value for field, value in details.items()
+        if value and len(value) <= _field_limit(field)
+    }
+
+
+def osm_tags_for_pois(pois: List[PointOfInterest], pbf_file: Optional[str] = None) -> Dict[int, dict]:
+    """
+    Get the OSM tags of each POI's matched feature.
+
+    Tags come from the stored rank 0 match candidates in one query. POIs without
+    a stored candidate are looked up by osm_id in the cached features of pbf_file.
+
+    Args:
+        pois: POIs with an osm_id
+        pbf_file: Optional PBF file for POIs matched before candidates were stored
+
+    Returns:
+        Dictionary of POI id to tags
+    """
+    tags_by_poi = dict(
+        OsmMatchCandidate.objects.filter(poi__in=pois, osm_id=F('poi__osm_id')).values_list('poi_id', 'tags')
+    )
+
+    missing = [poi for poi in pois if poi.id not in tags_by_poi and poi.latitude is not None]
+    if missing and pbf_file:
+        bounding_box = bounding_box_from_points([poi.latitude for poi in missing], [poi.longitude for poi in missing])
+        osm_pois, _ = load_osm_features(pbf_file, bounding_box=bounding_box)
+        positions = {osm_id: position for position, osm_id in enumerate(feature_osm_ids(osm_pois))}
+        found = [poi for poi in missing if poi.osm_id in positions]
+        tags = feature_tags(osm_pois, np.array([positions[poi.osm_id] for poi in found], dtype=int))
+        tags_by_poi.update({poi.id: poi_tags for poi, poi_tags in zip(found, tags)})
+
+    return tags_by_poi
+
+
+def fill_poi_details(pois: List[PointOfInterest], tags_by_poi: Dict[int, dict]) -> Tuple[List[PointOfInterest], Dict[str, int]]:
+    """
+    Fill empty detail fields of POIs from OSM tags and save them in bulk.
+
+    Args:
+        pois: POIs to fill
+        tags_by_poi: Dictionary of POI id to OSM tags
+
+    Returns:
+        tuple: (updated_pois, filled) - the POIs that changed and the number of values filled per field
+    """
+    filled = {field: 0 for field in DETAIL_FIELDS}
+    updated_pois = []
+    for poi in pois:
+        details = details_from_tags(tags_by_poi.get(poi.id) or {})
+        changed = False
+        for field, value in details.items():
+            if not getattr(poi, field):
+                setattr(poi, field, value)
+                filled[field] += 1
+                changed = True
+        if changed:
+            updated_pois.append(poi)
+
+    bulk_update_pois(updated_pois, DETAIL_FIELDS)
+    return updated_pois, filled
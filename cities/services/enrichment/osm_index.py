@@ -0,0 +1,175 @@
+"""
+Service module for the shared local OSM index.
+
+Each Celery or Prefect worker process that matches POIs would otherwise hold
+its own copy of the OSM GeoDataFrames. The osm_index_server management command
+runs OsmIndexServer, which loads the features once and answers batched match
+requests over localhost HTTP. Workers use match_pois_remote as a backend when
+settings.OSM_INDEX_URL is set.
+
+Protocol (JSON over HTTP):
+    GET  /health -> {"status": "ok", "loaded": [<pbf paths>]}
+    POST /match  <- {"pbf_file", "bounding_box", "radius_meters", "name_threshold", "top_k",
+                     "pois": [{"poi_id", "name", "latitude", "longitude"}, ...]}
+                 -> {"status": "success",
+                     "candidates": [{"poi_id", "rank", "osm_id", "distance", "score", "tags"}, ...]}
+"""
+
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+import requests
+import geopandas as gpd
+
+from .osm_cache import load_osm_features, BoundingBox
+from .osm_matching import (
+    rank_match_candidates, DEFAULT_RADIUS_METERS, DEFAULT_NAME_THRESHOLD, DEFAULT_TOP_K, CANDIDATE_COLUMNS
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+
+# Matching a few thousand POIs is fast; loading an unknown PBF on demand is not
+REQUEST_TIMEOUT = 600
+
+
+class OsmIndexServer(ThreadingHTTPServer):
+    """
+    HTTP server holding OSM features in memory for every worker on the machine.
+
+    Preloaded extracts are kept whole, so any bounding box can be matched
+    against them. Other extracts are loaded on demand through the OSM cache,
+    clipped to the requested bounding box.
+    """
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], pbf_files: Iterable[str] = (), cache_dir: Optional[str] = None):
+        super().__init__(address, OsmIndexRequestHandler)
+        self.cache_dir = cache_dir
+        self.features: Dict[str, Tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]] = {}
+        self.features_lock = threading.Lock()
+        for pbf_file in pbf_files:
+            self.preload(pbf_file)
+
+    def preload(self, pbf_file: str):
+        """Load a whole extract and build its spatial index up front."""
+        osm_pois, osm_projected = load_osm_features(pbf_file, self.cache_dir)
+        osm_projected.sindex
+        self.features[os.path.abspath(pbf_file)] = (osm_pois, osm_projected)
+        logger.info(f"OSM index holds {len(osm_pois)} features from {pbf_file}")
+
+    def get_features(self, pbf_file: str, bounding_box: Optional[BoundingBox]) -> Tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+        """Return the features for an extract, loading it if it was not preloaded."""
+        path = os.path.abspath(pbf_file)
+        if path in self.features:
+            return self.features[path]
+        if not os.path.isfile(path):
+            raise ValueError(f"PBF file not found at path: {pbf_file}")
+        with self.features_lock:
+            # Build the STRtree under the lock so concurrent requests do not race to create it
+            osm_pois, osm_projected = load_osm_features(path, self.cache_dir, bounding_box=bounding_box)
+            osm_projected.sindex
+        return osm_pois, osm_projected
+
+    def match(self, payload: dict) -> pd.DataFrame:
+        """Rank the OSM candidates for a batch of POIs described by a /match request payload."""
+        bounding_box = tuple(payload['bounding_box']) if payload.get('bounding_box') else None
+        osm_pois, osm_projected = self.get_features(payload['pbf_file'], bounding_box)
+        targets = pd.DataFrame(payload.get('pois', []), columns=['poi_id', 'name', 'latitude', 'longitude'])
+        return rank_match_candidates(
+            targets, osm_pois, osm_projected,
+            radius_meters=payload.get('radius_meters', DEFAULT_RADIUS_METERS),
+            name_threshold=payload.get('name_threshold', DEFAULT_NAME_THRESHOLD),
+            top_k=payload.get('top_k', DEFAULT_TOP_K)
+        )
+
+
+class OsmIndexRequestHandler(BaseHTTPRequestHandler):
+    """Request handler for OsmIndexServer."""
+
+    def _send_json(self, status: int, data: dict):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_json(404, {'status': 'error', 'message': f'Unknown path {self.path}'})
+            return
+        self._send_json(200, {'status': 'ok', 'loaded': list(self.server.features)})
+
+    def do_POST(self):
+        if self.path != '/match':
+            self._send_json(404, {'status': 'error', 'message': f'Unknown path {self.path}'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length))
+            candidates = self.server.match(payload)
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {'status': 'error', 'message': str(e)})
+            return
+        except Exception as e:
+            logger.exception("OSM index match failed")
+            self._send_json(500, {'status': 'error', 'message': str(e)})
+            return
+        self._send_json(200, {'status': 'success', 'candidates': candidates.to_dict(orient='records')})
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def match_pois_remote(url: str, pbf_file: str, targets: pd.DataFrame, bounding_box: Optional[BoundingBox] = None,
+                      radius_meters: float = DEFAULT_RADIUS_METERS,
+                      name_threshold: float = DEFAULT_NAME_THRESHOLD,
+                      top_k: int = DEFAULT_TOP_K) -> pd.DataFrame:
+    """
+    Rank the OSM candidates for a batch of POIs using a running OSM index server.
+
+    Args:
+        url: Base URL of the server, e.g. http://127.0.0.1:8765
+        pbf_file: Path to the OSM PBF file, as seen by the server
+        targets: DataFrame with poi_id, name, latitude and longitude columns
+        bounding_box: Optional (min_lon, min_lat, max_lon, max_lat) for extracts that are not preloaded
+        radius_meters: Search radius in meters
+        name_threshold: Minimum name score (0-100) for a name match to win
+        top_k: Number of ranked candidates to keep per POI
+
+    Returns:
+        DataFrame of (poi_id, rank, osm_id, distance, score, tags), rank 0 being the match
+
+    Raises:
+        requests.RequestException: If the server cannot be reached or rejects the request
+    """
+    pois = [
+        {
+            'poi_id': int(row.poi_id),
+            'name': row.name if isinstance(row.name, str) else None,
+            'latitude': float(row.latitude),
+            'longitude': float(row.longitude),
+        }
+        for row in targets.itertuples(index=False)
+    ]
+    response = requests.post(
+        f"{url.rstrip('/')}/match",
+        json={
+            'pbf_file': os.path.abspath(pbf_file),
+            'bounding_box': list(bounding_box) if bounding_box else None,
+            'radius_meters': radius_meters,
+            'name_threshold': name_threshold,
+            'top_k': top_k,
+            'pois': pois,
+        },
+        timeout=REQUEST_TIMEOUT
+    )
+    response.raise_for_status()
+    return pd.DataFrame(response.json()['candidates'], columns=CANDIDATE_COLUMNS)
@@ -0,0 +1,327 @@
+"""
+Service module for matching POIs to OSM features in bulk.
+
+Instead of filtering the OSM frames once per POI, all target POIs are
+projected together, joined to nearby features through the spatial index in a
+single query, and winners are picked per POI with grouped DataFrame
+operations. The selection rules are the same as find_closest_osm_poi_optimized:
+the best name match (score >= threshold) within the radius wins, otherwise the
+closest node or way.
+"""
+
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RADIUS_METERS = 20
+DEFAULT_NAME_THRESHOLD = 60
+
+# Name fields to check in order of preference
+NAME_FIELDS = ['name', 'name:en', 'brand', 'addr:housename']
+
+# Descriptive, contact and address tags kept with each candidate, so it can be reviewed and
+# used to fill POI details (see osm_details) without reloading OSM data
+TAG_FIELDS = [
+    'amenity', 'shop', 'tourism', 'leisure', 'historic', 'cuisine',
+    'opening_hours', 'phone', 'contact:phone', 'website', 'contact:website', 'url',
+    'addr:full', 'addr:housenumber', 'addr:street', 'addr:postcode', 'addr:city',
+]
+
+MATCH_COLUMNS = ['poi_id', 'osm_id', 'distance', 'score']
+
+# Number of candidates kept per POI by rank_match_candidates
+DEFAULT_TOP_K = 5
+
+CANDIDATE_COLUMNS = ['poi_id', 'rank', 'osm_id', 'distance', 'score', 'tags']
+
+
+def _osm_types(osm_pois: gpd.GeoDataFrame) -> np.ndarray:
+    """Return the OSM element type for every feature, defaulting to node."""
+    if 'osm_type' in osm_pois.columns:
+        return osm_pois['osm_type'].to_numpy()
+    if 'type' in osm_pois.columns:
+        return osm_pois['type'].to_numpy()
+    return np.full(len(osm_pois), 'node', dtype=object)
+
+
+def feature_osm_ids(osm_pois: gpd.GeoDataFrame) -> List[str]:
+    """Return the "type/id" OSM ID string of every feature, as stored on PointOfInterest.osm_id."""
+    return [f"{osm_type}/{osm_id}" for osm_type, osm_id in zip(_osm_types(osm_pois), osm_pois['id'].to_numpy())]
+
+
+def _clean_name(value) -> Optional[str]:
+    """Return a stripped name, or None for missing and blank values."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return str(value).strip() or None
+
+
+def _prepare_names(values) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Normalise names once for scoring, the way thefuzz's token_sort_ratio would.
+
+    Returns:
+        tuple: (processed, valid) - processed names ('' for missing ones) and a mask
+        of names that were present, so missing names can be scored as 0
+    """
+    from thefuzz import utils
+
+    processed = np.full(len(values), '', dtype=object)
+    valid = np.zeros(len(values), dtype=bool)
+    seen = {}
+    for i, value in enumerate(values):
+        name = _clean_name(value)
+        if name is None:
+            continue
+        if name not in seen:
+            seen[name] = utils.full_process(name, force_ascii=True)
+        processed[i] = seen[name]
+        valid[i] = True
+    return processed, valid
+
+
+def _round_scores(scores: np.ndarray) -> np.ndarray:
+    """Round scores half to even, like thefuzz's int(round(score))."""
+    return np.rint(scores)
+
+
+def score_name_matrix(poi_names: List[Optional[str]], osm_pois: pd.DataFrame) -> np.ndarray:
+    """
+    Score every POI name against every OSM feature in one call per name field.
+
+    Scores match thefuzz.fuzz.token_sort_ratio, taking the best across NAME_FIELDS.
+
+    Args:
+        poi_names: Names of the target POIs
+        osm_pois: DataFrame of candidate OSM features
+
+    Returns:
+        Array of shape (len(poi_names), len(osm_pois)) with scores from 0 to 100
+    """
+    from rapidfuzz import fuzz, process
+
+    poi_processed, poi_valid = _prepare_names(poi_names)
+    scores = np.zeros((len(poi_names), len(osm_pois)), dtype=float)
+    if not poi_valid.any() or len(osm_pois) == 0:
+        return scores
+
+    for field in NAME_FIELDS:
+        if field not in osm_pois.columns:
+            continue
+        osm_processed, osm_valid = _prepare_names(osm_pois[field].to_numpy())
+        if not osm_valid.any():
+            continue
+        field_scores = process.cdist(
+            poi_processed, osm_processed, scorer=fuzz.token_sort_ratio, dtype=np.float64, workers=-1
+        )
+        field_scores[~poi_valid, :] = 0
+        field_scores[:, ~osm_valid] = 0
+        np.maximum(scores, _round_scores(field_scores), out=scores)
+    return scores
+
+
+def score_name_pairs(poi_names: List[Optional[str]], osm_pois: pd.DataFrame, osm_positions: np.ndarray) -> np.ndarray:
+    """
+    Score (POI name, OSM feature) pairs, as produced by a spatial join, in one call per name field.
+
+    Args:
+        poi_names: Name of the target POI for each pair
+        osm_pois: DataFrame of OSM features
+        osm_positions: Row position in osm_pois for each pair
+
+    Returns:
+        Array with the best token_sort_ratio across NAME_FIELDS for each pair
+    """
+    from rapidfuzz import fuzz, process
+
+    poi_processed, poi_valid = _prepare_names(poi_names)
+    scores = np.zeros(len(poi_names), dtype=float)
+    if not poi_valid.any():
+        return scores
+
+    for field in NAME_FIELDS:
+        if field not in osm_pois.columns:
+            continue
+        osm_processed, osm_valid = _prepare_names(osm_pois[field].to_numpy()[osm_positions])
+        pair_valid = poi_valid & osm_valid
+        if not pair_valid.any():
+            continue
+        field_scores = process.cpdist(
+            poi_processed[pair_valid], osm_processed[pair_valid], scorer=fuzz.token_sort_ratio,
+            dtype=np.float64, workers=-1
+        )
+        scores[pair_valid] = np.maximum(scores[pair_valid], _round_scores(field_scores))
+    return scores
+
+
+def find_match_candidates(targets: pd.DataFrame, osm_pois: gpd.GeoDataFrame, osm_projected: gpd.GeoDataFrame,
+                          radius_meters: float = DEFAULT_RADIUS_METERS) -> pd.DataFrame:
+    """
+    Find every node/way within the radius of each target POI in one spatial join.
+
+    Args:
+        targets: DataFrame with poi_id, name, latitude and longitude columns
+        osm_pois: GeoDataFrame of OSM POIs in EPSG:4326
+        osm_projected: GeoDataFrame of OSM POIs in EPSG:3857
+        radius_meters: Search radius in meters
+
+    Returns:
+        DataFrame with one row per candidate pair: target (row position in
+        targets), poi_id, osm_position (row position in osm_pois), osm_id,
+        distance and score, ordered by target then distance
+    """
+    columns = ['target', 'poi_id', 'osm_position', 'osm_id', 'distance', 'score']
+    if len(targets) == 0 or len(osm_projected) == 0:
+        return pd.DataFrame(columns=columns)
+
+    # Project all target POIs at once
+    target_geometry = gpd.GeoSeries(
+        gpd.points_from_xy(targets['longitude'], targets['latitude']), crs="EPSG:4326"
+    ).to_crs("EPSG:3857").to_numpy()
+
+    # Single spatial join against the features' STRtree
+    target_idx, osm_idx = osm_projected.sindex.query(target_geometry, predicate='dwithin', distance=radius_meters)
+
+    # Filter to only include nodes and ways (exclude relations)
+    osm_types = _osm_types(osm_pois)
+    keep = np.isin(osm_types[osm_idx], ['node', 'way'])
+    target_idx, osm_idx = target_idx[keep], osm_idx[keep]
+
+    distances = shapely.distance(target_geometry[target_idx], osm_projected.geometry.to_numpy()[osm_idx])
+
+    poi_names = targets['name'].to_numpy()[target_idx]
+    poi_names = [name.strip() if isinstance(name, str) else None for name in poi_names]
+
+    candidates = pd.DataFrame({
+        'target': target_idx,
+        'poi_id': targets['poi_id'].to_numpy()[target_idx],
+        'osm_position': osm_idx,
+        'osm_id': [f"{osm_type}/{osm_id}" for osm_type, osm_id in
+                   zip(osm_types[osm_idx], osm_pois['id'].to_numpy()[osm_idx])],
+        'distance': distances,
+        'score': score_name_pairs(poi_names, osm_pois, osm_idx),
+    }, columns=columns)
+
+    return candidates.sort_values(['target', 'distance', 'osm_position']).reset_index(drop=True)
+
+
+def rank_candidates(candidates: pd.DataFrame, name_threshold: float = DEFAULT_NAME_THRESHOLD) -> pd.DataFrame:
+    """
+    Rank the candidates of each target: name matches at or above the threshold
+    first (best score, then closest), then the rest by distance. Rank 0 is the
+    candidate find_closest_osm_poi_optimized would pick.
+
+    Args:
+        candidates: Output of find_match_candidates
+        name_threshold: Minimum name score (0-100) for a name match to win
+
+    Returns:
+        Candidates with a rank column, ordered by target then rank
+    """
+    if len(candidates) == 0:
+        return candidates.assign(rank=pd.Series(dtype=int))
+
+    named = candidates['score'] >= name_threshold
+    ranked = candidates.assign(_named=named, _named_score=np.where(named, candidates['score'], 0)).sort_values(
+        ['target', '_named', '_named_score', 'distance', 'osm_position'],
+        ascending=[True, False, False, True, True], kind='stable'
+    )
+    ranked['rank'] = ranked.groupby('target', sort=False).cumcount()
+    return ranked.drop(columns=['_named', '_named_score']).reset_index(drop=True)
+
+
+def pick_best_candidates(candidates: pd.DataFrame, name_threshold: float = DEFAULT_NAME_THRESHOLD) -> pd.DataFrame:
+    """
+    Pick one winning candidate per target: the best name match at or above the
+    threshold (closest first on ties), otherwise the closest feature.
+
+    Args:
+        candidates: Output of find_match_candidates
+        name_threshold: Minimum name score (0-100) for a name match to win
+
+    Returns:
+        Subset of candidates with one row per matched target
+    """
+    ranked = rank_candidates(candidates, name_threshold)
+    return ranked[ranked['rank'] == 0].drop(columns=['rank']).reset_index(drop=True)
+
+
+def feature_tags(osm_pois: pd.DataFrame, osm_positions: np.ndarray) -> List[dict]:
+    """Collect the non-empty name and descriptive tags of the given features."""
+    fields = [field for field in NAME_FIELDS + TAG_FIELDS if field in osm_pois.columns]
+    values = {field: osm_pois[field].to_numpy()[osm_positions] for field in fields}
+    tags = []
+    for i in range(len(osm_positions)):
+        tags.append({
+            field: str(values[field][i]) for field in fields
+            if _clean_name(values[field][i]) is not None
+        })
+    return tags
+
+
+def rank_match_candidates(targets: pd.DataFrame, osm_pois: gpd.GeoDataFrame, osm_projected: gpd.GeoDataFrame,
+                          radius_meters: float = DEFAULT_RADIUS_METERS,
+                          name_threshold: float = DEFAULT_NAME_THRESHOLD,
+                          top_k: int = DEFAULT_TOP_K) -> pd.DataFrame:
+    """
+    Find the top-k ranked OSM candidates for a whole batch of POIs.
+
+    Args:
+        targets: DataFrame with poi_id, name, latitude and longitude columns
+        osm_pois: GeoDataFrame of OSM POIs in EPSG:4326
+        osm_projected: GeoDataFrame of OSM POIs in EPSG:3857
+        radius_meters: Search radius in meters
+        name_threshold: Minimum name score (0-100) for a name match to win
+        top_k: Number of candidates to keep per POI
+
+    Returns:
+        DataFrame of (poi_id, rank, osm_id, distance, score, tags), rank 0 being the match
+    """
+    candidates = find_match_candidates(targets, osm_pois, osm_projected, radius_meters)
+    ranked = rank_candidates(candidates, name_threshold)
+    ranked = ranked[ranked['rank'] < top_k].reset_index(drop=True)
+    ranked['tags'] = feature_tags(osm_pois, ranked['osm_position'].to_numpy(dtype=int))
+    logger.info(f"Matched {(ranked['rank'] == 0).sum()}/{len(targets)} POIs from {len(candidates)} OSM candidates")
+    return ranked[CANDIDATE_COLUMNS]
+
+
+def winning_matches(ranked: pd.DataFrame) -> pd.DataFrame:
+    """Return the rank 0 candidate of each POI as (poi_id, osm_id, distance, score)."""
+    if len(ranked) == 0:
+        return pd.DataFrame(columns=MATCH_COLUMNS)
+    return ranked[ranked['rank'] == 0][MATCH_COLUMNS].reset_index(drop=True)
+
+
+def match_pois_to_osm(targets: pd.DataFrame, osm_pois: gpd.GeoDataFrame, osm_projected: gpd.GeoDataFrame,
+                      radius_meters: float = DEFAULT_RADIUS_METERS,
+                      name_threshold: float = DEFAULT_NAME_THRESHOLD) -> pd.DataFrame:
+    """
+    Match a whole batch of POIs to OSM features.
+
+    Args:
+        targets: DataFrame with poi_id, name, latitude and longitude columns
+        osm_pois: GeoDataFrame of OSM POIs in EPSG:4326
+        osm_projected: GeoDataFrame of OSM POIs in EPSG:3857
+        radius_meters: Search radius in meters
+        name_threshold: Minimum name score (0-100) for a name match to win
+
+    Returns:
+        DataFrame of (poi_id, osm_id, distance, score), one row per matched POI
+    """
+    return winning_matches(
+        rank_match_candidates(targets, osm_pois, osm_projected, radius_meters, name_threshold, top_k=1)
+    )
+
+
+def pois_to_targets(pois) -> pd.DataFrame:
+    """Build the targets DataFrame for match_pois_to_osm from PointOfInterest objects."""
+    return pd.DataFrame(
+        [(poi.id, poi.name, poi.latitude, poi.longitude) for poi in pois],
+        columns=['poi_id', 'name', 'latitude', 'longitude']
+    )
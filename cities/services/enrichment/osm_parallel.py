@@ -0,0 +1,116 @@
+"""
+Service module for matching POIs to OSM features on multiple cores.
+
+The POI batch is split into chunks that are matched in a process pool. Each
+worker loads the features once from the GeoParquet cache (see osm_cache),
+which the parent fills before the pool starts, and only returns ranked
+candidates, so database writes stay with the single calling process.
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .osm_cache import load_osm_features, get_cache_dir, BoundingBox
+from .osm_matching import rank_match_candidates, DEFAULT_TOP_K, CANDIDATE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+
+# Features and settings of the current pool worker
+_worker_features = None
+_worker_top_k = DEFAULT_TOP_K
+
+
+def _init_worker(pbf_file: str, cache_dir: str, bounding_box: Optional[BoundingBox], top_k: int = DEFAULT_TOP_K):
+    """Load the features into a pool worker and build the spatial index."""
+    global _worker_features, _worker_top_k
+    _worker_features = load_osm_features(pbf_file, cache_dir, bounding_box=bounding_box)
+    _worker_features[1].sindex
+    _worker_top_k = top_k
+
+
+def _match_chunk(records: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], float]:
+    """Match one chunk of POIs in a pool worker, returning the ranked candidates and the time it took."""
+    start = time.perf_counter()
+    osm_pois, osm_projected = _worker_features
+    targets = pd.DataFrame(records, columns=['poi_id', 'name', 'latitude', 'longitude'])
+    candidates = rank_match_candidates(targets, osm_pois, osm_projected, top_k=_worker_top_k)
+    return candidates.to_dict(orient='records'), time.perf_counter() - start
+
+
+def default_worker_count() -> int:
+    """Return the number of cores available to this process."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def match_pois_parallel(targets: pd.DataFrame, pbf_file: str, bounding_box: Optional[BoundingBox] = None,
+                        max_workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                        cache_dir: Optional[str] = None,
+                        top_k: int = DEFAULT_TOP_K) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Match a batch of POIs to OSM features using a pool of worker processes.
+
+    Args:
+        targets: DataFrame with poi_id, name, latitude and longitude columns
+        pbf_file: Path to the local OSM PBF file
+        bounding_box: Optional (min_lon, min_lat, max_lon, max_lat) to load OSM data for
+        max_workers: Number of worker processes (defaults to the available cores)
+        chunk_size: Number of POIs sent to a worker at a time
+        cache_dir: OSM cache directory (defaults to settings.OSM_CACHE_DIR)
+        top_k: Number of ranked candidates to keep per POI
+
+    Returns:
+        tuple: (candidates, stats) - DataFrame of (poi_id, rank, osm_id, distance, score, tags)
+        and a dictionary with workers, chunks, serial_seconds (summed matching time of all
+        chunks), wall_seconds and speedup (serial_seconds / wall_seconds)
+    """
+    max_workers = max_workers or default_worker_count()
+    cache_dir = str(get_cache_dir(cache_dir))
+
+    # Fill the on-disk cache once so workers read GeoParquet instead of each parsing the PBF
+    load_osm_features(pbf_file, cache_dir, bounding_box=bounding_box)
+
+    records = targets[['poi_id', 'name', 'latitude', 'longitude']].to_dict(orient='records')
+    chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+    workers = max(1, min(max_workers, len(chunks)))
+
+    start = time.perf_counter()
+    if workers == 1:
+        _init_worker(pbf_file, cache_dir, bounding_box, top_k)
+        results = [_match_chunk(chunk) for chunk in chunks]
+    else:
+        # spawn, not fork: the flow and Celery run threads that must not be forked mid-operation
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(pbf_file, cache_dir, bounding_box, top_k)
+        ) as executor:
+            results = list(executor.map(_match_chunk, chunks))
+    wall_seconds = time.perf_counter() - start
+
+    serial_seconds = sum(elapsed for _, elapsed in results)
+    candidates = pd.DataFrame(
+        [candidate for chunk_candidates, _ in results for candidate in chunk_candidates], columns=CANDIDATE_COLUMNS
+    )
+    stats = {
+        'workers': workers,
+        'chunks': len(chunks),
+        'serial_seconds': round(serial_seconds, 3),
+        'wall_seconds': round(wall_seconds, 3),
+        'speedup': round(serial_seconds / wall_seconds, 2) if wall_seconds > 0 else 1.0,
+    }
+    logger.info(f"Matched {(candidates['rank'] == 0).sum()}/{len(targets)} POIs in {len(chunks)} chunks "
+                f"on {workers} workers: "
+                f"{stats['serial_seconds']}s of matching in {stats['wall_seconds']}s ({stats['speedup']}x)")
+    return candidates, stats
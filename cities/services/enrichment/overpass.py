@@ -0,0 +1,214 @@
+"""
+Service module for matching POIs to OSM features through the Overpass API.
+
+Rather than one `around` query per POI, the POIs are grouped into tiles of
+the city's extent and each tile is fetched with a single bbox query for named
+nodes and ways. POIs are then matched to the tile's features locally with the
+same distance and name rules as the PBF matcher (see osm_matching).
+"""
+
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+import geopandas as gpd
+import requests
+from shapely.geometry import LineString, Point, Polygon
+from django.conf import settings
+
+from .osm_cache import BoundingBox, METERS_PER_DEGREE
+from .osm_matching import (
+    DEFAULT_RADIUS_METERS, DEFAULT_TOP_K, NAME_FIELDS, TAG_FIELDS, CANDIDATE_COLUMNS, rank_match_candidates
+)
+
+logger = logging.getLogger(__name__)
+
+# Tile edge in degrees (about 5.5km north-south)
+DEFAULT_TILE_SIZE = 0.05
+
+# Seconds to wait between tile queries to respect Overpass rate limits
+DEFAULT_PAUSE = 1.0
+
+MAX_RETRIES = 3
+REQUEST_TIMEOUT = 180
+
+
+def tile_targets(targets: pd.DataFrame, tile_size: float = DEFAULT_TILE_SIZE,
+                 padding_meters: float = DEFAULT_RADIUS_METERS) -> List[Tuple[BoundingBox, pd.DataFrame]]:
+    """
+    Group POIs into grid tiles covering the city's extent, skipping empty tiles.
+
+    Args:
+        targets: DataFrame with poi_id, name, latitude and longitude columns
+        tile_size: Tile edge in degrees
+        padding_meters: Margin added to each tile so features just across the edge are found
+
+    Returns:
+        List of (bounding_box, targets_in_tile), bounding boxes as (min_lon, min_lat, max_lon, max_lat)
+    """
+    if len(targets) == 0:
+        return []
+
+    rows = (targets['latitude'] // tile_size).astype(int)
+    cols = (targets['longitude'] // tile_size).astype(int)
+
+    tiles = []
+    for (row, col), tile_pois in targets.groupby([rows, cols], sort=True):
+        min_lat, min_lon = row * tile_size, col * tile_size
+        lat_padding = padding_meters / METERS_PER_DEGREE
+        widest_lat = max(abs(min_lat), abs(min_lat + tile_size))
+        lon_padding = padding_meters / (METERS_PER_DEGREE * max(math.cos(math.radians(widest_lat)), 0.01))
+        bounding_box = (
+            round(min_lon - lon_padding, 6),
+            round(min_lat - lat_padding, 6),
+            round(min_lon + tile_size + lon_padding, 6),
+            round(min_lat + tile_size + lat_padding, 6),
+        )
+        tiles.append((bounding_box, tile_pois))
+    return tiles
+
+
+def build_tile_query(bounding_box: BoundingBox) -> str:
+    """Build an Overpass QL query for named nodes and ways inside a bounding box."""
+    min_lon, min_lat, max_lon, max_lat = bounding_box
+    bbox = f"{min_lat},{min_lon},{max_lat},{max_lon}"
+    name_keys = '|'.join(NAME_FIELDS)
+    return f"""
+    [out:json][timeout:{REQUEST_TIMEOUT}];
+    (
+      node[~"^({name_keys})$"~"."]({bbox});
+      way[~"^({name_keys})$"~"."]({bbox});
+    );
+    out tags geom;
+    """
+
+
+def _element_geometry(element: Dict[str, Any]):
+    """Build a shapely geometry for an Overpass node or way (with `out geom`)."""
+    if element['type'] == 'node':
+        return Point(element['lon'], element['lat'])
+    coords = [(point['lon'], point['lat']) for point in element.get('geometry') or []]
+    if len(coords) >= 4 and coords[0] == coords[-1]:
+        return Polygon(coords)
+    if len(coords) >= 2:
+        return LineString(coords)
+    if coords:
+        return Point(coords[0])
+    if 'center' in element:
+        return Point(element['center']['lon'], element['center']['lat'])
+    return None
+
+
+def elements_to_features(elements: List[Dict[str, Any]]) -> Tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+    """
+    Convert Overpass elements to the (EPSG:4326, EPSG:3857) frames the matcher expects.
+
+    Args:
+        elements: Elements from an Overpass JSON response
+
+    Returns:
+        tuple: (osm_pois_4326, osm_pois_3857)
+    """
+    records = []
+    geometries = []
+    for element in elements:
+        geometry = _element_geometry(element)
+        if geometry is None:
+            continue
+        tags = element.get('tags', {})
+        records.append({
+            'id': element['id'],
+            'osm_type': element['type'],
+            **{field: tags.get(field) for field in NAME_FIELDS + TAG_FIELDS},
+        })
+        geometries.append(geometry)
+
+    osm_pois = gpd.GeoDataFrame(
+        pd.DataFrame(records, columns=['id', 'osm_type'] + NAME_FIELDS + TAG_FIELDS),
+        geometry=geometries, crs="EPSG:4326"
+    )
+    osm_pois = osm_pois.drop_duplicates(subset=['osm_type', 'id']).reset_index(drop=True)
+    return osm_pois, osm_pois.to_crs("EPSG:3857")
+
+
+def fetch_tile(bounding_box: BoundingBox, overpass_url: Optional[str] = None,
+               session: Optional[requests.Session] = None) -> List[Dict[str, Any]]:
+    """
+    Fetch the named nodes and ways inside a tile, retrying on rate limits and timeouts.
+
+    Args:
+        bounding_box: (min_lon, min_lat, max_lon, max_lat) of the tile
+        overpass_url: Overpass interpreter URL (defaults to settings.OVERPASS_URL)
+        session: Optional requests session to reuse connections
+
+    Returns:
+        List of Overpass elements
+
+    Raises:
+        requests.RequestException: If the query keeps failing
+    """
+    overpass_url = overpass_url or settings.OVERPASS_URL
+    session = session or requests.Session()
+    query = build_tile_query(bounding_box)
+
+    for attempt in range(MAX_RETRIES):
+        response = session.post(overpass_url, data={'data': query}, timeout=REQUEST_TIMEOUT)
+        if response.status_code in (429, 502, 503, 504) and attempt < MAX_RETRIES - 1:
+            wait = 2 ** (attempt + 1)
+            logger.warning(f"Overpass returned {response.status_code} for tile {bounding_box}, retrying in {wait}s")
+            time.sleep(wait)
+            continue
+        response.raise_for_status()
+        return response.json().get('elements', [])
+    return []
+
+
+def match_pois_overpass(targets: pd.DataFrame, tile_size: float = DEFAULT_TILE_SIZE,
+                        overpass_url: Optional[str] = None, pause: float = DEFAULT_PAUSE,
+                        radius_meters: float = DEFAULT_RADIUS_METERS,
+                        top_k: int = DEFAULT_TOP_K) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Match POIs to OSM features with one Overpass query per tile of the city's extent.
+
+    Args:
+        targets: DataFrame with poi_id, name, latitude and longitude columns
+        tile_size: Tile edge in degrees
+        overpass_url: Overpass interpreter URL (defaults to settings.OVERPASS_URL)
+        pause: Seconds to wait between tile queries
+        radius_meters: Search radius in meters
+        top_k: Number of ranked candidates to keep per POI
+
+    Returns:
+        tuple: (candidates, stats) - DataFrame of (poi_id, rank, osm_id, distance, score, tags)
+        and a dictionary with tiles, failed_tiles and elements counts
+    """
+    tiles = tile_targets(targets, tile_size, padding_meters=radius_meters)
+    logger.info(f"Querying Overpass for {len(targets)} POIs in {len(tiles)} tiles")
+
+    session = requests.Session()
+    all_candidates = []
+    element_count = 0
+    failed_tiles = 0
+    for i, (bounding_box, tile_pois) in enumerate(tiles):
+        if i > 0 and pause:
+            time.sleep(pause)
+        try:
+            elements = fetch_tile(bounding_box, overpass_url, session)
+        except requests.RequestException as e:
+            logger.error(f"Overpass query failed for tile {bounding_box}: {str(e)}")
+            failed_tiles += 1
+            continue
+
+        element_count += len(elements)
+        osm_pois, osm_projected = elements_to_features(elements)
+        all_candidates.append(rank_match_candidates(
+            tile_pois, osm_pois, osm_projected, radius_meters=radius_meters, top_k=top_k
+        ))
+        logger.info(f"Tile {i + 1}/{len(tiles)}: {len(elements)} elements for {len(tile_pois)} POIs")
+
+    candidates = (pd.concat(all_candidates, ignore_index=True) if all_candidates
+                  else pd.DataFrame(columns=CANDIDATE_COLUMNS))
+    stats = {'tiles': len(tiles), 'failed_tiles': failed_tiles, 'elements': element_count}
+    return candidates, stats
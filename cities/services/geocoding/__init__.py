@@ -0,0 +1,7 @@
+"""
+Services for geocoding POIs and cities.
+
+The engine module runs many geocoding requests concurrently under a
+requests-per-second budget, and provider modules build the requests and read
+the responses.
+"""
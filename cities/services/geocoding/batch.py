@@ -0,0 +1,78 @@
+"""
+Service module for the Mapbox batch geocoding backend.
+
+The Geocoding v6 batch endpoint answers up to MAX_BATCH_SIZE forward and
+reverse queries in one POST, returning one feature collection per query in
+request order. iter_batch_responses packs the batch_query of each request
+into batch requests, runs those through the geocoding engine (so they share
+its concurrency, rate limit and retries), and maps the answers back to the
+requests' keys with features converted to the v5 shape the tasks read.
+
+Selected with settings.GEOCODING_BACKEND = 'mapbox_batch'. Requests without a
+batch_query, such as lookups including the 'poi' type v6 does not serve, are
+sent one by one to the v5 endpoint as before.
+"""
+
+import logging
+from typing import Iterable, Iterator, List, Optional
+
+from django.conf import settings
+
+from .engine import GeocodeRequest, GeocodeResponse, batched, iter_responses
+from .mapbox import v5_feature
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 1000
+
+
+def batch_request(key: int, requests: List[GeocodeRequest]) -> GeocodeRequest:
+    """Build one batch request answering the given requests, which must share an access token."""
+    params = {'access_token': requests[0].params.get('access_token')}
+    return GeocodeRequest(key, settings.MAPBOX_BATCH_GEOCODING_URL, params,
+                          body=[request.batch_query for request in requests])
+
+
+def split_batch_response(requests: List[GeocodeRequest], response: GeocodeResponse) -> List[GeocodeResponse]:
+    """Return one response per request from the response to their batch request."""
+    if response.error:
+        return [GeocodeResponse(request.key, None, response.error) for request in requests]
+
+    answers = (response.data or {}).get('batch') or []
+    if len(answers) != len(requests):
+        error = f"Batch returned {len(answers)} results for {len(requests)} queries"
+        return [GeocodeResponse(request.key, None, error) for request in requests]
+
+    return [
+        GeocodeResponse(request.key, {'features': [v5_feature(feature) for feature in answer.get('features') or []]}, None)
+        for request, answer in zip(requests, answers)
+    ]
+
+
+def iter_batch_responses(requests: Iterable[GeocodeRequest], batch_size: Optional[int] = None,
+                         **engine_options) -> Iterator[GeocodeResponse]:
+    """
+    Run requests as batch requests and yield their responses as each batch completes.
+
+    Args:
+        requests: Requests to run; those without a batch_query are sent individually
+        batch_size: Queries per batch request (defaults to settings.GEOCODING_BATCH_QUERIES, at most 1000)
+        **engine_options: Passed to iter_responses (concurrency, rate, transport...)
+
+    Yields:
+        One GeocodeResponse per request
+    """
+    batch_size = min(batch_size or settings.GEOCODING_BATCH_QUERIES, MAX_BATCH_SIZE)
+    requests = list(requests)
+    single = [request for request in requests if request.batch_query is None]
+    chunks = list(batched((request for request in requests if request.batch_query is not None), batch_size))
+    if chunks:
+        logger.info(f"Packing {sum(len(chunk) for chunk in chunks)} geocoding queries into {len(chunks)} batch requests")
+    if single:
+        logger.info(f"Sending {len(single)} geocoding queries individually, as Geocoding v6 cannot serve their types")
+
+    batch_responses = iter_responses([batch_request(index, chunk) for index, chunk in enumerate(chunks)],
+                                     **engine_options)
+    for response in batch_responses:
+        yield from split_batch_response(chunks[response.key], response)
+    yield from iter_responses(single, **engine_options)
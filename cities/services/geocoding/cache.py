@@ -0,0 +1,126 @@
+"""
+Service module for caching geocoding responses in the database.
+
+Re-importing a city deletes its POIs, and the import flow then geocodes the
+same addresses and coordinates again. cached_responses answers requests from
+GeocodeCacheEntry rows younger than settings.GEOCODING_CACHE_TTL_DAYS, sends
+only one request per distinct cache key to the provider (identical queries in
+a run are coalesced), and stores the new responses, including empty ones so
+places the provider cannot find are not paid for again. Errors are not cached.
+"""
+
+import hashlib
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from ...models import GeocodeCacheEntry
+from .batch import iter_batch_responses
+from .engine import GeocodeRequest, GeocodeResponse, batched, iter_responses
+
+logger = logging.getLogger(__name__)
+
+SAVE_BATCH_SIZE = 100
+
+
+def hash_cache_key(cache_key) -> str:
+    """Return the stored key of a request's (kind, query) cache key."""
+    kind, query = cache_key
+    return hashlib.sha256(f"{kind}|{query}".encode('utf-8')).hexdigest()
+
+
+def _fresh_entries(keys: List[str]) -> Dict[str, GeocodeCacheEntry]:
+    """Load the unexpired cache entries for the given keys."""
+    cutoff = timezone.now() - timedelta(days=settings.GEOCODING_CACHE_TTL_DAYS)
+    entries = {}
+    for batch in batched(keys, 500):
+        for entry in GeocodeCacheEntry.objects.filter(query_key__in=batch, fetched_at__gte=cutoff):
+            entries[entry.query_key] = entry
+    return entries
+
+
+def _save_entries(entries: List[GeocodeCacheEntry]):
+    """Insert new entries and replace expired ones."""
+    GeocodeCacheEntry.objects.bulk_create(
+        entries, batch_size=SAVE_BATCH_SIZE, update_conflicts=True, unique_fields=['query_key'],
+        update_fields=['kind', 'query', 'response', 'fetched_at']
+    )
+
+
+def fetch_responses(requests: List[GeocodeRequest], **engine_options) -> Iterator[GeocodeResponse]:
+    """Fetch requests with the backend chosen by settings.GEOCODING_BACKEND ('mapbox' or 'mapbox_batch')."""
+    if settings.GEOCODING_BACKEND == 'mapbox_batch':
+        return iter_batch_responses(requests, **engine_options)
+    return iter_responses(requests, **engine_options)
+
+
+def cached_responses(requests: Iterable[GeocodeRequest], stats: Optional[Dict[str, int]] = None,
+                     **engine_options) -> Iterator[GeocodeResponse]:
+    """
+    Answer requests from the cache, fetching each distinct uncached query once.
+
+    Args:
+        requests: Requests to answer; those without a cache_key are always fetched
+        stats: Optional dict to add hits, misses and coalesced counts to
+        **engine_options: Passed to the fetching backend (concurrency, rate, transport...)
+
+    Yields:
+        One GeocodeResponse per request: cached ones first, then fetched ones as they complete
+    """
+    stats = stats if stats is not None else {}
+    for counter in ('hits', 'misses', 'coalesced'):
+        stats.setdefault(counter, 0)
+
+    by_key: Dict[str, List[GeocodeRequest]] = defaultdict(list)
+    uncacheable = []
+    for request in requests:
+        if request.cache_key is None:
+            uncacheable.append(request)
+        else:
+            by_key[hash_cache_key(request.cache_key)].append(request)
+
+    entries = _fresh_entries(list(by_key))
+    if entries:
+        GeocodeCacheEntry.objects.filter(pk__in=[entry.pk for entry in entries.values()]).update(
+            hit_count=F('hit_count') + 1, last_hit_at=timezone.now()
+        )
+    for key, entry in entries.items():
+        stats['hits'] += len(by_key[key])
+        for request in by_key[key]:
+            yield GeocodeResponse(request.key, entry.response, None)
+
+    # One request per distinct uncached query; its response answers every request sharing the key
+    to_fetch = {key: members[0] for key, members in by_key.items() if key not in entries}
+    stats['misses'] += len(to_fetch)
+    stats['coalesced'] += sum(len(by_key[key]) - 1 for key in to_fetch)
+    fetched = [request._replace(key=key) for key, request in to_fetch.items()]
+    fetched += [request._replace(key=(None, index)) for index, request in enumerate(uncacheable)]
+
+    pending = []
+    try:
+        for response in fetch_responses(fetched, **engine_options):
+            if isinstance(response.key, tuple):
+                yield response._replace(key=uncacheable[response.key[1]].key)
+                continue
+
+            request = to_fetch[response.key]
+            if response.error is None:
+                kind, query = request.cache_key
+                pending.append(GeocodeCacheEntry(query_key=response.key, kind=kind, query=query,
+                                                 response=response.data, fetched_at=timezone.now()))
+                if len(pending) >= SAVE_BATCH_SIZE:
+                    _save_entries(pending)
+                    pending = []
+            for member in by_key[response.key]:
+                yield response._replace(key=member.key)
+    finally:
+        if pending:
+            _save_entries(pending)
+
+    logger.info(f"Geocoding cache: {stats['hits']} hits, {stats['misses']} misses, "
+                f"{stats['coalesced']} duplicate queries coalesced")
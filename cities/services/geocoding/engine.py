@@ -0,0 +1,198 @@
+"""
+Service module for running geocoding requests concurrently.
+
+The geocoding tasks used to call the provider one POI at a time with
+requests.get. Here an asyncio loop with one httpx client keeps up to
+settings.GEOCODING_CONCURRENCY requests in flight, started no faster than
+settings.GEOCODING_RATE_LIMIT per second, and retries 429 and 5xx responses
+and connection errors with exponential backoff (honouring Retry-After).
+
+The loop runs in a background thread and hands results back through a queue,
+so iter_responses can be consumed by ordinary synchronous code - Celery
+tasks, or Prefect tasks through sync_to_async - which writes them to the
+database in batches as they arrive.
+"""
+
+import asyncio
+import logging
+import queue
+import random
+import threading
+import time
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import httpx
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 4
+REQUEST_TIMEOUT = 30
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_DONE = object()
+
+
+class GeocodeRequest(NamedTuple):
+    """
+    A request for one item, identified by key in the result: a GET, or a POST
+    of body as JSON. Requests with the same cache_key ask the same question
+    (see geocoding.cache), and batch_query is the item's entry in a batch
+    request (see geocoding.batch).
+    """
+    key: Any
+    url: str
+    params: Dict[str, Any]
+    cache_key: Optional[Tuple[str, str]] = None
+    body: Optional[Any] = None
+    batch_query: Optional[Dict[str, Any]] = None
+
+
+class GeocodeResponse(NamedTuple):
+    """The decoded JSON of a request, or the error that ended its retries."""
+    key: Any
+    data: Optional[Dict[str, Any]]
+    error: Optional[str]
+
+
+class RateLimiter:
+    """Token bucket spacing request starts to at most rate per second, allowing short bursts."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.burst = max(burst, 1)
+        self.next_start = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            # Unused capacity carries over for at most burst requests
+            self.next_start = max(self.next_start, now - self.interval * (self.burst - 1))
+            wait = self.next_start - now
+            self.next_start += self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """Return the seconds to wait before a retry: Retry-After if given, otherwise exponential with jitter."""
+    if response is not None:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                return min(float(retry_after), 60.0)
+            except ValueError:
+                pass
+    return min(2 ** attempt, 30) * (0.5 + random.random() / 2)
+
+
+async def fetch_json(client: httpx.AsyncClient, limiter: RateLimiter, request: GeocodeRequest,
+                     max_retries: int = MAX_RETRIES) -> GeocodeResponse:
+    """Fetch one request, retrying rate limits, server errors and connection errors."""
+    for attempt in range(max_retries + 1):
+        await limiter.acquire()
+        try:
+            if request.body is None:
+                response = await client.get(request.url, params=request.params)
+            else:
+                response = await client.post(request.url, params=request.params, json=request.body)
+        except httpx.TransportError as e:
+            if attempt == max_retries:
+                return GeocodeResponse(request.key, None, f"Request failed: {e}")
+            await asyncio.sleep(_retry_delay(attempt))
+            continue
+
+        if response.status_code in RETRY_STATUSES and attempt < max_retries:
+            delay = _retry_delay(attempt, response)
+            logger.warning(f"Geocoding returned {response.status_code} for {request.key}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+        if response.status_code != 200:
+            return GeocodeResponse(request.key, None, f"HTTP {response.status_code}: {response.text[:500]}")
+        try:
+            return GeocodeResponse(request.key, response.json(), None)
+        except ValueError as e:
+            return GeocodeResponse(request.key, None, f"Invalid JSON: {e}")
+    return GeocodeResponse(request.key, None, "Retries exhausted")
+
+
+async def _run(requests: List[GeocodeRequest], results: queue.Queue, concurrency: int, rate: float,
+               max_retries: int, transport: Optional[httpx.AsyncBaseTransport], stop: threading.Event):
+    """Fetch all requests with a fixed pool of workers, putting each response on the results queue."""
+    limiter = RateLimiter(rate, burst=concurrency)
+    pending = iter(requests)
+
+    async def worker(client: httpx.AsyncClient):
+        for request in pending:
+            if stop.is_set():
+                return
+            try:
+                results.put(await fetch_json(client, limiter, request, max_retries))
+            except Exception as e:
+                results.put(GeocodeResponse(request.key, None, str(e)))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT, limits=limits, transport=transport) as client:
+        await asyncio.gather(*(worker(client) for _ in range(min(concurrency, len(requests)))))
+
+
+def iter_responses(requests: Iterable[GeocodeRequest], concurrency: Optional[int] = None,
+                   rate: Optional[float] = None, max_retries: int = MAX_RETRIES,
+                   transport: Optional[httpx.AsyncBaseTransport] = None) -> Iterator[GeocodeResponse]:
+    """
+    Run requests concurrently and yield their responses as they complete.
+
+    Args:
+        requests: Requests to run
+        concurrency: Requests in flight at once (defaults to settings.GEOCODING_CONCURRENCY)
+        rate: Maximum requests started per second (defaults to settings.GEOCODING_RATE_LIMIT, 0 for no limit)
+        max_retries: Retries per request after a 429, 5xx or connection error
+        transport: httpx transport to use instead of the network
+
+    Yields:
+        One GeocodeResponse per request, in completion order
+    """
+    requests = list(requests)
+    if not requests:
+        return
+    concurrency = concurrency or settings.GEOCODING_CONCURRENCY
+    rate = settings.GEOCODING_RATE_LIMIT if rate is None else rate
+
+    results: queue.Queue = queue.Queue()
+    stop = threading.Event()
+
+    def run_loop():
+        try:
+            asyncio.run(_run(requests, results, concurrency, rate, max_retries, transport, stop))
+        except Exception as e:
+            results.put(e)
+        finally:
+            results.put(_DONE)
+
+    thread = threading.Thread(target=run_loop, name='geocoding', daemon=True)
+    thread.start()
+    started = time.monotonic()
+    try:
+        while True:
+            result = results.get()
+            if result is _DONE:
+                break
+            if isinstance(result, Exception):
+                raise result
+            yield result
+    finally:
+        # If the caller stops early, let the requests in flight finish but start no more
+        stop.set()
+        thread.join()
+    logger.info(f"Ran {len(requests)} geocoding requests in {time.monotonic() - started:.1f}s")
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    """Yield lists of up to size items."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
@@ -0,0 +1,200 @@
+"""
+Service module for a local stand-in for the Mapbox geocoding APIs.
+
+FakeMapboxServer answers v5 places lookups (GET <prefix>/<query>.json) and
+Geocoding v6 batch requests (POST <prefix>/batch) with deterministic features,
+so the geocoding backends can be tested and benchmarked offline. Reverse
+lookups get an address derived from the coordinates, forward lookups a point
+derived from the normalised query text (near the proximity point, if given),
+and queries mentioning "Nowhere" get no features. Features are of the 'poi'
+type when it was asked for, else of the first type asked for. Both APIs give
+the same answer to the same question, and like the real v6 API the batch
+endpoint rejects feature types v6 does not serve.
+
+Every HTTP request waits latency seconds, to stand in for the network round
+trip, and is counted in http_requests; queries counts the lookups answered.
+The fake_mapbox_server management command runs it on its own.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+from .batch import MAX_BATCH_SIZE
+from .mapbox import V6_TYPES, normalise_query
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8766
+DEFAULT_CENTER = (-0.1276, 51.5072)
+COUNTRY = {'mapbox_id': 'fake', 'name': 'Testland'}
+
+
+def reverse_place(longitude: float, latitude: float) -> Tuple[str, List[float]]:
+    """Return the fake address and point for a reverse lookup."""
+    return f"{round(latitude, 5)} Fake Street, Testville", [longitude, latitude]
+
+
+def forward_place(query: str, proximity: Optional[Tuple[float, float]] = None) -> Optional[Tuple[str, List[float]]]:
+    """Return the fake name and point for a forward lookup, or None for places that cannot be found."""
+    text = normalise_query(query)
+    if 'nowhere' in text:
+        return None
+    digest = hashlib.sha256(text.encode('utf-8')).digest()
+    center_lon, center_lat = proximity or DEFAULT_CENTER
+    # Spread answers over about 5km around the centre, the same for the same query
+    longitude = round(center_lon + (digest[0] * 256 + digest[1]) / 65535 * 0.1 - 0.05, 6)
+    latitude = round(center_lat + (digest[2] * 256 + digest[3]) / 65535 * 0.1 - 0.05, 6)
+    return query, [longitude, latitude]
+
+
+def feature_type(types: List[str]) -> str:
+    """Return the type of the feature answering a lookup for the given types."""
+    if 'poi' in types:
+        return 'poi'
+    return types[0] if types and types[0] else 'address'
+
+
+def _v5_collection(place: Optional[Tuple[str, List[float]]], types: List[str]) -> Dict[str, Any]:
+    if place is None:
+        return {'type': 'FeatureCollection', 'features': []}
+    name, coordinates = place
+    return {'type': 'FeatureCollection', 'features': [{
+        'place_name': name,
+        'place_type': [feature_type(types)],
+        'geometry': {'type': 'Point', 'coordinates': coordinates},
+        'context': [{'id': f"country.{COUNTRY['mapbox_id']}", 'text': COUNTRY['name']}],
+    }]}
+
+
+def _v6_collection(place: Optional[Tuple[str, List[float]]], types: List[str]) -> Dict[str, Any]:
+    if place is None:
+        return {'type': 'FeatureCollection', 'features': []}
+    name, coordinates = place
+    return {'type': 'FeatureCollection', 'features': [{
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': coordinates},
+        'properties': {'name': name.split(',')[0], 'full_address': name, 'feature_type': feature_type(types),
+                       'context': {'country': COUNTRY}},
+    }]}
+
+
+class FakeMapboxServer(ThreadingHTTPServer):
+    """HTTP server answering Mapbox geocoding requests locally, counting what it is asked."""
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], latency: float = 0.0):
+        super().__init__(address, FakeMapboxRequestHandler)
+        self.latency = latency
+        self.http_requests = 0
+        self.queries = 0
+        self.counter_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def settings_overrides(self) -> Dict[str, str]:
+        """Return the settings that point the geocoding backends at this server."""
+        return {
+            'MAPBOX_GEOCODING_URL': f"{self.base_url}/geocoding/v5/mapbox.places",
+            'MAPBOX_BATCH_GEOCODING_URL': f"{self.base_url}/search/geocode/v6/batch",
+        }
+
+    def count(self, queries: int):
+        with self.counter_lock:
+            self.http_requests += 1
+            self.queries += queries
+
+    def reset_counts(self):
+        with self.counter_lock:
+            self.http_requests = 0
+            self.queries = 0
+
+    def start(self) -> threading.Thread:
+        """Serve from a daemon thread, for tests and benchmarks."""
+        thread = threading.Thread(target=self.serve_forever, name='fake-mapbox', daemon=True)
+        thread.start()
+        return thread
+
+
+class FakeMapboxRequestHandler(BaseHTTPRequestHandler):
+    """Request handler for FakeMapboxServer."""
+
+    def _send_json(self, status: int, data: Any):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorised(self, url) -> bool:
+        if parse_qs(url.query).get('access_token'):
+            return True
+        self._send_json(401, {'message': 'Not Authorized - No Token'})
+        return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not url.path.endswith('.json'):
+            self._send_json(404, {'message': 'Not Found'})
+            return
+        if not self._authorised(url):
+            return
+        time.sleep(self.server.latency)
+        self.server.count(1)
+
+        query = unquote(url.path.rsplit('/', 1)[-1][:-len('.json')])
+        params = parse_qs(url.query)
+        types = params.get('types', [''])[0].split(',')
+        try:
+            longitude, latitude = (float(value) for value in query.split(','))
+            place = reverse_place(longitude, latitude)
+        except ValueError:
+            proximity = params.get('proximity', [None])[0]
+            place = forward_place(query, tuple(float(value) for value in proximity.split(',')) if proximity else None)
+        self._send_json(200, _v5_collection(place, types))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if not url.path.endswith('/batch'):
+            self._send_json(404, {'message': 'Not Found'})
+            return
+        if not self._authorised(url):
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            queries = json.loads(self.rfile.read(length))
+        except ValueError as e:
+            self._send_json(400, {'message': f'Invalid JSON: {e}'})
+            return
+        if not isinstance(queries, list) or len(queries) > MAX_BATCH_SIZE:
+            self._send_json(422, {'message': f'Batch must be a list of at most {MAX_BATCH_SIZE} queries'})
+            return
+        unknown = {feature_type for query in queries for feature_type in query.get('types') or []} - V6_TYPES
+        if unknown:
+            self._send_json(422, {'message': f"Unsupported feature types: {', '.join(sorted(unknown))}"})
+            return
+        time.sleep(self.server.latency)
+        self.server.count(len(queries))
+
+        batch = []
+        for query in queries:
+            types = query.get('types') or []
+            if 'q' in query:
+                proximity = query.get('proximity')
+                place = forward_place(query['q'], tuple(proximity) if proximity else None)
+            else:
+                place = reverse_place(query['longitude'], query['latitude'])
+            batch.append(_v6_collection(place, types))
+        self._send_json(200, {'batch': batch})
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
@@ -0,0 +1,126 @@
+"""
+Service module for building Mapbox geocoding requests and reading their responses.
+
+Each request carries a cache key (see geocoding.cache): forward queries by
+their normalised text, feature types and proximity, reverse queries by
+coordinates rounded to REVERSE_PRECISION decimals (about a metre). It also
+carries the equivalent Geocoding v6 query, so geocoding.batch can pack it
+into a batch request, unless it asks for feature types v6 does not serve
+('poi'): dropping those would change the answer, so such requests always go
+to the v5 places endpoint. The two APIs can answer the same query
+differently, so the cache key includes the API version the request will call.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+
+from .engine import GeocodeRequest
+
+REVERSE_PRECISION = 5
+
+# Proximity only biases results, so nearby centres share cache entries
+PROXIMITY_PRECISION = 2
+
+# Feature types Geocoding v6 knows; 'poi' is only served by the v5 places endpoint
+V6_TYPES = {'country', 'region', 'postcode', 'district', 'place', 'locality', 'neighborhood',
+            'street', 'address', 'secondary_address'}
+
+
+def normalise_query(text: str) -> str:
+    """Return a query lower-cased, with runs of whitespace and spaces around commas collapsed."""
+    return ', '.join(' '.join(part.split()) for part in text.lower().split(','))
+
+
+def mapbox_token() -> str:
+    """
+    Return the Mapbox access token.
+
+    Raises:
+        ValueError: If MAPBOX_TOKEN is not set
+    """
+    token = os.environ.get('MAPBOX_TOKEN')
+    if not token:
+        raise ValueError("MAPBOX_TOKEN environment variable not set")
+    return token
+
+
+def _cache_prefix(batch_query: Optional[Dict[str, Any]]) -> str:
+    """Return the cache key prefix of the API a request will call under settings.GEOCODING_BACKEND."""
+    if batch_query is not None and settings.GEOCODING_BACKEND == 'mapbox_batch':
+        return 'mapbox.v6'
+    return 'mapbox.v5'
+
+
+def _v6_types(types: str) -> Optional[List[str]]:
+    """Return the feature types as a v6 list, or None if v6 cannot serve all of them."""
+    feature_types = types.split(',')
+    if not all(feature_type in V6_TYPES for feature_type in feature_types):
+        return None
+    return feature_types
+
+
+def _places_url(query: str) -> str:
+    # The query is a path segment, so slashes and '#' in addresses must be escaped too
+    return f"{settings.MAPBOX_GEOCODING_URL}/{quote(query, safe=',')}.json"
+
+
+def reverse_request(key: Any, latitude: float, longitude: float, token: str,
+                    types: str = 'address') -> GeocodeRequest:
+    """Build a reverse geocoding request for the nearest feature of the given types."""
+    v6_types = _v6_types(types)
+    batch_query = None
+    if v6_types is not None:
+        batch_query = {'longitude': float(longitude), 'latitude': float(latitude), 'types': v6_types, 'limit': 1}
+    cache_key = ('reverse', f"{_cache_prefix(batch_query)}|{types}|{round(float(latitude), REVERSE_PRECISION)},"
+                            f"{round(float(longitude), REVERSE_PRECISION)}")
+    return GeocodeRequest(key, _places_url(f"{longitude},{latitude}"),
+                          {'access_token': token, 'types': types, 'limit': 1}, cache_key, batch_query=batch_query)
+
+
+def forward_request(key: Any, search_text: str, token: str, types: str,
+                    proximity: Optional[Tuple[float, float]] = None) -> GeocodeRequest:
+    """
+    Build a forward geocoding request for the most relevant feature of the given types.
+
+    Args:
+        key: Identifier returned with the response
+        search_text: Free-text query
+        token: Mapbox access token
+        types: Comma-separated Mapbox feature types
+        proximity: Optional (longitude, latitude) to bias results towards
+    """
+    params = {'access_token': token, 'limit': 1, 'types': types}
+    v6_types = _v6_types(types)
+    batch_query = None if v6_types is None else {'q': search_text, 'types': v6_types, 'limit': 1}
+    rounded_proximity = ''
+    if proximity:
+        params['proximity'] = f"{proximity[0]},{proximity[1]}"
+        if batch_query is not None:
+            batch_query['proximity'] = [float(proximity[0]), float(proximity[1])]
+        rounded_proximity = ','.join(str(round(float(value), PROXIMITY_PRECISION)) for value in proximity)
+    cache_key = ('forward', f"{_cache_prefix(batch_query)}|{types}|{rounded_proximity}|{normalise_query(search_text)}")
+    return GeocodeRequest(key, _places_url(search_text), params, cache_key, batch_query=batch_query)
+
+
+def v5_feature(feature: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a Geocoding v6 feature in the v5 shape the geocoding tasks read."""
+    properties = feature.get('properties') or {}
+    result = {
+        'place_name': properties.get('full_address') or properties.get('name'),
+        'place_type': [properties['feature_type']] if properties.get('feature_type') else [],
+        'geometry': feature.get('geometry'),
+        'context': [],
+    }
+    for feature_type, context in (properties.get('context') or {}).items():
+        if isinstance(context, dict) and context.get('name'):
+            result['context'].append({'id': f"{feature_type}.{context.get('mapbox_id', '')}", 'text': context['name']})
+    return result
+
+
+def first_feature(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Return the first (most relevant) feature of a response, if any."""
+    features = (data or {}).get('features') or []
+    return features[0] if features else None
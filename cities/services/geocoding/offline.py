@@ -0,0 +1,188 @@
+"""
+Service module for reverse geocoding offline from a local OSM PBF extract.
+
+Most POIs without an address stand within a few metres of an OSM node or
+building way tagged with addr:housenumber and addr:street. load_address_points
+parses those address features from the PBF with Pyrosm, reduces them to one
+point and a one-line address each (see osm_details.format_address), and caches
+them as GeoParquet next to the OSM feature cache, keyed by the extract's content
+hash and bounding box like load_osm_features. OfflineReverseGeocoder finds the
+nearest address point to each POI with an STRtree and accepts it within
+settings.OFFLINE_GEOCODING_RADIUS_METERS, measured along the ground.
+
+geocode_missing_addresses uses it before Mapbox when given a PBF file, so only
+POIs with no address nearby cost a Mapbox request.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import geopandas as gpd
+from shapely.geometry import box
+
+from ..dedup.distance import haversine_meters
+from ..enrichment import osm_cache
+from ..enrichment.osm_cache import BoundingBox
+from ..enrichment.osm_details import format_address
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cached address table layout changes so stale files are not reused
+ADDRESS_CACHE_VERSION = 1
+
+ADDRESS_TAGS = ['addr:full', 'addr:housenumber', 'addr:street', 'addr:postcode', 'addr:city']
+
+ADDRESS_COLUMNS = ['id', 'osm_type', 'address', 'geometry']
+
+
+def _parse_addresses(pbf_file: str, bounding_box: Optional[BoundingBox] = None) -> gpd.GeoDataFrame:
+    """
+    Parse address nodes and ways from a PBF file with Pyrosm.
+
+    Args:
+        pbf_file: Path to the OSM PBF file
+        bounding_box: Optional (min_lon, min_lat, max_lon, max_lat) to clip the parse to
+
+    Returns:
+        GeoDataFrame in EPSG:4326 with ADDRESS_COLUMNS, one point per feature
+    """
+    from pyrosm import OSM
+
+    logger.info(f"Loading OSM addresses with Pyrosm (bounding box: {bounding_box or 'full extract'})...")
+    osm = OSM(pbf_file, bounding_box=list(bounding_box) if bounding_box else None)
+    features = osm.get_data_by_custom_criteria(
+        custom_filter={'addr:housenumber': True},
+        tags_as_columns=ADDRESS_TAGS,
+        keep_nodes=True,
+        keep_ways=True,
+        keep_relations=False,
+    )
+    if features is None or len(features) == 0:
+        return gpd.GeoDataFrame({'id': [], 'osm_type': [], 'address': []}, geometry=[], crs="EPSG:4326")
+
+    tags = features.reindex(columns=ADDRESS_TAGS)
+    addresses = [
+        format_address({key: value for key, value in row.items() if isinstance(value, str)})
+        for row in tags.to_dict(orient='records')
+    ]
+    # Buildings are polygons; a point inside the outline stands in for the building
+    points = features.geometry.representative_point()
+    addresses = gpd.GeoDataFrame({
+        'id': features['id'].to_numpy(),
+        'osm_type': features['osm_type'].to_numpy() if 'osm_type' in features else 'node',
+        'address': addresses,
+    }, geometry=points.to_numpy(), crs=features.crs or "EPSG:4326")
+    addresses = addresses[addresses['address'].notna()].reset_index(drop=True)
+    if addresses.crs.to_epsg() != 4326:
+        addresses = addresses.to_crs("EPSG:4326")
+    logger.info(f"Loaded {len(addresses)} OSM address points")
+    return addresses
+
+
+def _find_address_table(cache_dir: Path, sha256: str, bounding_box: Optional[BoundingBox]) -> Optional[Path]:
+    """Find a cached address table of this extract whose bounding box covers the requested one."""
+    for manifest_path in sorted(cache_dir.glob(f"addresses-{sha256[:32]}-*-v{ADDRESS_CACHE_VERSION}.json")):
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        cached_box = tuple(manifest['bounding_box']) if manifest.get('bounding_box') else None
+        table_path = manifest_path.with_suffix('.parquet')
+        if osm_cache._contains(cached_box, bounding_box) and table_path.exists():
+            return table_path
+    return None
+
+
+def load_address_points(pbf_file: str, cache_dir: Optional[str] = None,
+                        bounding_box: Optional[BoundingBox] = None) -> gpd.GeoDataFrame:
+    """
+    Load the OSM address points of a PBF file, parsing it only if no cached copy exists.
+
+    Args:
+        pbf_file: Path to the local OSM PBF file
+        cache_dir: Cache directory (defaults to settings.OSM_CACHE_DIR)
+        bounding_box: Optional (min_lon, min_lat, max_lon, max_lat) to clip the addresses to,
+            snapped outwards to the OSM cache grid
+
+    Returns:
+        GeoDataFrame in EPSG:4326 with ADDRESS_COLUMNS
+    """
+    fingerprint = osm_cache.pbf_fingerprint(pbf_file, cache_dir)
+    bounding_box = osm_cache._snap_bounding_box(bounding_box)
+    cache_dir = osm_cache.get_cache_dir(cache_dir)
+
+    table_path = _find_address_table(cache_dir, fingerprint['sha256'], bounding_box)
+    if table_path:
+        logger.info(f"Loading cached OSM addresses from {table_path}")
+        addresses = gpd.read_parquet(table_path, bbox=bounding_box)
+        if bounding_box is not None:
+            addresses = addresses[addresses.intersects(box(*bounding_box))].reset_index(drop=True)
+        return addresses
+
+    logger.info(f"No address cache for {fingerprint['path']}, parsing PBF file")
+    addresses = _parse_addresses(pbf_file, bounding_box)
+
+    box_key = 'full' if bounding_box is None else hashlib.sha1(json.dumps(bounding_box).encode()).hexdigest()[:12]
+    cache_path = cache_dir / f"addresses-{fingerprint['sha256'][:32]}-{box_key}-v{ADDRESS_CACHE_VERSION}.parquet"
+    tmp_path = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.tmp")
+    addresses.to_parquet(tmp_path, write_covering_bbox=True)
+    os.replace(tmp_path, cache_path)
+    osm_cache._write_atomic(
+        cache_path.with_suffix('.json'),
+        json.dumps({**fingerprint, 'bounding_box': bounding_box, 'address_count': len(addresses)}, indent=2).encode()
+    )
+    logger.info(f"Cached {len(addresses)} OSM addresses to {cache_path}")
+    return addresses
+
+
+class OfflineReverseGeocoder:
+    """Nearest-address lookup over OSM address points, using an STRtree in Web Mercator."""
+
+    def __init__(self, addresses: gpd.GeoDataFrame):
+        self.addresses = addresses['address'].to_numpy()
+        self.latitudes = addresses.geometry.y.to_numpy()
+        self.longitudes = addresses.geometry.x.to_numpy()
+        self.projected = addresses.geometry.to_crs("EPSG:3857").reset_index(drop=True)
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def nearest(self, latitudes: Sequence[float], longitudes: Sequence[float],
+                radius_meters: float) -> List[Optional[Tuple[str, float]]]:
+        """
+        Find the nearest address to each point.
+
+        Args:
+            latitudes: Point latitudes
+            longitudes: Point longitudes
+            radius_meters: Largest ground distance to accept
+
+        Returns:
+            One (address, distance in metres) per point, or None if no address is within the radius
+        """
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        results: List[Optional[Tuple[str, float]]] = [None] * len(latitudes)
+        if not len(latitudes) or not len(self):
+            return results
+
+        points = gpd.GeoSeries(gpd.points_from_xy(longitudes, latitudes), crs="EPSG:4326").to_crs("EPSG:3857")
+        # Mercator stretches ground distances by 1/cos(latitude), so search wide enough for the
+        # most stretched point and check the true distance afterwards
+        stretch = 1 / max(math.cos(math.radians(float(np.max(np.abs(latitudes))))), 0.01)
+        point_idx, address_idx = self.projected.sindex.nearest(
+            points.to_numpy(), return_all=False, max_distance=radius_meters * stretch
+        )
+        distances = haversine_meters(latitudes[point_idx], longitudes[point_idx],
+                                     self.latitudes[address_idx], self.longitudes[address_idx])
+        for point, address, distance in zip(point_idx, address_idx, distances):
+            if distance <= radius_meters:
+                results[point] = (self.addresses[address], round(float(distance), 1))
+        return results
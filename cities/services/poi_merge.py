@@ -0,0 +1,119 @@
+"""
+Service module for merging POIs.
+
+The poi_merge view, auto_merge_duplicates and dedup_main_city all merge POIs
+through merge_pois, which applies many (keep_id, remove_id, field_selections)
+merges in one transaction and one reversion revision, without going through
+the HTTP endpoint.
+"""
+
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Tuple
+
+import reversion
+from django.db import transaction
+
+from ..models import City, District, PointOfInterest
+
+logger = logging.getLogger(__name__)
+
+# Fields recorded in the revision comment so poi_history can show old and new values
+TRACKED_FIELDS = [
+    'name', 'category', 'sub_category', 'description', 'latitude', 'longitude',
+    'address', 'phone', 'website', 'hours', 'rank', 'district'
+]
+
+Merge = Tuple[int, int, Dict[str, Any]]
+
+
+def _field_values(poi: PointOfInterest) -> Dict[str, Any]:
+    """Return the tracked field values of a POI, with the district as its name."""
+    values = {field: getattr(poi, field) for field in TRACKED_FIELDS if field != 'district'}
+    values['district'] = poi.district.name if poi.district else None
+    return values
+
+
+def apply_field_selections(city: City, poi: PointOfInterest, field_selections: Dict[str, Any]):
+    """
+    Set the selected values on a POI without saving it.
+
+    'coordinates' is a "lat,lon" string and 'district' a district name, created
+    if it does not exist ('Main City' clears the district).
+    """
+    for field, value in field_selections.items():
+        if field == 'coordinates':
+            if value:
+                lat, lon = value.split(',')
+                poi.latitude = float(lat.strip())
+                poi.longitude = float(lon.strip())
+        elif field == 'district':
+            if value == 'Main City':
+                poi.district = None
+            else:
+                poi.district, _ = District.objects.get_or_create(name=value, city=city)
+        else:
+            setattr(poi, field, value)
+
+
+def merge_pois(city: City, merges: Iterable[Merge]) -> List[Dict[str, Any]]:
+    """
+    Merge POIs in one transaction and one revision.
+
+    Each merge copies the selected field values onto the kept POI and deletes
+    the removed one. Merges that refer to a POI missing from the city, or one
+    removed by an earlier merge in the batch, are skipped.
+
+    Args:
+        city: City the POIs belong to
+        merges: (keep_id, remove_id, field_selections) tuples, applied in order
+
+    Returns:
+        One dict per merge with keep_id, remove_id, status ('merged' or 'skipped') and message
+    """
+    merges = [(int(keep_id), int(remove_id), field_selections or {}) for keep_id, remove_id, field_selections in merges]
+    pois_by_id = PointOfInterest.objects.select_related('district').filter(city=city).in_bulk(
+        {poi_id for keep_id, remove_id, _ in merges for poi_id in (keep_id, remove_id)}
+    )
+
+    results = []
+    changes_by_poi = {}
+    removed_ids = set()
+
+    with transaction.atomic(), reversion.create_revision():
+        for keep_id, remove_id, field_selections in merges:
+            keep_poi, remove_poi = pois_by_id.get(keep_id), pois_by_id.get(remove_id)
+            if keep_poi is None or remove_poi is None or keep_id == remove_id or {keep_id, remove_id} & removed_ids:
+                message = f"Skipped merging POI {remove_id} into {keep_id}: POI missing or already merged"
+                logger.warning(message)
+                results.append({'keep_id': keep_id, 'remove_id': remove_id, 'status': 'skipped', 'message': message})
+                continue
+
+            old_values = _field_values(keep_poi)
+            apply_field_selections(city, keep_poi, field_selections)
+            keep_poi.save()
+            remove_poi.delete()
+            removed_ids.add(remove_id)
+
+            changes = changes_by_poi.setdefault(str(keep_id), {})
+            for field, value in field_selections.items():
+                if old_values.get(field) != value:
+                    changes[field] = {'old': old_values.get(field), 'new': value}
+
+            results.append({
+                'keep_id': keep_id, 'remove_id': remove_id, 'status': 'merged',
+                'message': f"Merged POI {remove_id} into {keep_id}"
+            })
+
+        merged = [result for result in results if result['status'] == 'merged']
+        comment = {
+            'message': (f"Merged with POI {merged[0]['remove_id']}" if len(merged) == 1
+                        else f"Merged {len(merged)} POIs"),
+            'changes_by_poi': changes_by_poi,
+        }
+        if len(merged) == 1:
+            comment['changes'] = changes_by_poi[str(merged[0]['keep_id'])]
+        reversion.set_comment(json.dumps(comment, default=str))
+
+    logger.info(f"Merged {len(merged)}/{len(merges)} POI pairs in {city.name}")
+    return results
@@ -0,0 +1,44 @@
+"""
+Shared fixtures for tests that read OSM features from a PBF extract.
+"""
+import os
+import tempfile
+import geopandas as gpd
+from shapely.geometry import Point, Polygon
+from ..services.enrichment import osm_cache
+
+
+def make_osm_features():
+    """Build a small GeoDataFrame shaped like Pyrosm output."""
+    return gpd.GeoDataFrame(
+        {
+            'id': [1, 2],
+            'osm_type': ['node', 'way'],
+            'name': ['Cafe One', 'Old Pub'],
+            'amenity': ['cafe', 'pub'],
+            'tags': [{'cuisine': 'coffee'}, None],
+        },
+        geometry=[
+            Point(-0.1276, 51.5072),
+            Polygon([(-0.1250, 51.5060), (-0.1248, 51.5060), (-0.1248, 51.5062), (-0.1250, 51.5060)]),
+        ],
+        crs="EPSG:4326"
+    )
+
+
+class FakePbfMixin:
+    """Give each test a fake PBF file, an empty cache directory and no features loaded in memory."""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, 'cache')
+        self.pbf_file = os.path.join(self.tmp.name, 'extract.osm.pbf')
+        with open(self.pbf_file, 'wb') as f:
+            f.write(b'fake pbf contents')
+        osm_cache.clear_loaded_features()
+
+    def tearDown(self):
+        osm_cache.clear_loaded_features()
+        self.tmp.cleanup()
+        super().tearDown()
@@ -167,6 +167,39 @@ class CityImportServiceTestCase(TestCase):
         self.assertEqual(pois.count(), 1)
         self.assertEqual(pois[0].name, "New POI")
 
+    def test_process_pois_merges_district_duplicates(self):
+        """Test that a listing repeated on a district page is merged into the existing POI."""
+        process_pois(self.city, [
+            ScraperPOI(name="The British Museum", category="see", sub_category=None, description="",
+                       coordinates=(51.5194, -0.1270), rank=3),
+            ScraperPOI(name="Tate Modern", category="see", sub_category=None, description="Art", rank=2),
+        ])
+
+        db_pois = process_pois(self.city, [
+            ScraperPOI(name="British Museum!", category="see", sub_category="Museum", description="Antiquities",
+                       coordinates=(51.5195, -0.1269), phone="+44 20 7323 8299", rank=1),
+            ScraperPOI(name="Tate Modern", category="see", sub_category=None, description="Gallery",
+                       coordinates=(51.5076, -0.0994), rank=4),
+        ], district_name="Test District")
+
+        # The museum is merged, Tate Modern is created but flagged as it had no coordinates before
+        self.assertEqual([poi.name for poi in db_pois], ["Tate Modern"])
+        museum = PointOfInterest.objects.get(city=self.city, name="The British Museum")
+        self.assertEqual(museum.district, self.district)
+        self.assertEqual(museum.phone, "+44 20 7323 8299")
+        self.assertEqual(museum.description, "Antiquities")
+        self.assertEqual(museum.rank, 1)
+        self.assertEqual(PointOfInterest.objects.filter(city=self.city).count(), 3)
+        self.assertTrue(Validation.objects.filter(parent=self.city, aggregate='DuplicatePOI').exists())
+
+    def test_process_pois_without_deduplication(self):
+        """Test that deduplication can be turned off."""
+        scraped = [ScraperPOI(name="Tate Modern", category="see", sub_category=None, description="",
+                              coordinates=(51.5076, -0.0994))]
+        process_pois(self.city, scraped)
+        process_pois(self.city, scraped, deduplicate=False)
+        self.assertEqual(PointOfInterest.objects.filter(city=self.city, name="Tate Modern").count(), 2)
+
     @patch('cities.services.city_import.fetch_city_pois')
     def test_import_city_data(self, mock_fetch_pois):
         """Test the main import_city_data function."""
@@ -0,0 +1,111 @@
+"""
+Test cases for blocking-based duplicate candidate generation.
+"""
+import random
+from itertools import combinations
+from django.test import SimpleTestCase
+from ..enrich_tasks import detect_duplicate_pois
+from ..services.dedup.blocking import candidate_pairs, name_tokens
+from .test_similarity import NAMES, mutate
+
+WORDS = ['Red', 'Lion', 'Café', 'Nero', 'Pub', 'Kings', 'Arms', 'Museum', 'Tower', 'Bridge', 'Market', 'Garden']
+STREETS = ['Parliament Street', 'Great Russell St', 'Strand', 'Borough High Street']
+
+
+def random_poi(rng, poi_id):
+    """Build a POI dict clustered around a few points, sometimes without coordinates."""
+    has_coordinates = rng.random() > 0.2
+    base_lat, base_lon = rng.choice([(51.5072, -0.1276), (51.5194, -0.1270), (51.5055, -0.0754)])
+    return {
+        'id': poi_id,
+        'name': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))),
+        'category': rng.choice(['see', 'eat', 'drink']),
+        'latitude': base_lat + rng.uniform(-0.003, 0.003) if has_coordinates else None,
+        'longitude': base_lon + rng.uniform(-0.003, 0.003) if has_coordinates else None,
+        'address': f"{rng.randint(1, 20)} {rng.choice(STREETS)}" if rng.random() > 0.3 else None,
+    }
+
+
+class BlockingTestCase(SimpleTestCase):
+    def test_name_tokens(self):
+        """Test that names are lower-cased, accent-stripped and stop words dropped."""
+        self.assertEqual(name_tokens("The Café de Flore"), {'cafe', 'flore'})
+        self.assertEqual(name_tokens(None), set())
+
+    def test_same_duplicates_as_all_pairs(self):
+        """Test that blocking flags exactly the pairs the all-pairs comparison flags."""
+        rng = random.Random(7)
+        pois = [random_poi(rng, poi_id) for poi_id in range(300)]
+
+        all_pairs = {
+            (i, j) for i, j in combinations(range(len(pois)), 2)
+            if detect_duplicate_pois(pois[i], pois[j])[0]
+        }
+        candidates = candidate_pairs(pois)
+        blocked = {(i, j) for i, j in candidates if detect_duplicate_pois(pois[i], pois[j])[0]}
+
+        self.assertTrue(all_pairs)
+        self.assertEqual(blocked, all_pairs)
+        self.assertLess(len(candidates), len(pois) * (len(pois) - 1) // 2)
+
+    def test_split_blocks_keep_every_duplicate(self):
+        """Test that splitting oversized name blocks loses no duplicate, with and without a focus."""
+        rng = random.Random(11)
+        pois = [random_poi(rng, poi_id) for poi_id in range(300)]
+        focus = set(range(0, 300, 7))
+
+        all_pairs = {
+            (i, j) for i, j in combinations(range(len(pois)), 2)
+            if detect_duplicate_pois(pois[i], pois[j])[0]
+        }
+        with self.assertLogs('cities.services.dedup.blocking', level='INFO') as logs:
+            blocked = {(i, j) for i, j in candidate_pairs(pois, max_block_size=5)
+                       if detect_duplicate_pois(pois[i], pois[j])[0]}
+        focused = {(i, j) for i, j in candidate_pairs(pois, max_block_size=5, focus=focus)
+                   if detect_duplicate_pois(pois[i], pois[j])[0]}
+
+        self.assertIn('Split', logs.output[0])
+        self.assertEqual(blocked, all_pairs)
+        self.assertEqual(focused, {(i, j) for i, j in all_pairs if i in focus or j in focus})
+
+    def test_near_miss_names_without_coordinates(self):
+        """Test that names similar without sharing a word are paired by their addresses."""
+        pois = [
+            {'id': 1, 'name': 'Colosseum', 'latitude': None, 'longitude': None, 'address': 'Piazza del Colosseo'},
+            {'id': 2, 'name': 'Coloseum', 'latitude': None, 'longitude': None, 'address': 'Piazza del Colosseo'},
+            {'id': 3, 'name': 'Colosseum', 'latitude': None, 'longitude': None, 'address': None},
+        ]
+        self.assertEqual(candidate_pairs(pois), [(0, 1), (0, 2)])
+
+    def test_mutated_names_same_duplicates_as_all_pairs(self):
+        """Test that blocking loses no duplicate among typo-ridden names without coordinates."""
+        rng = random.Random(5)
+        pois = [
+            {
+                'id': poi_id,
+                'name': mutate(rng, rng.choice(NAMES)),
+                'category': 'see',
+                'latitude': None,
+                'longitude': None,
+                'address': mutate(rng, rng.choice(STREETS)) if rng.random() > 0.3 else None,
+            }
+            for poi_id in range(300)
+        ]
+
+        all_pairs = {
+            (i, j) for i, j in combinations(range(len(pois)), 2)
+            if detect_duplicate_pois(pois[i], pois[j])[0]
+        }
+        blocked = {(i, j) for i, j in candidate_pairs(pois) if detect_duplicate_pois(pois[i], pois[j])[0]}
+
+        self.assertTrue(all_pairs)
+        self.assertEqual(blocked, all_pairs)
+
+    def test_adjacent_cells_are_paired(self):
+        """Test that close POIs on either side of a cell boundary are compared."""
+        pois = [
+            {'id': 1, 'name': 'Alpha', 'latitude': 51.50099, 'longitude': -0.12001},
+            {'id': 2, 'name': 'Beta', 'latitude': 51.50101, 'longitude': -0.11999},
+            {'id': 3, 'name': 'Gamma', 'latitude': 51.60000, 'longitude': -0.12000},
+        ]
+        self.assertEqual(candidate_pairs(pois), [(0, 1)])
@@ -0,0 +1,55 @@
+"""
+Test cases for cluster-based duplicate resolution.
+"""
+from django.test import SimpleTestCase, TestCase
+from ..enrich_tasks import auto_merge_duplicates
+from ..models import City, District, PointOfInterest
+from ..services.dedup.clusters import cluster_pairs
+
+
+class ClusterPairsTestCase(SimpleTestCase):
+    def test_connected_pairs_form_one_cluster(self):
+        """Test that chained and repeated pairs are grouped, in order of first appearance."""
+        clusters = cluster_pairs([(1, 2), (5, 6), (2, 3), (3, 1), (7, 5)])
+        self.assertEqual(clusters, [[1, 2, 3], [5, 6, 7]])
+
+    def test_no_pairs(self):
+        self.assertEqual(cluster_pairs([]), [])
+
+
+class AutoMergeDuplicatesTestCase(TestCase):
+    def setUp(self):
+        self.city = City.objects.create(name="London")
+        self.district = District.objects.create(name="Westminster", city=self.city)
+        self.poi_a = PointOfInterest.objects.create(
+            city=self.city, name="Red Lion", category="drink", description="Pub", rank=5
+        )
+        self.poi_b = PointOfInterest.objects.create(
+            city=self.city, district=self.district, name="Red Lion Pub", category="drink",
+            description="Historic pub on Parliament Street", latitude=51.5072, longitude=-0.1276, rank=2
+        )
+        self.poi_c = PointOfInterest.objects.create(
+            city=self.city, name="The Red Lion", category="drink", description="", phone="+44 20 7930 4600", rank=9
+        )
+
+    def test_chained_pairs_merge_in_one_step(self):
+        """Test that A~B and B~C are merged together instead of failing on a deleted POI."""
+        result = auto_merge_duplicates(self.city.id, {
+            'status': 'success',
+            'duplicates': [
+                {'poi1_id': self.poi_a.id, 'poi1_name': 'Red Lion', 'poi2_id': self.poi_b.id, 'poi2_name': 'Red Lion Pub'},
+                {'poi1_id': self.poi_b.id, 'poi1_name': 'Red Lion Pub', 'poi2_id': self.poi_c.id, 'poi2_name': 'The Red Lion'},
+            ]
+        })
+
+        self.assertEqual(result['cluster_count'], 1)
+        self.assertEqual(result['merged_count'], 2)
+        self.assertEqual(result['errors'], [])
+
+        merged = PointOfInterest.objects.get(city=self.city)
+        self.assertEqual(merged.id, self.poi_a.id)
+        self.assertEqual(merged.description, "Historic pub on Parliament Street")
+        self.assertEqual(merged.phone, "+44 20 7930 4600")
+        self.assertEqual(merged.rank, 2)
+        self.assertEqual(merged.district, self.district)
+        self.assertEqual((merged.latitude, merged.longitude), (51.5072, -0.1276))
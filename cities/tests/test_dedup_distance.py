@@ -0,0 +1,47 @@
+"""
+Test cases for metric distances in duplicate detection.
+"""
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+from ..enrich_tasks import detect_duplicate_pois
+from ..services.dedup.blocking import candidate_pairs
+from ..services.dedup.distance import haversine_meters, pair_distances
+
+
+def poi(name, lat, lon):
+    return {'id': name, 'name': name, 'category': 'see', 'latitude': lat, 'longitude': lon, 'address': None}
+
+
+class HaversineTestCase(SimpleTestCase):
+    def test_known_distances(self):
+        """Test the kernel against known distances, broadcasting one point against many."""
+        distances = haversine_meters(51.5072, -0.1276, [51.5072, 48.8566, np.nan], [-0.1276, 2.3522, 0.0])
+        self.assertAlmostEqual(distances[0], 0.0)
+        self.assertAlmostEqual(distances[1] / 1000, 343.6, delta=0.5)
+        self.assertTrue(np.isnan(distances[2]))
+
+    def test_pair_distances(self):
+        pois = [poi('A', 51.5, -0.12), poi('B', 51.5009, -0.12), poi('C', None, None)]
+        distances = pair_distances(pois, [(0, 1), (0, 2)])
+        self.assertAlmostEqual(distances[0], 100.1, delta=0.1)
+        self.assertIsNone(distances[1])
+
+
+class MetricDuplicateTestCase(SimpleTestCase):
+    def test_threshold_is_the_same_in_every_direction(self):
+        """Test that 90m apart is close both north-south and east-west, and 110m is not."""
+        origin = poi('Red Lion', 51.5, -0.12)
+        # 0.00081 degrees of latitude is 90m; at 51.5N the same 90m east-west is 0.001299 degrees of longitude
+        self.assertTrue(detect_duplicate_pois(origin, poi('Red Lion', 51.50081, -0.12))[0])
+        self.assertTrue(detect_duplicate_pois(origin, poi('Red Lion', 51.5, -0.118701))[0])
+        self.assertFalse(detect_duplicate_pois(origin, poi('Red Lion', 51.5, -0.118412))[0])
+
+    @override_settings(DUPLICATE_DISTANCE_METERS=200)
+    def test_threshold_is_configurable(self):
+        """Test that a wider threshold is used by both detection and blocking."""
+        pois = [poi('Red Lion', 51.5, -0.12), poi('Lion', 51.5, -0.1174)]
+        self.assertFalse(detect_duplicate_pois(pois[0], pois[1])[0])
+        pois[1]['name'] = 'Red Lion'
+        self.assertTrue(detect_duplicate_pois(pois[0], pois[1])[0])
+        self.assertFalse(detect_duplicate_pois(pois[0], pois[1], max_distance=100)[0])
+        self.assertEqual(candidate_pairs([poi('Alpha', 51.5, -0.12), poi('Beta', 51.5, -0.1174)]), [(0, 1)])
@@ -0,0 +1,31 @@
+"""
+Test cases for database-side duplicate key grouping.
+"""
+from django.test import TestCase
+from ..enrich_tasks import find_duplicate_keys
+from ..models import City, District, PointOfInterest
+
+
+class FindDuplicateKeysTestCase(TestCase):
+    def setUp(self):
+        self.city = City.objects.create(name="London")
+        district = District.objects.create(name="Westminster", city=self.city)
+        for name, lat, lon, poi_district in [
+            ("Red Lion", 51.5072001, -0.1276001, None),
+            ("Red Lion", 51.5072004, -0.1275996, district),
+            ("Red Lion", 51.5080000, -0.1276000, None),
+            ("Tate Modern", 51.5076, -0.0994, None),
+            ("Tate Modern", None, None, None),
+        ]:
+            PointOfInterest.objects.create(city=self.city, district=poi_district, name=name, category="see",
+                                           description="", latitude=lat, longitude=lon)
+
+    def test_groups_by_name_and_rounded_coordinates(self):
+        """Test that only POIs sharing a name and 6-decimal coordinates are grouped."""
+        result = find_duplicate_keys(self.city.id)
+
+        self.assertEqual(len(result['duplicates']), 1)
+        group = result['duplicates'][0]
+        self.assertEqual(group['key'], "Red Lion-51.507200--0.127600")
+        self.assertEqual(group['count'], 2)
+        self.assertEqual([poi['name'] for poi in group['pois']], ["Red Lion (Main City)", "Red Lion (Westminster)"])
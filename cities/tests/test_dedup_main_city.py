@@ -0,0 +1,56 @@
+"""
+Test cases for the two-phase main city deduplication.
+"""
+from django.test import SimpleTestCase, TestCase
+from ..enrich_tasks import dedup_main_city
+from ..models import City, District, PointOfInterest
+from ..services.dedup.main_city import plan_main_city_merges
+
+
+def poi(poi_id, name, rank, district=None):
+    return {'id': poi_id, 'name': name, 'rank': rank, 'district__name': district}
+
+
+class PlanMainCityMergesTestCase(SimpleTestCase):
+    def test_merges_use_values_left_by_earlier_merges(self):
+        """Test that a second merge into the same POI does not undo the first one's rank."""
+        pub = poi(3, "Red Lion", 5, "Westminster")
+        plans = plan_main_city_merges([
+            (poi(1, "The Red Lion", 1), pub, []),
+            (poi(2, "Red Lion Pub", 3), pub, []),
+            (poi(1, "The Red Lion", 1), poi(4, "Red Lion", 9, "Soho"), []),
+        ])
+
+        self.assertEqual(plans[0][1], {'name': "The Red Lion", 'district': "Westminster, Main City", 'rank': 1})
+        self.assertEqual(plans[1][1], {'name': "Red Lion Pub", 'district': "Westminster, Main City", 'rank': 1})
+        self.assertIsNone(plans[2][1])
+
+
+class DedupMainCityTestCase(TestCase):
+    def setUp(self):
+        self.city = City.objects.create(name="London")
+        westminster = District.objects.create(name="Westminster", city=self.city)
+        self.main_poi = PointOfInterest.objects.create(
+            city=self.city, name="Red Lion", category="drink", description="", latitude=51.5072, longitude=-0.1276, rank=1
+        )
+        self.district_poi = PointOfInterest.objects.create(
+            city=self.city, district=westminster, name="Red Lion", category="drink", description="",
+            latitude=51.5073, longitude=-0.1277, rank=4
+        )
+        for i in range(20):
+            PointOfInterest.objects.create(city=self.city, district=westminster, name=f"Gallery {i}", category="see",
+                                           description="", latitude=51.51 + i / 100, longitude=-0.13, rank=i)
+
+    def test_merges_main_city_duplicates_in_one_batch(self):
+        result = dedup_main_city(self.city.id)
+
+        self.assertEqual(len(result['duplicates']), 1)
+        self.assertIn("Successfully merged", result['duplicates'][0]['reason'])
+        self.assertFalse(PointOfInterest.objects.filter(id=self.main_poi.id).exists())
+        self.district_poi.refresh_from_db()
+        self.assertEqual(self.district_poi.rank, 1)
+
+        stats = result['stats']
+        self.assertEqual((stats['main_pois'], stats['total_pois']), (1, 22))
+        self.assertEqual(stats['comparisons'] + stats['comparisons_avoided'], 21)
+        self.assertGreater(stats['comparisons_avoided'], 0)
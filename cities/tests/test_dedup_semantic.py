@@ -0,0 +1,104 @@
+"""
+Test cases for embedding-based duplicate detection.
+"""
+import re
+from unittest.mock import patch
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from ..enrich_tasks import find_all_duplicates
+from ..models import City, DuplicateCandidate, PoiEmbedding, PointOfInterest
+from ..services.dedup.semantic import CosineAnnIndex, embed_pois, poi_text
+
+
+class KeywordEncoder:
+    """Embeds texts by the keywords they contain, counting the texts it is asked to embed."""
+    KEYWORDS = ['museum', 'bm', 'russell', 'tate', 'gallery', 'pub']
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts, batch_size=64):
+        self.encoded += len(texts)
+        vectors = np.array([
+            [1.0 if keyword in re.findall(r'\w+', text.lower()) else 0.0 for keyword in self.KEYWORDS] + [0.1]
+            for text in texts
+        ], dtype=np.float32)
+        # "BM" means museum
+        vectors[:, 0] += vectors[:, 1]
+        vectors[:, 1] = 0
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class CosineAnnIndexTestCase(SimpleTestCase):
+    def test_approximate_search_finds_planted_neighbours(self):
+        """Test that the LSH index finds nearly the same neighbours as exact search."""
+        rng = np.random.default_rng(3)
+        originals = rng.standard_normal((1500, 32))
+        vectors = np.vstack([originals, originals + 0.2 * rng.standard_normal(originals.shape)])
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        index = CosineAnnIndex(vectors, exact_limit=100)
+        self.assertIsNotNone(index.tables)
+        neighbours = index.query(range(1500), k=1)
+
+        found = np.mean([result[0][0] == position + 1500 for position, result in enumerate(neighbours)])
+        self.assertGreater(found, 0.95)
+
+    def test_poi_text(self):
+        self.assertEqual(
+            poi_text({'name': 'British Museum', 'sub_category': None, 'address': 'Great Russell St',
+                      'description': 'Free. Huge collections.'}),
+            'British Museum. Great Russell St. Free.'
+        )
+
+
+class SemanticDuplicatesTestCase(TestCase):
+    def setUp(self):
+        self.city = City.objects.create(name="London")
+        self.museum, self.bm, self.tate = [
+            PointOfInterest.objects.create(city=self.city, name=name, category="see", address=address,
+                                           description="", latitude=lat, longitude=lon)
+            for name, address, lat, lon in [
+                ("British Museum", "Great Russell St", 51.5194, -0.1270),
+                ("The BM", "Great Russell St", 51.5190, -0.1262),
+                ("Tate Modern", "Bankside", 51.5076, -0.0994),
+            ]
+        ]
+
+    def test_embeddings_are_cached_by_content(self):
+        """Test that unchanged POI texts are not embedded again."""
+        encoder = KeywordEncoder()
+        pois = list(PointOfInterest.objects.values('name', 'sub_category', 'address', 'description'))
+
+        first = embed_pois(pois, model_name='keywords', encoder=encoder)
+        second = embed_pois(pois, model_name='keywords', encoder=encoder)
+
+        self.assertEqual(encoder.encoded, 3)
+        self.assertEqual(PoiEmbedding.objects.count(), 3)
+        np.testing.assert_allclose(first, second)
+
+    def test_semantic_neighbours_are_stored_for_review(self):
+        """Test that embedding neighbours missed by name matching are stored but not auto-merged."""
+        with patch('cities.services.dedup.semantic.get_encoder', return_value=KeywordEncoder()):
+            result = find_all_duplicates(self.city.id, semantic=True)
+
+        self.assertEqual(result['duplicates'], [])
+        self.assertEqual([(pair['poi1_id'], pair['poi2_id']) for pair in result['semantic_duplicates']],
+                         [(self.museum.id, self.bm.id)])
+        self.assertEqual(DuplicateCandidate.objects.get().source, 'semantic')
+
+    def test_semantic_scan_after_fuzzy_scan(self):
+        """Test that a fuzzy scan neither hides changes from the next semantic scan nor drops its candidates."""
+        find_all_duplicates(self.city.id)
+        with patch('cities.services.dedup.semantic.get_encoder', return_value=KeywordEncoder()):
+            result = find_all_duplicates(self.city.id, semantic=True)
+
+        self.assertEqual([(pair['poi1_id'], pair['poi2_id']) for pair in result['semantic_duplicates']],
+                         [(self.museum.id, self.bm.id)])
+
+        self.bm.description = "Edited"
+        self.bm.save()
+        find_all_duplicates(self.city.id)
+
+        self.assertEqual(DuplicateCandidate.objects.get().source, 'semantic')
@@ -0,0 +1,81 @@
+"""
+Test cases for persisted, incrementally updated duplicate candidates.
+"""
+from django.test import TestCase
+from django.urls import reverse
+from ..models import City, DuplicateCandidate, PointOfInterest
+from ..enrich_tasks import detect_duplicate_pois
+from ..services.dedup.candidates import bulk_update_pois, scan_duplicates
+
+
+class ScanDuplicatesTestCase(TestCase):
+    def setUp(self):
+        self.city = City.objects.create(name="London")
+        self.museum, self.museum_copy, self.tate = [
+            PointOfInterest.objects.create(city=self.city, name=name, category="see", description="",
+                                           latitude=lat, longitude=lon)
+            for name, lat, lon in [
+                ("British Museum", 51.5194, -0.1270),
+                ("British Museum", 51.5195, -0.1271),
+                ("Tate Modern", 51.5076, -0.0994),
+            ]
+        ]
+
+    def test_incremental_scan_compares_only_changed_pois(self):
+        """Test that only new or edited POIs are compared after the first scan."""
+        first = scan_duplicates(self.city, detect_duplicate_pois)
+        self.assertTrue(first.full)
+        self.assertEqual(
+            list(DuplicateCandidate.objects.values_list('poi1_id', 'poi2_id')),
+            [(self.museum.id, self.museum_copy.id)]
+        )
+
+        tate_copy = PointOfInterest.objects.create(city=self.city, name="Tate Modern", category="see",
+                                                   description="", latitude=51.5077, longitude=-0.0995)
+        second = scan_duplicates(self.city, detect_duplicate_pois)
+
+        self.assertFalse(second.full)
+        self.assertEqual(second.changed_pois, 1)
+        # The new POI is only paired with the POI sharing its blocks, the museum pair is not compared again
+        self.assertEqual(second.compared_pairs, 1)
+        self.assertEqual(second.candidate_count, 2)
+        self.assertTrue(DuplicateCandidate.objects.filter(poi1=self.tate, poi2=tate_copy).exists())
+
+        # Renaming a POI drops its stale candidate
+        self.museum_copy.name = "Natural History Museum"
+        self.museum_copy.save()
+        third = scan_duplicates(self.city, detect_duplicate_pois)
+        self.assertEqual(third.candidate_count, 1)
+        self.assertFalse(DuplicateCandidate.objects.filter(poi2=self.museum_copy).exists())
+
+    def test_bulk_updates_are_rescanned(self):
+        """Test that POIs saved with bulk_update_pois are compared by the next incremental scan."""
+        scan_duplicates(self.city, detect_duplicate_pois)
+
+        self.tate.latitude, self.tate.longitude = 51.5195, -0.1272
+        self.tate.name = "British Museum Shop"
+        bulk_update_pois([self.tate], ['name', 'latitude', 'longitude'])
+        scan = scan_duplicates(self.city, detect_duplicate_pois)
+
+        self.assertEqual(scan.changed_pois, 1)
+        self.assertGreater(scan.compared_pairs, 0)
+
+    def test_view_pages_through_candidates(self):
+        """Test that the duplicates endpoint pages through stored candidates."""
+        PointOfInterest.objects.create(city=self.city, name="Tate Modern", category="see",
+                                       description="", latitude=51.5077, longitude=-0.0995)
+        scan_duplicates(self.city, detect_duplicate_pois)
+
+        response = self.client.get(reverse('duplicate_candidates', args=[self.city.name]),
+                                   {'page': 2, 'page_size': 1})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['page'], data['page_count'], data['total']), (2, 2, 2))
+        self.assertEqual(len(data['duplicates']), 1)
+        self.assertIn('(Main City)', data['duplicates'][0]['poi1_name'])
+
+        for page_size in (0, -5):
+            response = self.client.get(reverse('duplicate_candidates', args=[self.city.name]), {'page_size': page_size})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['duplicates']), 1)
@@ -0,0 +1,297 @@
+"""
+Test cases for concurrent geocoding, run against a local stand-in Mapbox server.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import unquote, urlparse
+import httpx
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from ..enrich_tasks import geocode_city_coordinates, geocode_missing_addresses, geocode_missing_coordinates
+from ..models import City, GeocodeCacheEntry, PointOfInterest
+from ..services.geocoding.batch import iter_batch_responses, split_batch_response
+from ..services.geocoding.engine import GeocodeRequest, GeocodeResponse, iter_responses
+from ..services.geocoding.fake_server import FakeMapboxServer
+from ..services.geocoding.mapbox import first_feature, forward_request, reverse_request
+
+
+class StubMapboxHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = unquote(urlparse(self.path).path.rsplit('/', 1)[-1][:-len('.json')])
+        self.server.queries.append(query)
+
+        # The first request for a "Busy" POI is rate limited
+        if 'Busy' in query and self.server.queries.count(query) == 1:
+            self._send(429, {'message': 'Too Many Requests'}, {'Retry-After': '0'})
+            return
+
+        parts = query.split(',')
+        try:
+            lon, lat = float(parts[0]), float(parts[1])
+            feature = {'place_name': f"{round(lat, 4)} Test Street, London", 'geometry': {'coordinates': [lon, lat]}}
+        except ValueError:
+            if 'Nowhere' in query:
+                self._send(200, {'features': []})
+                return
+            feature = {'place_name': query, 'geometry': {'coordinates': [-0.1276, 51.5072]},
+                       'context': [{'id': 'country.1', 'text': 'United Kingdom'}]}
+        self._send(200, {'features': [feature]})
+
+    def _send(self, status, data, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CacheKeyTestCase(SimpleTestCase):
+    def test_equivalent_queries_share_a_key(self):
+        """Test that case, spacing and sub-metre coordinate noise do not split cache entries."""
+        first = forward_request(1, "British Museum,  Great Russell St, London", 'a', 'poi', (-0.12761, 51.50722))
+        second = forward_request(2, "british museum, great russell st ,London", 'b', 'poi', (-0.12758, 51.50719))
+        self.assertEqual(first.cache_key, second.cache_key)
+        self.assertNotEqual(first.cache_key, forward_request(3, "British Museum", 'a', 'address').cache_key)
+
+        self.assertEqual(reverse_request(1, 51.5072001, -0.1276001, 'a').cache_key,
+                         reverse_request(2, 51.5072004, -0.1276004, 'b').cache_key)
+
+    def test_api_versions_do_not_share_keys(self):
+        """Test that the v5 and v6 backends cache their answers separately."""
+        v5_keys = (forward_request(1, "British Museum", 'a', 'address').cache_key, reverse_request(2, 51.5, -0.12, 'a').cache_key)
+        with override_settings(GEOCODING_BACKEND='mapbox_batch'):
+            v6_keys = (forward_request(1, "British Museum", 'a', 'address').cache_key, reverse_request(2, 51.5, -0.12, 'a').cache_key)
+            poi_key = forward_request(3, "British Museum", 'a', 'address,poi').cache_key
+        self.assertFalse(set(v5_keys) & set(v6_keys))
+        # v6 cannot serve POIs, so those lookups are sent to v5 on both backends
+        self.assertEqual(poi_key, forward_request(3, "British Museum", 'a', 'address,poi').cache_key)
+
+
+class GeocodingEngineTestCase(SimpleTestCase):
+    def test_concurrency_and_rate_limit(self):
+        """Test that no more than N requests are in flight and starts respect the rate budget."""
+        in_flight = 0
+        peak = 0
+        starts = []
+
+        async def handler(request):
+            nonlocal in_flight, peak
+            starts.append(time.monotonic())
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.05)
+            in_flight -= 1
+            return httpx.Response(200, json={'features': [], 'key': request.url.params['key']})
+
+        requests = [GeocodeRequest(i, 'https://geocoder.test/places.json', {'key': i}) for i in range(20)]
+        responses = list(iter_responses(requests, concurrency=4, rate=100, transport=httpx.MockTransport(handler)))
+
+        self.assertEqual(sorted(response.key for response in responses), list(range(20)))
+        self.assertTrue(all(response.error is None for response in responses))
+        self.assertLessEqual(peak, 4)
+        self.assertGreaterEqual(max(starts) - min(starts), 15 / 100)
+
+    @patch('cities.services.geocoding.engine._retry_delay', return_value=0)
+    def test_retries_server_errors(self, mock_delay):
+        """Test that 5xx responses are retried and persistent client errors are reported."""
+        attempts = {}
+
+        def handler(request):
+            path = request.url.path
+            attempts[path] = attempts.get(path, 0) + 1
+            if path == '/flaky.json' and attempts[path] < 3:
+                return httpx.Response(503)
+            if path == '/missing.json':
+                return httpx.Response(401, text='Not Authorized')
+            return httpx.Response(200, json={'features': []})
+
+        requests = [GeocodeRequest(name, f'https://geocoder.test/{name}.json', {}) for name in ('flaky', 'missing')]
+        responses = {response.key: response for response in iter_responses(
+            requests, concurrency=2, rate=0, transport=httpx.MockTransport(handler)
+        )}
+
+        self.assertEqual(responses['flaky'].data, {'features': []})
+        self.assertEqual(attempts['/flaky.json'], 3)
+        self.assertEqual(responses['missing'].error, 'HTTP 401: Not Authorized')
+        self.assertEqual(attempts['/missing.json'], 1)
+
+
+class BatchGeocodingTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = FakeMapboxServer(('127.0.0.1', 0))
+        self.server.start()
+        self.override = override_settings(GEOCODING_RATE_LIMIT=0, **self.server.settings_overrides())
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_batches_match_single_requests(self):
+        """Test that batch answers map back to the right keys and equal the per-lookup answers."""
+        requests = []
+        for i in range(7):
+            if i % 2:
+                requests.append(reverse_request(f"poi-{i}", 51.5 + i / 1000, -0.12, 'test-token'))
+            else:
+                text = "Nowhere Inn, No Such Road" if i == 4 else f"Cafe {i}, High Street, London"
+                requests.append(forward_request(f"poi-{i}", text, 'test-token', 'address', (-0.1276, 51.5072)))
+
+        single = {response.key: first_feature(response.data) for response in iter_responses(requests)}
+        self.server.reset_counts()
+        batch = {response.key: first_feature(response.data) for response in iter_batch_responses(requests, batch_size=3)}
+
+        self.assertEqual(self.server.http_requests, 3)
+        self.assertEqual(self.server.queries, 7)
+        self.assertEqual(batch, single)
+        self.assertIsNone(batch['poi-4'])
+        self.assertEqual(batch['poi-3']['place_name'], "51.503 Fake Street, Testville")
+
+    def test_poi_lookups_match_single_requests(self):
+        """Test that lookups including the 'poi' type v6 does not serve get the same feature types on both backends."""
+        with override_settings(GEOCODING_BACKEND='mapbox_batch'):
+            requests = [forward_request(i, f"Cafe {i}, High Street, London", 'test-token', 'address,poi') for i in range(3)]
+            requests.append(forward_request(3, "10 High Street, London", 'test-token', 'address'))
+
+        single = {response.key: first_feature(response.data) for response in iter_responses(requests)}
+        self.server.reset_counts()
+        batch = {response.key: first_feature(response.data) for response in iter_batch_responses(requests)}
+
+        self.assertEqual([batch[key]['place_type'] for key in range(4)], [['poi']] * 3 + [['address']])
+        self.assertEqual({key: feature['place_type'] for key, feature in batch.items()},
+                         {key: feature['place_type'] for key, feature in single.items()})
+        self.assertEqual(self.server.http_requests, 4)
+        self.assertTrue(requests[0].cache_key[1].startswith('mapbox.v5|'))
+        self.assertTrue(requests[3].cache_key[1].startswith('mapbox.v6|'))
+
+    def test_failed_batch_fails_each_query(self):
+        requests = [reverse_request(i, 51.5, -0.12, 'test-token') for i in range(2)]
+
+        failed = split_batch_response(requests, GeocodeResponse(0, None, 'HTTP 401: Not Authorized'))
+        short = split_batch_response(requests, GeocodeResponse(0, {'batch': [{'features': []}]}, None))
+
+        self.assertEqual([response.error for response in failed], ['HTTP 401: Not Authorized'] * 2)
+        self.assertEqual([response.key for response in short], [0, 1])
+        self.assertTrue(all(response.error.startswith("Batch returned 1 results") for response in short))
+
+
+@patch.dict(os.environ, {'MAPBOX_TOKEN': 'test-token'})
+class GeocodingTasksTestCase(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubMapboxHandler)
+        self.server.queries = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.override = override_settings(
+            MAPBOX_GEOCODING_URL=f"http://127.0.0.1:{self.server.server_address[1]}/geocoding",
+            GEOCODING_RATE_LIMIT=0
+        )
+        self.override.enable()
+        self.city = City.objects.create(name="London")
+
+    def tearDown(self):
+        self.override.disable()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_geocode_missing_addresses(self):
+        for i in range(12):
+            PointOfInterest.objects.create(city=self.city, name=f"Busy Cafe {i}" if i == 3 else f"Cafe {i}",
+                                           category="eat", description="", latitude=51.5 + i / 1000, longitude=-0.12)
+
+        result = geocode_missing_addresses(self.city.id)
+
+        self.assertEqual((result['processed_count'], result['updated_count']), (12, 12))
+        self.assertFalse(PointOfInterest.objects.filter(address__isnull=True).exists())
+        self.assertEqual(PointOfInterest.objects.get(name="Cafe 2").address, "51.502 Test Street, London")
+
+    def test_geocode_missing_coordinates(self):
+        PointOfInterest.objects.create(city=self.city, name="Busy Museum", category="see", description="",
+                                       address="Great Russell St")
+        PointOfInterest.objects.create(city=self.city, name="Nowhere Inn", category="sleep", description="",
+                                       address="No Such Road")
+
+        result = geocode_missing_coordinates(self.city.id)
+
+        self.assertEqual((result['processed_count'], result['updated_count']), (2, 1))
+        museum = PointOfInterest.objects.get(name="Busy Museum")
+        self.assertEqual((museum.latitude, museum.longitude), (51.5072, -0.1276))
+        self.assertIn("Busy Museum, Great Russell St, London", self.server.queries)
+
+    def test_geocode_city_coordinates(self):
+        City.objects.filter(id=self.city.id).update(country='')
+        result = geocode_city_coordinates(self.city.id)
+
+        self.assertEqual(result['status'], 'success')
+        self.city.refresh_from_db()
+        self.assertEqual((self.city.latitude, self.city.longitude, self.city.country),
+                         (51.5072, -0.1276, 'United Kingdom'))
+
+    def test_second_run_is_answered_from_cache(self):
+        for i in range(3):
+            PointOfInterest.objects.create(city=self.city, name=f"Cafe {i}", category="eat", description="",
+                                           latitude=51.5 + i / 1000, longitude=-0.12)
+        first = geocode_missing_addresses(self.city.id)
+        self.assertEqual(first['cache'], {'hits': 0, 'misses': 3, 'coalesced': 0})
+
+        # Re-importing the city recreates its POIs without addresses
+        PointOfInterest.objects.update(address=None)
+        self.server.queries.clear()
+        second = geocode_missing_addresses(self.city.id)
+
+        self.assertEqual(second['updated_count'], 3)
+        self.assertEqual(second['cache'], {'hits': 3, 'misses': 0, 'coalesced': 0})
+        self.assertEqual(self.server.queries, [])
+        self.assertEqual(sum(GeocodeCacheEntry.objects.values_list('hit_count', flat=True)), 3)
+
+    def test_identical_queries_are_coalesced(self):
+        for i in range(3):
+            PointOfInterest.objects.create(city=self.city, name="Nowhere Inn", category="sleep", description="",
+                                           address="No Such Road")
+
+        result = geocode_missing_coordinates(self.city.id)
+
+        self.assertEqual(result['cache'], {'hits': 0, 'misses': 1, 'coalesced': 2})
+        self.assertEqual(len(self.server.queries), 1)
+        # Empty answers are cached too
+        self.assertEqual(GeocodeCacheEntry.objects.get().response, {'features': []})
+
+    def test_expired_entries_are_refetched(self):
+        geocode_city_coordinates(self.city.id)
+        GeocodeCacheEntry.objects.update(fetched_at=timezone.now() - timedelta(days=365))
+        self.server.queries.clear()
+
+        geocode_city_coordinates(self.city.id)
+
+        self.assertEqual(len(self.server.queries), 1)
+        self.assertEqual(GeocodeCacheEntry.objects.count(), 1)
+        self.assertGreater(GeocodeCacheEntry.objects.get().fetched_at, timezone.now() - timedelta(days=1))
+
+    def test_batch_backend(self):
+        """Test that the batch backend geocodes a city's POIs in one request to the stand-in server."""
+        fake = FakeMapboxServer(('127.0.0.1', 0))
+        fake.start()
+        self.addCleanup(fake.server_close)
+        self.addCleanup(fake.shutdown)
+        for i in range(5):
+            PointOfInterest.objects.create(city=self.city, name=f"Cafe {i}", category="eat", description="",
+                                           latitude=51.5 + i / 1000, longitude=-0.12)
+
+        with override_settings(GEOCODING_BACKEND='mapbox_batch', **fake.settings_overrides()):
+            result = geocode_missing_addresses(self.city.id)
+
+        self.assertEqual(result['updated_count'], 5)
+        self.assertEqual(fake.http_requests, 1)
+        self.assertEqual(PointOfInterest.objects.get(name="Cafe 2").address, "51.502 Fake Street, Testville")
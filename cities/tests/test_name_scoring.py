@@ -0,0 +1,85 @@
+"""
+Test cases for batch fuzzy name scoring of OSM candidates.
+"""
+import random
+from django.test import SimpleTestCase
+import numpy as np
+import pandas as pd
+from thefuzz import fuzz
+from ..enrich_tasks import find_best_name_match_from_nearby
+from ..services.enrichment.osm_matching import NAME_FIELDS, score_name_matrix, score_name_pairs
+
+
+def legacy_best_name_match(poi_name, nearby_osm_pois, threshold=60):
+    """The per-row thefuzz loop that find_best_name_match_from_nearby used to run."""
+    if poi_name is None or poi_name.strip() == "":
+        return None
+    best_score = 0
+    best_match = None
+    for position in range(len(nearby_osm_pois)):
+        osm_poi = nearby_osm_pois.iloc[position]
+        poi_best_score = 0
+        for field in NAME_FIELDS:
+            if field in osm_poi and pd.notna(osm_poi[field]):
+                osm_name = str(osm_poi[field]).strip()
+                if osm_name:
+                    poi_best_score = max(poi_best_score, fuzz.token_sort_ratio(poi_name.strip(), osm_name))
+        if poi_best_score > best_score and poi_best_score >= threshold:
+            best_score = poi_best_score
+            best_match = osm_poi
+    return best_match if best_score >= threshold else None
+
+
+WORDS = ['The', 'Red', 'Lion', 'Café', 'Nero', 'Pub', 'King\'s', 'Arms', 'St.', 'Paul\'s', '!!!', 'Müller', '  ']
+
+
+def random_name(rng):
+    if rng.random() < 0.15:
+        return rng.choice([None, np.nan, '', '   '])
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))
+
+
+class NameScoringTestCase(SimpleTestCase):
+    def setUp(self):
+        self.nearby = pd.DataFrame({
+            'id': [1, 2, 3],
+            'name': ['Corner Shop', None, 'Lion Red'],
+            'name:en': [None, 'The Red Lion', None],
+            'brand': [np.nan, None, 'Greene King'],
+        })
+
+    def test_matrix_matches_thefuzz(self):
+        """Test that the matrix holds thefuzz's best score across name fields."""
+        scores = score_name_matrix(['Red Lion', None], self.nearby)
+        self.assertEqual(scores.shape, (2, 3))
+        self.assertEqual(scores[0, 0], fuzz.token_sort_ratio('Red Lion', 'Corner Shop'))
+        self.assertEqual(scores[0, 1], fuzz.token_sort_ratio('Red Lion', 'The Red Lion'))
+        self.assertEqual(scores[0, 2], 100)
+        self.assertFalse(scores[1].any())
+
+    def test_pairs_match_matrix(self):
+        """Test that pairwise scores agree with the matrix."""
+        positions = np.array([2, 0, 1])
+        pairs = score_name_pairs(['Red Lion', 'Corner Shop', 'Red Lion'], self.nearby, positions)
+        matrix = score_name_matrix(['Red Lion', 'Corner Shop'], self.nearby)
+        self.assertEqual(list(pairs), [matrix[0, 2], matrix[1, 0], matrix[0, 1]])
+
+    def test_same_winner_as_legacy_loop(self):
+        """Test that the batch scorer picks the same winner as the per-row loop on random names."""
+        rng = random.Random(7)
+        for _ in range(300):
+            size = rng.randint(1, 6)
+            nearby = pd.DataFrame({
+                'id': range(size),
+                **{field: [random_name(rng) for _ in range(size)] for field in NAME_FIELDS},
+            })
+            poi_name = random_name(rng)
+            if not isinstance(poi_name, str):
+                poi_name = None
+
+            expected = legacy_best_name_match(poi_name, nearby)
+            actual = find_best_name_match_from_nearby(poi_name, nearby)
+            if expected is None:
+                self.assertIsNone(actual)
+            else:
+                self.assertEqual(actual['id'], expected['id'])
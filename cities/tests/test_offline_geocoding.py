@@ -0,0 +1,118 @@
+"""
+Test cases for reverse geocoding from local OSM address points.
+"""
+import os
+from unittest.mock import patch
+import geopandas as gpd
+from django.test import SimpleTestCase, TestCase, override_settings
+from shapely.geometry import Point
+from ..enrich_tasks import geocode_missing_addresses
+from ..models import City, PointOfInterest
+from ..services.geocoding import offline
+from ..services.geocoding.fake_server import FakeMapboxServer
+from .osm_fixtures import FakePbfMixin
+
+
+def make_address_points():
+    """Build a small address table shaped like load_address_points output."""
+    return gpd.GeoDataFrame(
+        {
+            'id': [1, 2, 3],
+            'osm_type': ['node', 'way', 'node'],
+            'address': ['1 High Street, SW1A 1AA London', '2 High Street', '9 Far Road'],
+        },
+        # About 7m, 20m and 1km north of the POI used below
+        geometry=[Point(-0.1276, 51.50726), Point(-0.1276, 51.50738), Point(-0.1276, 51.5162)],
+        crs="EPSG:4326"
+    )
+
+
+class OfflineReverseGeocoderTestCase(SimpleTestCase):
+    def test_nearest_address_within_radius(self):
+        geocoder = offline.OfflineReverseGeocoder(make_address_points())
+
+        results = geocoder.nearest([51.5072, 51.5072, 51.5140], [-0.1276, -0.1276, -0.1276], 25)
+        farther = geocoder.nearest([51.5072], [-0.1276], 5)
+
+        self.assertEqual(results[0][0], '1 High Street, SW1A 1AA London')
+        self.assertAlmostEqual(results[0][1], 6.7, delta=0.2)
+        self.assertEqual(results[1], results[0])
+        self.assertIsNone(results[2])
+        self.assertEqual(farther, [None])
+
+
+class AddressCacheTestCase(FakePbfMixin, SimpleTestCase):
+    @patch('cities.services.geocoding.offline._parse_addresses')
+    def test_cached_addresses_cover_smaller_boxes(self, mock_parse):
+        """Test that a second load inside the first one's bounding box reads the cache."""
+        mock_parse.return_value = make_address_points()
+
+        offline.load_address_points(self.pbf_file, self.cache_dir, bounding_box=(-0.2, 51.4, -0.1, 51.6))
+        addresses = offline.load_address_points(self.pbf_file, self.cache_dir, bounding_box=(-0.13, 51.5, -0.12, 51.51))
+
+        self.assertEqual(mock_parse.call_count, 1)
+        self.assertEqual(list(addresses['address']), ['1 High Street, SW1A 1AA London', '2 High Street'])
+
+
+@patch.dict(os.environ, {'MAPBOX_TOKEN': 'test-token'})
+class OfflineAddressGeocodingTestCase(FakePbfMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = FakeMapboxServer(('127.0.0.1', 0))
+        self.server.start()
+        self.override = override_settings(GEOCODING_RATE_LIMIT=0, **self.server.settings_overrides())
+        self.override.enable()
+
+        city = City.objects.create(name="London")
+        self.city_id = city.id
+        PointOfInterest.objects.create(city=city, name="Corner Cafe", category="eat", description="",
+                                       latitude=51.5072, longitude=-0.1276)
+        PointOfInterest.objects.create(city=city, name="Park Kiosk", category="eat", description="",
+                                       latitude=51.5300, longitude=-0.1276)
+
+    def tearDown(self):
+        self.override.disable()
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+    @patch('cities.enrich_tasks.load_address_points')
+    def test_mapbox_only_for_offline_misses(self, mock_load):
+        mock_load.return_value = make_address_points()
+
+        result = geocode_missing_addresses(self.city_id, self.pbf_file)
+
+        self.assertEqual((result['updated_count'], result['offline_count']), (2, 1))
+        self.assertEqual(self.server.queries, 1)
+        self.assertEqual(PointOfInterest.objects.get(name="Corner Cafe").address, '1 High Street, SW1A 1AA London')
+        self.assertEqual(PointOfInterest.objects.get(name="Park Kiosk").address, "51.53 Fake Street, Testville")
+
+    def test_missing_pbf_falls_back_to_mapbox(self):
+        """Test that a missing PBF file is logged and every POI is geocoded with Mapbox."""
+        with self.assertLogs('cities.enrich_tasks', level='ERROR'):
+            result = geocode_missing_addresses(self.city_id, os.path.join(self.tmp.name, 'missing.osm.pbf'))
+
+        self.assertEqual((result['updated_count'], result['offline_count']), (2, 0))
+        self.assertEqual(self.server.queries, 2)
+
+    @patch('cities.enrich_tasks.load_address_points')
+    def test_unreadable_pbf_falls_back_to_mapbox(self, mock_load):
+        """Test that an extract that fails to parse is logged and every POI is geocoded with Mapbox."""
+        mock_load.side_effect = OSError("Not a PBF file")
+
+        with self.assertLogs('cities.enrich_tasks', level='ERROR'):
+            result = geocode_missing_addresses(self.city_id, self.pbf_file)
+
+        self.assertEqual((result['updated_count'], result['offline_count']), (2, 0))
+        self.assertEqual(self.server.queries, 2)
+
+    @patch('cities.enrich_tasks.load_address_points')
+    def test_no_mapbox_token_needed_when_all_found(self, mock_load):
+        mock_load.return_value = make_address_points()
+        PointOfInterest.objects.filter(name="Park Kiosk").delete()
+
+        with patch.dict(os.environ, {'MAPBOX_TOKEN': ''}):
+            result = geocode_missing_addresses(self.city_id, self.pbf_file)
+
+        self.assertEqual(result['offline_count'], 1)
+        self.assertEqual(self.server.http_requests, 0)
@@ -0,0 +1,70 @@
+"""
+Test cases for the osm_cache service module.
+"""
+from django.test import SimpleTestCase
+from unittest.mock import patch
+from ..services.enrichment import osm_cache
+from .osm_fixtures import FakePbfMixin, make_osm_features
+
+
+class OsmCacheTestCase(FakePbfMixin, SimpleTestCase):
+    @patch('cities.services.enrichment.osm_cache._parse_pbf')
+    def test_warm_load_skips_parsing(self, mock_parse):
+        """Test that a second load reads the GeoParquet cache instead of the PBF."""
+        mock_parse.return_value = make_osm_features()
+
+        osm_pois, osm_projected = osm_cache.load_osm_features(self.pbf_file, self.cache_dir)
+        self.assertEqual(mock_parse.call_count, 1)
+        self.assertEqual(osm_pois.crs.to_epsg(), 4326)
+        self.assertEqual(osm_projected.crs.to_epsg(), 3857)
+        self.assertNotIn(osm_cache.PROJECTED_GEOMETRY_COLUMN, osm_pois.columns)
+
+        # A fresh process only has the on-disk cache
+        osm_cache.clear_loaded_features()
+        cached_pois, cached_projected = osm_cache.load_osm_features(self.pbf_file, self.cache_dir)
+
+        self.assertEqual(mock_parse.call_count, 1)
+        self.assertEqual(list(cached_pois['id']), [1, 2])
+        self.assertEqual(cached_pois.iloc[0]['tags'], str({'cuisine': 'coffee'}))
+        self.assertAlmostEqual(
+            cached_projected.geometry.iloc[0].x, osm_projected.geometry.iloc[0].x, places=6
+        )
+
+    @patch('cities.services.enrichment.osm_cache._parse_pbf')
+    def test_changed_pbf_invalidates_cache(self, mock_parse):
+        """Test that new PBF contents produce a new cache entry."""
+        mock_parse.return_value = make_osm_features()
+        osm_cache.load_osm_features(self.pbf_file, self.cache_dir)
+
+        with open(self.pbf_file, 'wb') as f:
+            f.write(b'updated pbf contents')
+        osm_cache.clear_loaded_features()
+        osm_cache.load_osm_features(self.pbf_file, self.cache_dir)
+
+        self.assertEqual(mock_parse.call_count, 2)
+
+    @patch('cities.services.enrichment.osm_cache._parse_pbf')
+    def test_larger_bounding_box_is_reused(self, mock_parse):
+        """Test that a cached area covering the requested box is clipped instead of re-parsed."""
+        mock_parse.return_value = make_osm_features()
+        osm_cache.load_osm_features(self.pbf_file, self.cache_dir, bounding_box=(-0.2, 51.4, 0.0, 51.6))
+        self.assertEqual(mock_parse.call_args[0][1], (-0.2, 51.4, 0.0, 51.6))
+
+        osm_cache.clear_loaded_features()
+        bounding_box = osm_cache.bounding_box_from_points([51.5072], [-0.1276], padding_meters=20)
+        osm_pois, osm_projected = osm_cache.load_osm_features(self.pbf_file, self.cache_dir, bounding_box=bounding_box)
+
+        self.assertEqual(mock_parse.call_count, 1)
+        self.assertEqual(len(osm_pois), len(osm_projected))
+        self.assertIn(1, list(osm_pois['id']))
+
+    def test_bounding_box_from_points(self):
+        """Test that the POI extent is padded on every side."""
+        min_lon, min_lat, max_lon, max_lat = osm_cache.bounding_box_from_points(
+            [51.50, 51.52], [-0.13, -0.10], padding_meters=100
+        )
+        self.assertLess(min_lat, 51.50)
+        self.assertGreater(max_lat, 51.52)
+        self.assertLess(min_lon, -0.13)
+        self.assertGreater(max_lon, -0.10)
+        self.assertIsNone(osm_cache.bounding_box_from_points([], []))
@@ -0,0 +1,59 @@
+"""
+Test cases for persisted OSM match candidates.
+"""
+from django.test import TestCase
+from django.urls import reverse
+from unittest.mock import patch
+from ..enrich_tasks import find_osm_ids_local
+from ..models import City, PointOfInterest, OsmMatchCandidate
+from .test_osm_matching import make_osm_frames
+
+
+class OsmMatchCandidateTestCase(TestCase):
+    def setUp(self):
+        self.city = City.objects.create(name="London")
+        self.poi = PointOfInterest.objects.create(
+            city=self.city, name="Red Lion", category="drink", description="",
+            latitude=51.50720, longitude=-0.12760
+        )
+
+    def run_match(self):
+        with patch('cities.enrich_tasks.load_osm_data_from_pbf', return_value=make_osm_frames()), \
+                patch('cities.enrich_tasks.os.path.isfile', return_value=True):
+            return find_osm_ids_local(self.city.id, [self.poi], "extract.osm.pbf")
+
+    def test_stores_ranked_candidates(self):
+        """Test that a matching run stores the winner and the runners-up with their tags."""
+        self.run_match()
+
+        candidates = list(self.poi.osm_candidates.all())
+        self.assertEqual([c.osm_id for c in candidates], ["way/11", "node/10"])
+        self.assertEqual([c.rank for c in candidates], [0, 1])
+        self.assertEqual(candidates[0].osm_type, "way")
+        self.assertEqual(candidates[0].source, "pbf")
+        self.assertEqual(candidates[0].tags, {'name': 'The Red Lion'})
+        self.assertGreaterEqual(candidates[0].name_score, 60)
+
+    def test_rerun_replaces_candidates(self):
+        """Test that matching again replaces the stored candidates instead of adding to them."""
+        self.run_match()
+        self.run_match()
+        self.assertEqual(OsmMatchCandidate.objects.filter(poi=self.poi).count(), 2)
+
+    def test_select_candidate(self):
+        """Test that selecting a candidate sets the POI's OSM ID and moves it to rank 0."""
+        self.run_match()
+        runner_up = self.poi.osm_candidates.get(rank=1)
+
+        response = self.client.post(reverse('poi_select_osm_candidate', args=[
+            self.city.name, self.poi.id, runner_up.id
+        ]))
+
+        self.assertEqual(response.status_code, 200)
+        self.poi.refresh_from_db()
+        self.assertEqual(self.poi.osm_id, "node/10")
+        self.assertEqual([c.osm_id for c in self.poi.osm_candidates.all()], ["node/10", "way/11"])
+
+        detail = self.client.get(reverse('poi_detail', args=[self.city.name, self.poi.id])).json()
+        self.assertEqual(detail['osm_id'], "node/10")
+        self.assertEqual(len(detail['osm_candidates']), 2)
@@ -0,0 +1,92 @@
+"""
+Test cases for applying OsmChange files to the OSM feature cache.
+"""
+import gzip
+import os
+from django.test import SimpleTestCase
+from unittest.mock import patch
+import pandas as pd
+from ..services.enrichment import osm_cache, osm_changes
+from ..services.enrichment.osm_matching import feature_osm_ids
+from .osm_fixtures import FakePbfMixin, make_osm_features
+
+CHANGE_FILE = """<?xml version="1.0" encoding="UTF-8"?>
+<osmChange version="0.6" generator="test">
+  <modify>
+    <node id="1" version="2" lat="51.5072" lon="-0.1276">
+      <tag k="amenity" v="cafe"/>
+      <tag k="name" v="Cafe Two"/>
+    </node>
+  </modify>
+  <delete>
+    <way id="2" version="3"/>
+  </delete>
+  <create>
+    <node id="10" version="1" lat="51.5080" lon="-0.1290"/>
+    <node id="11" version="1" lat="51.5080" lon="-0.1288"/>
+    <node id="12" version="1" lat="51.5082" lon="-0.1288"/>
+    <way id="3" version="1">
+      <nd ref="10"/>
+      <nd ref="11"/>
+      <nd ref="12"/>
+      <nd ref="10"/>
+      <tag k="shop" v="books"/>
+      <tag k="name" v="New Books"/>
+    </way>
+    <node id="13" version="1" lat="51.5090" lon="-0.1300">
+      <tag k="highway" v="crossing"/>
+    </node>
+  </create>
+</osmChange>
+"""
+
+
+class OsmChangesTestCase(FakePbfMixin, SimpleTestCase):
+    def setUp(self):
+        """Add a gzipped change file next to the fake PBF."""
+        super().setUp()
+        self.change_file = os.path.join(self.tmp.name, '001.osc.gz')
+        with gzip.open(self.change_file, 'wt') as f:
+            f.write(CHANGE_FILE)
+
+    def test_parse_change_files(self):
+        """Test that creates, modifies and deletes are parsed and relations ignored."""
+        elements, node_locations = osm_changes.parse_change_files([self.change_file])
+
+        self.assertEqual(elements[('node', 1)]['tags']['name'], 'Cafe Two')
+        self.assertIsNone(elements[('way', 2)])
+        self.assertEqual(elements[('way', 3)]['refs'], [10, 11, 12, 10])
+        self.assertEqual(node_locations[11], (-0.1288, 51.5080))
+
+    @patch('cities.services.enrichment.osm_cache._parse_pbf')
+    def test_apply_changes_updates_cache_in_place(self, mock_parse):
+        """Test that the cached table reflects the diff without re-parsing the PBF."""
+        mock_parse.return_value = make_osm_features()
+        osm_cache.load_osm_features(self.pbf_file, self.cache_dir)
+
+        changed = osm_changes.apply_osm_changes(self.pbf_file, [self.change_file], self.cache_dir)
+        osm_pois, osm_projected = osm_cache.load_osm_features(self.pbf_file, self.cache_dir)
+
+        self.assertEqual(mock_parse.call_count, 1)
+        self.assertEqual(sorted(feature_osm_ids(osm_pois)), ['node/1', 'way/3'])
+        self.assertEqual(osm_pois.set_index('id').loc[1, 'name'], 'Cafe Two')
+        self.assertEqual(osm_pois.set_index('id').loc[3, 'geometry'].geom_type, 'Polygon')
+        self.assertEqual(len(osm_pois), len(osm_projected))
+        # Old and new versions of node/1, the deleted way/2 and the created way/3
+        self.assertEqual(len(changed), 4)
+
+        # Applying the same file again is a no-op
+        changed_again = osm_changes.apply_osm_changes(self.pbf_file, [self.change_file], self.cache_dir)
+        self.assertEqual(len(changed_again), 0)
+
+    def test_pois_near_changes(self):
+        """Test that only POIs within the radius of a changed feature are re-matched."""
+        changed = make_osm_features()
+        targets = pd.DataFrame({
+            'poi_id': [100, 101],
+            'latitude': [51.50721, 51.5200],
+            'longitude': [-0.12761, -0.1500],
+        })
+
+        self.assertEqual(osm_changes.pois_near_changes(targets, changed, radius_meters=20), [100])
+
@@ -0,0 +1,79 @@
+"""
+Test cases for filling POI details from matched OSM features.
+"""
+from django.test import SimpleTestCase, TestCase
+from unittest.mock import patch
+import geopandas as gpd
+from shapely.geometry import Point
+from ..enrich_tasks import fill_details_from_osm
+from ..models import City, PointOfInterest, OsmMatchCandidate
+from ..services.enrichment.osm_details import details_from_tags
+
+
+class DetailsFromTagsTestCase(SimpleTestCase):
+    def test_maps_tags_to_fields(self):
+        """Test that OSM tags are mapped and normalised to POI fields."""
+        details = details_from_tags({
+            'opening_hours': 'Mo-Sa 11:00-23:00',
+            'contact:phone': '+44 20 7930 4600; +44 20 7930 4601',
+            'website': 'redlion.example.com',
+            'addr:housenumber': '48',
+            'addr:street': 'Parliament Street',
+            'addr:postcode': 'SW1A 2NH',
+            'addr:city': 'London',
+        })
+        self.assertEqual(details, {
+            'hours': 'Mo-Sa 11:00-23:00',
+            'phone': '+44 20 7930 4600',
+            'website': 'https://redlion.example.com',
+            'address': '48 Parliament Street, SW1A 2NH London',
+        })
+
+    def test_skips_missing_and_oversized_values(self):
+        """Test that incomplete addresses and values too long for the field are left out."""
+        details = details_from_tags({'addr:housenumber': '48', 'phone': '1' * 60})
+        self.assertEqual(details, {})
+
+
+class FillDetailsFromOsmTestCase(TestCase):
+    def setUp(self):
+        self.city = City.objects.create(name="London")
+        self.poi = PointOfInterest.objects.create(
+            city=self.city, name="Red Lion", category="drink", description="",
+            latitude=51.50720, longitude=-0.12760, osm_id="way/11", phone="+44 1"
+        )
+
+    def test_fills_empty_fields_from_candidate_tags(self):
+        """Test that only empty fields are filled, from the stored winning candidate."""
+        OsmMatchCandidate.objects.create(
+            poi=self.poi, osm_id="way/11", osm_type="way", rank=0, distance=3.0, name_score=100,
+            source="pbf", tags={'opening_hours': '24/7', 'phone': '+44 2', 'addr:full': '48 Parliament St'}
+        )
+        OsmMatchCandidate.objects.create(
+            poi=self.poi, osm_id="node/10", osm_type="node", rank=1, distance=1.0, name_score=0,
+            source="pbf", tags={'website': 'https://other.example.com'}
+        )
+
+        result = fill_details_from_osm(self.city.id)
+
+        self.assertEqual(result['updated_count'], 1)
+        self.assertEqual(result['filled'], {'hours': 1, 'phone': 0, 'website': 0, 'address': 1})
+        self.poi.refresh_from_db()
+        self.assertEqual(self.poi.hours, '24/7')
+        self.assertEqual(self.poi.phone, '+44 1')
+        self.assertEqual(self.poi.address, '48 Parliament St')
+        self.assertIsNone(self.poi.website)
+
+    @patch('cities.services.enrichment.osm_details.load_osm_features')
+    def test_falls_back_to_cached_features(self, mock_load):
+        """Test that POIs without stored candidates are looked up in the feature cache."""
+        osm_pois = gpd.GeoDataFrame(
+            {'id': [11], 'osm_type': ['way'], 'name': ['The Red Lion'], 'website': ['https://redlion.example.com']},
+            geometry=[Point(-0.12770, 51.50725)], crs="EPSG:4326"
+        )
+        mock_load.return_value = (osm_pois, osm_pois.to_crs("EPSG:3857"))
+
+        fill_details_from_osm(self.city.id, pbf_file="extract.osm.pbf")
+
+        self.poi.refresh_from_db()
+        self.assertEqual(self.poi.website, 'https://redlion.example.com')
@@ -0,0 +1,65 @@
+"""
+Test cases for the shared OSM index server and its client.
+"""
+import threading
+from django.test import SimpleTestCase, override_settings
+from unittest.mock import patch
+import pandas as pd
+import requests
+from ..enrich_tasks import match_osm_ids
+from ..services.enrichment.osm_index import OsmIndexServer, match_pois_remote
+from ..services.enrichment.osm_matching import match_pois_to_osm, winning_matches
+from .test_osm_matching import make_osm_frames
+
+
+class OsmIndexServerTestCase(SimpleTestCase):
+    def setUp(self):
+        """Start a server on a free localhost port with the test features preloaded."""
+        with patch('cities.services.enrichment.osm_index.load_osm_features', return_value=make_osm_frames()):
+            self.server = OsmIndexServer(('127.0.0.1', 0), ['extract.osm.pbf'])
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.targets = pd.DataFrame([
+            (1, "Red Lion", 51.50720, -0.12760),
+            (2, None, 51.50722, -0.12765),
+            (3, "Corner Shop", 51.60000, -0.20000),
+        ], columns=['poi_id', 'name', 'latitude', 'longitude'])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_remote_matches_in_process(self):
+        """Test that the server returns the same matches as matching in-process."""
+        candidates = match_pois_remote(self.url, 'extract.osm.pbf', self.targets)
+        remote = winning_matches(candidates)
+        local = match_pois_to_osm(self.targets, *make_osm_frames())
+
+        self.assertEqual(list(remote.columns), list(local.columns))
+        self.assertEqual(dict(zip(remote['poi_id'], remote['osm_id'])), dict(zip(local['poi_id'], local['osm_id'])))
+        self.assertEqual(candidates[candidates['poi_id'] == 1]['tags'].iloc[0], {'name': 'The Red Lion'})
+
+    def test_unknown_pbf_is_rejected(self):
+        """Test that a request for a missing extract fails with a client error."""
+        with self.assertRaises(requests.HTTPError):
+            match_pois_remote(self.url, '/does/not/exist.osm.pbf', self.targets)
+
+    def test_backend_selected_by_setting(self):
+        """Test that match_osm_ids uses the server when OSM_INDEX_URL is set."""
+        with override_settings(OSM_INDEX_URL=self.url), \
+                patch('cities.enrich_tasks.load_osm_data_from_pbf') as mock_load:
+            matches = match_osm_ids(self.targets, 'extract.osm.pbf')
+
+        mock_load.assert_not_called()
+        self.assertEqual(set(winning_matches(matches)['poi_id']), {1, 2})
+
+    @override_settings(OSM_INDEX_URL='http://127.0.0.1:9')
+    @patch('cities.enrich_tasks.load_osm_data_from_pbf')
+    def test_falls_back_when_server_is_down(self, mock_load):
+        """Test that matching falls back to loading features in-process."""
+        mock_load.return_value = make_osm_frames()
+        matches = match_osm_ids(self.targets, 'extract.osm.pbf')
+
+        mock_load.assert_called_once()
+        self.assertEqual(set(winning_matches(matches)['poi_id']), {1, 2})
@@ -0,0 +1,121 @@
+"""
+Test cases for matching POIs to OSM features.
+"""
+from django.test import SimpleTestCase, TestCase
+from unittest.mock import patch
+import pandas as pd
+import geopandas as gpd
+from shapely.geometry import Point
+from ..enrich_tasks import find_closest_osm_poi_optimized, find_osm_ids_local
+from ..services.enrichment.osm_matching import match_pois_to_osm
+from ..models import City, PointOfInterest
+
+
+def make_osm_frames():
+    """Build (EPSG:4326, EPSG:3857) frames around a point in central London."""
+    osm_pois = gpd.GeoDataFrame(
+        {
+            'id': [10, 11, 12, 13],
+            'osm_type': ['node', 'way', 'relation', 'node'],
+            'name': ['Corner Shop', 'The Red Lion', 'Big Relation', 'Far Away Cafe'],
+        },
+        geometry=[
+            Point(-0.12760, 51.50720),   # on top of the target
+            Point(-0.12770, 51.50725),   # ~9m away
+            Point(-0.12761, 51.50721),   # relation, always ignored
+            Point(-0.13000, 51.51000),   # far outside the radius
+        ],
+        crs="EPSG:4326"
+    )
+    return osm_pois, osm_pois.to_crs("EPSG:3857")
+
+
+def project(lat, lon):
+    return gpd.GeoSeries([Point(lon, lat)], crs="EPSG:4326").to_crs("EPSG:3857").iloc[0]
+
+
+class FindClosestOsmPoiTestCase(SimpleTestCase):
+    def setUp(self):
+        self.osm_pois, self.osm_projected = make_osm_frames()
+        self.target = project(51.50720, -0.12760)
+
+    def test_prefers_name_match_within_radius(self):
+        """Test that a better name match wins over the closest feature."""
+        osm_id, distance, tags = find_closest_osm_poi_optimized(
+            self.target, self.osm_pois, self.osm_projected, poi_name="Red Lion"
+        )
+        self.assertEqual(osm_id, "way/11")
+        self.assertLess(distance, 20)
+        self.assertEqual(tags['name'], 'The Red Lion')
+
+    def test_falls_back_to_closest(self):
+        """Test that the closest node or way is used when no name matches."""
+        osm_id, distance, _ = find_closest_osm_poi_optimized(
+            self.target, self.osm_pois, self.osm_projected, poi_name="Unrelated"
+        )
+        self.assertEqual(osm_id, "node/10")
+        self.assertAlmostEqual(distance, 0, places=3)
+
+    def test_no_match_outside_radius(self):
+        """Test that nothing is returned when no feature is within the radius."""
+        result = find_closest_osm_poi_optimized(
+            project(51.60, -0.20), self.osm_pois, self.osm_projected, poi_name="Corner Shop"
+        )
+        self.assertEqual(result, (None, None, None))
+
+
+class MatchPoisToOsmTestCase(SimpleTestCase):
+    def setUp(self):
+        self.osm_pois, self.osm_projected = make_osm_frames()
+        self.targets = pd.DataFrame([
+            (1, "Red Lion", 51.50720, -0.12760),
+            (2, "Unrelated", 51.50720, -0.12760),
+            (3, None, 51.50722, -0.12765),
+            (4, "Corner Shop", 51.60000, -0.20000),
+        ], columns=['poi_id', 'name', 'latitude', 'longitude'])
+
+    def test_batch_matches_per_poi_logic(self):
+        """Test that the batch matcher picks the same winners as the per-POI matcher."""
+        matches = match_pois_to_osm(self.targets, self.osm_pois, self.osm_projected)
+        self.assertEqual(list(matches.columns), ['poi_id', 'osm_id', 'distance', 'score'])
+
+        batch = dict(zip(matches['poi_id'], matches['osm_id']))
+        for row in self.targets.itertuples():
+            poi_name = row.name if isinstance(row.name, str) else None
+            osm_id, _, _ = find_closest_osm_poi_optimized(
+                project(row.latitude, row.longitude), self.osm_pois, self.osm_projected, poi_name=poi_name
+            )
+            self.assertEqual(batch.get(row.poi_id), osm_id)
+
+    def test_match_scores(self):
+        """Test that name scores and distances are reported for winners."""
+        matches = match_pois_to_osm(self.targets, self.osm_pois, self.osm_projected).set_index('poi_id')
+        self.assertGreaterEqual(matches.loc[1, 'score'], 60)
+        self.assertLess(matches.loc[2, 'distance'], 1)
+        self.assertNotIn(4, matches.index)
+
+
+class FindOsmIdsLocalTestCase(TestCase):
+    @patch('cities.enrich_tasks.load_osm_data_from_pbf')
+    def test_updates_matched_pois(self, mock_load):
+        """Test that matched POIs get their OSM IDs saved in bulk."""
+        mock_load.return_value = make_osm_frames()
+        city = City.objects.create(name="London")
+        matched = PointOfInterest.objects.create(
+            city=city, name="Red Lion", category="drink", description="",
+            latitude=51.50720, longitude=-0.12760
+        )
+        unmatched = PointOfInterest.objects.create(
+            city=city, name="Elsewhere", category="see", description="",
+            latitude=51.60000, longitude=-0.20000
+        )
+
+        with patch('cities.enrich_tasks.os.path.isfile', return_value=True):
+            result = find_osm_ids_local(city.id, [matched, unmatched], "extract.osm.pbf")
+
+        self.assertEqual(result['processed_count'], 2)
+        self.assertEqual(result['updated_count'], 1)
+        matched.refresh_from_db()
+        unmatched.refresh_from_db()
+        self.assertEqual(matched.osm_id, "way/11")
+        self.assertIsNone(unmatched.osm_id)
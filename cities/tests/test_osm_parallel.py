@@ -0,0 +1,52 @@
+"""
+Test cases for matching POIs to OSM features on a process pool.
+"""
+from django.test import SimpleTestCase
+from unittest.mock import patch
+import pandas as pd
+from ..services.enrichment import osm_cache
+from ..services.enrichment.osm_parallel import match_pois_parallel
+from ..services.enrichment.osm_matching import match_pois_to_osm, winning_matches
+from .osm_fixtures import FakePbfMixin
+from .test_osm_matching import make_osm_frames
+
+
+class MatchPoisParallelTestCase(FakePbfMixin, SimpleTestCase):
+    def setUp(self):
+        """Put the fake PBF's features in the on-disk cache."""
+        super().setUp()
+        with patch('cities.services.enrichment.osm_cache._parse_pbf', return_value=make_osm_frames()[0]):
+            osm_cache.load_osm_features(self.pbf_file, self.cache_dir)
+
+        self.targets = pd.DataFrame(
+            [(i, "Red Lion" if i % 2 else None, 51.50720, -0.12760) for i in range(1, 9)]
+            + [(9, "Corner Shop", 51.60000, -0.20000)],
+            columns=['poi_id', 'name', 'latitude', 'longitude']
+        )
+
+    def test_process_pool_matches_in_process(self):
+        """Test that chunks matched in worker processes give the in-process result."""
+        candidates, stats = match_pois_parallel(
+            self.targets, self.pbf_file, max_workers=2, chunk_size=3, cache_dir=self.cache_dir
+        )
+        matches = winning_matches(candidates)
+        expected = match_pois_to_osm(self.targets, *make_osm_frames())
+
+        self.assertEqual(stats['workers'], 2)
+        self.assertEqual(stats['chunks'], 3)
+        self.assertGreater(stats['speedup'], 0)
+        self.assertEqual(
+            dict(zip(matches['poi_id'], matches['osm_id'])),
+            dict(zip(expected['poi_id'], expected['osm_id']))
+        )
+
+    def test_single_worker_runs_in_process(self):
+        """Test that one worker skips the process pool."""
+        with patch('cities.services.enrichment.osm_parallel.ProcessPoolExecutor') as mock_pool:
+            candidates, stats = match_pois_parallel(
+                self.targets, self.pbf_file, max_workers=1, top_k=1, cache_dir=self.cache_dir
+            )
+
+        mock_pool.assert_not_called()
+        self.assertEqual(stats['workers'], 1)
+        self.assertEqual(len(candidates), 8)
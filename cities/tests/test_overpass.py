@@ -0,0 +1,111 @@
+"""
+Test cases for tiled Overpass matching, run against a local stand-in Overpass server.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from django.test import TestCase, SimpleTestCase, override_settings
+from unittest.mock import patch
+import pandas as pd
+from ..enrich_tasks import fetch_osm_ids
+from ..models import City, PointOfInterest
+from ..services.enrichment.overpass import tile_targets, elements_to_features
+
+# Recorded response for a tile around Trafalgar Square
+RECORDED_ELEMENTS = [
+    {'type': 'node', 'id': 10, 'lat': 51.50720, 'lon': -0.12760, 'tags': {'name': 'Corner Shop'}},
+    {'type': 'way', 'id': 11, 'tags': {'name': 'The Red Lion', 'amenity': 'pub'},
+     'geometry': [{'lat': 51.50724, 'lon': -0.12772}, {'lat': 51.50724, 'lon': -0.12768},
+                  {'lat': 51.50728, 'lon': -0.12768}, {'lat': 51.50724, 'lon': -0.12772}]},
+    {'type': 'node', 'id': 13, 'lat': 51.51000, 'lon': -0.13000, 'tags': {'brand': 'Far Away Cafe'}},
+]
+
+
+class StubOverpassHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        query = parse_qs(self.rfile.read(length).decode())['data'][0]
+        self.server.queries.append(query)
+        elements = RECORDED_ELEMENTS if '51.4' in query or '51.5' in query else []
+        body = json.dumps({'elements': elements}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TileTargetsTestCase(SimpleTestCase):
+    def test_groups_pois_into_padded_tiles(self):
+        """Test that POIs are grouped by tile and each tile is padded by the radius."""
+        targets = pd.DataFrame([
+            (1, 'A', 51.501, -0.121),
+            (2, 'B', 51.502, -0.122),
+            (3, 'C', 51.601, -0.221),
+        ], columns=['poi_id', 'name', 'latitude', 'longitude'])
+
+        tiles = tile_targets(targets, tile_size=0.05)
+
+        self.assertEqual(len(tiles), 2)
+        self.assertEqual(sorted(len(pois) for _, pois in tiles), [1, 2])
+        for bounding_box, pois in tiles:
+            min_lon, min_lat, max_lon, max_lat = bounding_box
+            self.assertTrue(((pois['latitude'] > min_lat) & (pois['latitude'] < max_lat)).all())
+            self.assertTrue(((pois['longitude'] > min_lon) & (pois['longitude'] < max_lon)).all())
+            self.assertGreater(max_lat - min_lat, 0.05)
+
+    def test_ways_become_polygons(self):
+        """Test that closed ways keep their outline and nodes become points."""
+        osm_pois, osm_projected = elements_to_features(RECORDED_ELEMENTS)
+        self.assertEqual(list(osm_pois['osm_type']), ['node', 'way', 'node'])
+        self.assertEqual(osm_pois.geometry.iloc[1].geom_type, 'Polygon')
+        self.assertEqual(osm_pois.iloc[2]['brand'], 'Far Away Cafe')
+        self.assertEqual(osm_projected.crs.to_epsg(), 3857)
+
+
+class FetchOsmIdsTiledTestCase(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubOverpassHandler)
+        self.server.queries = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/interpreter"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @patch('cities.services.enrichment.overpass.time.sleep')
+    def test_one_query_per_tile(self, mock_sleep):
+        """Test that POIs are matched with one bbox query per tile using the local rules."""
+        city = City.objects.create(name="London")
+        red_lion = PointOfInterest.objects.create(
+            city=city, name="Red Lion", category="drink", description="",
+            latitude=51.50720, longitude=-0.12760
+        )
+        shop = PointOfInterest.objects.create(
+            city=city, name="Corner Shop", category="buy", description="",
+            latitude=51.50721, longitude=-0.12761
+        )
+        elsewhere = PointOfInterest.objects.create(
+            city=city, name="Elsewhere", category="see", description="",
+            latitude=-33.8688, longitude=151.2093
+        )
+
+        with override_settings(OVERPASS_URL=self.url):
+            result = fetch_osm_ids(city.id, tiled=True)
+
+        self.assertEqual(result['tiles'], 2)
+        self.assertEqual(len(self.server.queries), 2)
+        self.assertIn('out tags geom', self.server.queries[0])
+        self.assertEqual(result['processed_count'], 3)
+        self.assertEqual(result['updated_count'], 2)
+        red_lion.refresh_from_db()
+        shop.refresh_from_db()
+        elsewhere.refresh_from_db()
+        self.assertEqual(red_lion.osm_id, "way/11")
+        self.assertEqual(shop.osm_id, "node/10")
+        self.assertIsNone(elsewhere.osm_id)
@@ -0,0 +1,80 @@
+"""
+Test cases for the in-process POI merge service.
+"""
+import json
+from django.test import TestCase
+from django.urls import reverse
+from reversion.models import Revision
+from ..models import City, District, PointOfInterest
+from ..services.poi_merge import merge_pois
+
+
+class MergePoisTestCase(TestCase):
+    def setUp(self):
+        self.city = City.objects.create(name="London")
+        self.pois = [
+            PointOfInterest.objects.create(city=self.city, name=name, category="see", description="", rank=rank)
+            for name, rank in [("British Museum", 3), ("The British Museum", 1), ("Tate Modern", 2), ("Tate", 4)]
+        ]
+
+    def test_batch_merge_uses_one_revision(self):
+        """Test that several merges are applied in one transaction and one revision."""
+        museum, museum_copy, tate, tate_copy = self.pois
+
+        results = merge_pois(self.city, [
+            (museum.id, museum_copy.id, {'rank': 1, 'district': 'Bloomsbury'}),
+            (tate.id, tate_copy.id, {'coordinates': '51.5076,-0.0994'}),
+        ])
+
+        self.assertEqual([result['status'] for result in results], ['merged', 'merged'])
+        self.assertEqual(Revision.objects.count(), 1)
+        self.assertEqual(PointOfInterest.objects.filter(city=self.city).count(), 2)
+
+        museum.refresh_from_db()
+        tate.refresh_from_db()
+        self.assertEqual(museum.rank, 1)
+        self.assertEqual(museum.district, District.objects.get(name='Bloomsbury', city=self.city))
+        self.assertEqual((tate.latitude, tate.longitude), (51.5076, -0.0994))
+
+        comment = json.loads(Revision.objects.get().comment)
+        self.assertEqual(comment['changes_by_poi'][str(museum.id)]['rank'], {'old': 3, 'new': 1})
+
+    def test_already_merged_pois_are_skipped(self):
+        """Test that a merge referring to a POI removed earlier in the batch is skipped."""
+        museum, museum_copy, tate, _ = self.pois
+
+        results = merge_pois(self.city, [(museum.id, museum_copy.id, {}), (tate.id, museum_copy.id, {})])
+
+        self.assertEqual([result['status'] for result in results], ['merged', 'skipped'])
+        self.assertTrue(PointOfInterest.objects.filter(id=tate.id).exists())
+
+    def test_view_merges_in_process(self):
+        """Test that the merge endpoint goes through the service."""
+        museum, museum_copy, _, _ = self.pois
+
+        response = self.client.post(
+            reverse('poi_merge', args=[self.city.name]),
+            data=json.dumps({'keep_id': museum.id, 'remove_id': museum_copy.id, 'field_selections': {'name': 'The British Museum'}}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        museum.refresh_from_db()
+        self.assertEqual(museum.name, 'The British Museum')
+        self.assertFalse(PointOfInterest.objects.filter(id=museum_copy.id).exists())
+        comment = json.loads(Revision.objects.get().comment)
+        self.assertEqual(comment['message'], f"Merged with POI {museum_copy.id}")
+
+    def test_view_reports_skipped_merge(self):
+        """Test that the merge endpoint returns 409 when the merge is skipped."""
+        museum = self.pois[0]
+
+        response = self.client.post(
+            reverse('poi_merge', args=[self.city.name]),
+            data=json.dumps({'keep_id': museum.id, 'remove_id': museum.id}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['status'], 'error')
+        self.assertTrue(PointOfInterest.objects.filter(id=museum.id).exists())
@@ -0,0 +1,100 @@
+"""
+Test cases for the duplicate similarity engine, against the original difflib check.
+"""
+import math
+import random
+from difflib import SequenceMatcher
+from django.conf import settings
+from django.test import SimpleTestCase
+from ..enrich_tasks import detect_duplicate_pois
+from ..services.dedup.similarity import similar, normalise_text
+
+
+def legacy_similar(a, b, threshold=0.85):
+    """The SequenceMatcher check detect_duplicate_pois used to run."""
+    if not a or not b:
+        return False
+    return SequenceMatcher(None, a.lower(), b.lower()).ratio() > threshold
+
+
+def legacy_distance(poi1, poi2):
+    """Great-circle distance in metres, computed per call with the math module."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (poi1['latitude'], poi1['longitude'], poi2['latitude'], poi2['longitude']))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371008.8 * math.asin(math.sqrt(a))
+
+
+def legacy_detect_duplicate_pois(poi1, poi2):
+    """
+    The original duplicate decision, with the per-call difflib comparisons.
+
+    Coordinates are compared against the same metre threshold as detect_duplicate_pois
+    rather than the original 0.001 degree box, so only the similarity engine differs.
+    """
+    name_similarity = legacy_similar(poi1['name'], poi2['name'])
+    close_coordinates = False
+    if poi1['latitude'] and poi1['longitude'] and poi2['latitude'] and poi2['longitude']:
+        close_coordinates = legacy_distance(poi1, poi2) <= settings.DUPLICATE_DISTANCE_METERS
+    address_similarity = legacy_similar(poi1['address'], poi2['address'])
+    return name_similarity and (close_coordinates or address_similarity)
+
+
+NAMES = ['The Red Lion', 'Red Lion', 'red lion pub', 'Café Nero', 'Cafe Nero', 'CAFÉ NERO!', "King's Arms",
+         'Kings Arms', 'British Museum', 'The British Museum', 'St. Paul\'s Cathedral', 'St Pauls Cathedral',
+         'Müller Bäckerei', 'Muller Backerei', 'Tower Bridge', 'Tower Bridge Exhibition', '', None]
+
+
+def mutate(rng, text):
+    """Return text with a few random edits, to produce pairs around the threshold."""
+    if not text:
+        return text
+    chars = list(text)
+    for _ in range(rng.randint(0, 3)):
+        position = rng.randrange(len(chars))
+        edit = rng.choice(['delete', 'insert', 'swap-case'])
+        if edit == 'delete' and len(chars) > 1:
+            del chars[position]
+        elif edit == 'insert':
+            chars.insert(position, rng.choice('aeiou s.'))
+        else:
+            chars[position] = chars[position].swapcase()
+    return ''.join(chars)
+
+
+class SimilarityParityTestCase(SimpleTestCase):
+    def test_similar_matches_difflib(self):
+        """Test that similar() gives the same decision as SequenceMatcher on random pairs."""
+        rng = random.Random(13)
+        for _ in range(3000):
+            a = mutate(rng, rng.choice(NAMES))
+            b = mutate(rng, rng.choice(NAMES))
+            self.assertEqual(similar(a, b), legacy_similar(a, b), (a, b))
+
+    def test_detect_duplicate_pois_parity(self):
+        """Test that detect_duplicate_pois flags the same pairs as the original implementation."""
+        rng = random.Random(21)
+        streets = ['48 Parliament Street', '48 Parliament St', 'Great Russell St', 'Great Russell Street', None]
+        pois = [
+            {
+                'id': poi_id,
+                'name': mutate(rng, rng.choice(NAMES)),
+                'category': 'see',
+                'latitude': 51.5 + rng.uniform(0, 0.002) if rng.random() > 0.2 else None,
+                'longitude': -0.12 + rng.uniform(0, 0.002) if rng.random() > 0.2 else None,
+                'address': mutate(rng, rng.choice(streets)),
+            }
+            for poi_id in range(120)
+        ]
+        flagged = 0
+        for i in range(len(pois)):
+            for j in range(i + 1, len(pois)):
+                expected = legacy_detect_duplicate_pois(pois[i], pois[j])
+                self.assertEqual(detect_duplicate_pois(pois[i], pois[j])[0], expected)
+                flagged += expected
+        self.assertGreater(flagged, 0)
+
+    def test_normalise_text(self):
+        """Test that accents, punctuation and leading articles are removed."""
+        self.assertEqual(normalise_text("The  Café Nero!"), 'cafe nero')
+        self.assertEqual(normalise_text("St. Paul's"), 'st paul s')
+        self.assertTrue(similar('The British Museum', 'British Museum!', normalise=True))
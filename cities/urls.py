@@ -23,7 +23,9 @@ urlpatterns = [
     path('city/<str:city_name>/poi/<int:poi_id>/edit/', views.poi_edit, name='poi_edit'),
     path('city/<str:city_name>/poi/<int:poi_id>/', views.poi_detail, name='poi_detail'),
     path('city/<str:city_name>/poi/<int:poi_id>/delete/', views.delete_poi, name='delete_poi'),
+    path('city/<str:city_name>/poi/<int:poi_id>/osm_candidates/<int:candidate_id>/select/', views.poi_select_osm_candidate, name='poi_select_osm_candidate'),
     path('city/<str:city_name>/poi/merge/', views.poi_merge, name='poi_merge'),
+    path('city/<str:city_name>/duplicates/', views.duplicate_candidates, name='duplicate_candidates'),
     path('city/<str:city_name>/lists/', views.poi_lists, name='poi_lists'),
     path('city/<str:city_name>/lists/create/', views.create_poi_list, name='create_poi_list'),
     path('city/<str:city_name>/lists/<int:list_id>/delete/', views.delete_poi_list, name='delete_poi_list'),
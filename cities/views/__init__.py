@@ -27,7 +27,9 @@ from .pois import (
     poi_revert,
     poi_edit,
     poi_detail,
+    poi_select_osm_candidate,
     poi_merge,
+    duplicate_candidates,
     delete_poi,
 )
 
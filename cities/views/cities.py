@@ -29,9 +29,11 @@ ENRICHMENT_TASKS = [
     ('geocode_missing_coordinates', 'Lookup Missing Coordinates from Addresses'),
     ('dedup_main_city', 'Merge Duplicates in Main City'),
     ('find_all_duplicates', 'Find All Duplicates'),
+    ('find_semantic_duplicates', 'Find Duplicates by Meaning (Embeddings)'),
     ('find_duplicate_keys', 'Find Duplicate Keys'),
     ('find_osm_ids_local', 'Find OpenStreetMap IDs (Local PBF)'),
-    ('fetch_osm_ids', 'Fetch OpenStreetMap IDs (Online)'),
+    ('fetch_osm_ids', 'Fetch OpenStreetMap IDs (Online, {"tiled": true} for one query per tile)'),
+    ('fill_details_from_osm', 'Fill Hours, Phone, Website and Address from OSM'),
     # Add more tasks here as they're implemented
 ]
 
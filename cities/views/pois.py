@@ -5,12 +5,16 @@ from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
 from django.db.models import Count
 from django.forms.models import model_to_dict
+from django.core.paginator import Paginator
 from django.core.serializers.json import DjangoJSONEncoder
 import json
 import reversion
 from reversion.models import Version
 
-from ..models import City, PointOfInterest, District
+from ..models import City, PointOfInterest, District, OsmMatchCandidate
+from ..services.dedup.candidates import candidate_to_dict, last_scan, stored_candidates
+from ..services.enrichment.osm_candidates import select_osm_candidate
+from ..services.poi_merge import merge_pois
 from ..fetch_tasks import import_city_data
 from celery.result import AsyncResult
 
@@ -32,7 +36,7 @@ def poi_history(request, city_name, poi_id):
         try:
             # Try to parse the comment as JSON to get the changes
             comment_data = json.loads(version.revision.comment or '{}')
-            changes = comment_data.get('changes', {})
+            changes = comment_data.get('changes_by_poi', {}).get(str(poi.id)) or comment_data.get('changes', {})
 
             # If no changes found in comment, fall back to comparing with previous version
             if not changes:
@@ -168,10 +172,35 @@ def poi_detail(request, city_name, poi_id):
         'website': poi.website,
         'hours': poi.hours,
         'rank': poi.rank,
-        'district': poi.district.name if poi.district else None
+        'district': poi.district.name if poi.district else None,
+        'osm_id': poi.osm_id,
+        'osm_candidates': [candidate.to_dict() for candidate in poi.osm_candidates.all()]
     }
 
-    return JsonResponse(data)
+    return JsonResponse(data, encoder=DjangoJSONEncoder)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def poi_select_osm_candidate(request, city_name, poi_id, candidate_id):
+    """Use one of the POI's stored OSM match candidates as its OSM ID."""
+    city = get_object_or_404(City, name=city_name)
+    poi = get_object_or_404(PointOfInterest, id=poi_id, city=city)
+    candidate = get_object_or_404(OsmMatchCandidate, id=candidate_id, poi=poi)
+
+    try:
+        poi = select_osm_candidate(candidate)
+        return JsonResponse({
+            'status': 'success',
+            'message': f'OSM ID set to {poi.osm_id}',
+            'osm_id': poi.osm_id
+        })
+    except Exception as e:
+        logger.error(f"Error selecting OSM candidate {candidate_id} for POI {poi_id}: {str(e)}")
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=500)
 
 
 @csrf_exempt
@@ -187,66 +216,15 @@ def poi_merge(request, city_name):
 
         # Get the POIs
         city = get_object_or_404(City, name=city_name)
-        keep_poi = get_object_or_404(PointOfInterest, id=keep_id, city=city)
-        remove_poi = get_object_or_404(
-            PointOfInterest, id=remove_id, city=city)
+        get_object_or_404(PointOfInterest, id=keep_id, city=city)
+        get_object_or_404(PointOfInterest, id=remove_id, city=city)
 
-        # Store old values for change tracking
-        old_values = {
-            'name': keep_poi.name,
-            'category': keep_poi.category,
-            'sub_category': keep_poi.sub_category,
-            'description': keep_poi.description,
-            'latitude': keep_poi.latitude,
-            'longitude': keep_poi.longitude,
-            'address': keep_poi.address,
-            'phone': keep_poi.phone,
-            'website': keep_poi.website,
-            'hours': keep_poi.hours,
-            'rank': keep_poi.rank,
-            'district': keep_poi.district.name if keep_poi.district else None
-        }
-
-        # Create a new revision for the merge
-        with reversion.create_revision():
-            # Update fields based on selections
-            for field, value in field_selections.items():
-                if field == 'coordinates':
-                    if value:
-                        lat, lon = value.split(',')
-                        keep_poi.latitude = float(lat.strip())
-                        keep_poi.longitude = float(lon.strip())
-                elif field == 'district':
-                    if value == 'Main City':
-                        keep_poi.district = None
-                    else:
-                        # Try to find the district by name
-                        try:
-                            district = District.objects.get(
-                                name=value, city=city)
-                            keep_poi.district = district
-                        except District.DoesNotExist:
-                            # If district doesn't exist, create it
-                            district = District.objects.create(
-                                name=value, city=city)
-                            keep_poi.district = district
-                else:
-                    setattr(keep_poi, field, value)
-
-            keep_poi.save()
-
-            # Store meta-data including the changes
-            changes = {field: {'old': old_values[field], 'new': value}
-                       for field, value in field_selections.items()
-                       if old_values.get(field) != value}
-
-            reversion.set_comment(json.dumps({
-                'message': f"Merged with POI {remove_id}",
-                'changes': changes
-            }))
-
-            # Delete the removed POI
-            remove_poi.delete()
+        result = merge_pois(city, [(keep_id, remove_id, field_selections)])[0]
+        if result['status'] != 'merged':
+            return JsonResponse({
+                'status': 'error',
+                'message': result['message']
+            }, status=409)
 
         return JsonResponse({
             'status': 'success',
@@ -259,6 +237,32 @@ def poi_merge(request, city_name):
             'message': str(e)
         }, status=500)
 
+@require_http_methods(["GET"])
+def duplicate_candidates(request, city_name):
+    """Return one page of the city's stored duplicate candidates, highest score first, optionally of one source."""
+    city = get_object_or_404(City, name=city_name)
+    try:
+        page_size = min(max(int(request.GET.get('page_size', 50)), 1), 500)
+        source = request.GET.get('source')
+        paginator = Paginator(stored_candidates(city, source=source), page_size)
+        page = paginator.get_page(request.GET.get('page'))
+        # Every scan refreshes fuzzy candidates, only semantic scans refresh semantic ones
+        scan = last_scan(city, source='semantic' if source == 'semantic' else None)
+
+        return JsonResponse({
+            'duplicates': [candidate_to_dict(candidate) for candidate in page],
+            'page': page.number,
+            'page_count': paginator.num_pages,
+            'total': paginator.count,
+            'scanned_at': scan.finished_at if scan else None,
+        }, encoder=DjangoJSONEncoder)
+
+    except ValueError as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=400)
+
 @csrf_exempt
 @require_http_methods(["DELETE"])
 def delete_poi(request, city_name, poi_id):
@@ -151,6 +151,40 @@ CELERY_RESULT_SERIALIZER = 'json'
 OPENAI_API_KEY = os.environ.get('OPENAI_AI_KEY')
 OPENAI_MODEL = 'gpt-4-turbo-preview'  # Default model to use
 
+# OSM Configuration
+# Parsed PBF extracts are cached here as GeoParquet and shared across tasks and flow runs
+OSM_CACHE_DIR = os.environ.get('OSM_CACHE_DIR', BASE_DIR / 'osm_cache')
+# URL of a running `manage.py osm_index_server`, e.g. http://127.0.0.1:8765. When set,
+# OSM matching goes through it instead of loading the features in every worker.
+OSM_INDEX_URL = os.environ.get('OSM_INDEX_URL')
+# Worker processes used to match POIs to OSM features in the import flow (0 means one per core)
+OSM_MATCH_WORKERS = int(os.environ.get('OSM_MATCH_WORKERS', 0))
+OVERPASS_URL = os.environ.get('OVERPASS_URL', 'https://overpass-api.de/api/interpreter')
+
+# Geocoding
+MAPBOX_GEOCODING_URL = os.environ.get('MAPBOX_GEOCODING_URL', 'https://api.mapbox.com/geocoding/v5/mapbox.places')
+# Requests in flight at once, and the most started per second (Mapbox allows 600 per minute by default)
+GEOCODING_CONCURRENCY = int(os.environ.get('GEOCODING_CONCURRENCY', 8))
+GEOCODING_RATE_LIMIT = float(os.environ.get('GEOCODING_RATE_LIMIT', 10))
+# 'mapbox' sends one request per lookup, 'mapbox_batch' packs lookups into Geocoding v6 batch requests
+GEOCODING_BACKEND = os.environ.get('GEOCODING_BACKEND', 'mapbox')
+MAPBOX_BATCH_GEOCODING_URL = os.environ.get('MAPBOX_BATCH_GEOCODING_URL', 'https://api.mapbox.com/search/geocode/v6/batch')
+# Queries per batch request (Mapbox accepts up to 1000)
+GEOCODING_BATCH_QUERIES = int(os.environ.get('GEOCODING_BATCH_QUERIES', 1000))
+# PBF extract to reverse geocode from before asking Mapbox (the import flow passes its own),
+# and the furthest an OSM address point may be from a POI to be used for it
+OFFLINE_GEOCODING_PBF = os.environ.get('OFFLINE_GEOCODING_PBF')
+OFFLINE_GEOCODING_RADIUS_METERS = float(os.environ.get('OFFLINE_GEOCODING_RADIUS_METERS', 25))
+# Days a cached geocoding response is reused before it is fetched again
+GEOCODING_CACHE_TTL_DAYS = int(os.environ.get('GEOCODING_CACHE_TTL_DAYS', 180))
+
+# Duplicate detection
+# POIs with similar names at most this many metres apart are flagged as possible duplicates
+DUPLICATE_DISTANCE_METERS = float(os.environ.get('DUPLICATE_DISTANCE_METERS', 100))
+# Local sentence-embedding model and minimum cosine similarity for semantic duplicate detection
+DEDUP_EMBEDDING_MODEL = os.environ.get('DEDUP_EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+DEDUP_SEMANTIC_THRESHOLD = float(os.environ.get('DEDUP_SEMANTIC_THRESHOLD', 0.8))
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
@@ -9,8 +9,8 @@ django.setup()
 
 # Now import Django-related modules
 from django.db import models
+from django.conf import settings
 from prefect import flow, task, pause_flow_run, get_run_logger
-from prefect.futures import wait
 from prefect.task_runners import ThreadPoolTaskRunner
 from asgiref.sync import sync_to_async
 from cities.services.city_import import (
@@ -27,8 +27,12 @@ from cities.enrich_tasks import (
     find_all_duplicates,
     auto_merge_duplicates,
     find_osm_ids_local,
+    fill_details_from_osm,
     load_osm_data_from_pbf
 )
+from cities.services.dedup.ingest import import_poi_index
+from cities.services.enrichment.osm_cache import bounding_box_from_points
+from cities.services.enrichment.osm_parallel import default_worker_count
 from cities.models import City
 
 logger = logging.getLogger(__name__)
@@ -181,29 +185,32 @@ def import_district(
     return result
 
 def import_wikivoyage_data(name: str, max_depth: int = 2) -> Dict[str, Any]:
-    # Fetch data for the main city
-    data = fetch_wikivoyage_data(name, 0)
-
-    # Process the city data
-    result = process_city(
-        data=data,
-        city_name=name,
-        clear_existing=True  # Clear existing POIs for the root city
-    )
+    # Share one POI index between the city and its districts, so listings repeated
+    # on district pages are merged as they are imported
+    with import_poi_index(name):
+        # Fetch data for the main city
+        data = fetch_wikivoyage_data(name, 0)
+
+        # Process the city data
+        result = process_city(
+            data=data,
+            city_name=name,
+            clear_existing=True  # Clear existing POIs for the root city
+        )
 
-    # Process districts if successful
-    if result['status'] == 'success' and max_depth > 0:
-        district_pages = result.get('district_pages', [])
-        logger.info(f"Found {len(district_pages)} districts for {name}")
+        # Process districts if successful
+        if result['status'] == 'success' and max_depth > 0:
+            district_pages = result.get('district_pages', [])
+            logger.info(f"Found {len(district_pages)} districts for {name}")
 
-        # Import each district
-        for district in district_pages:
-            import_district(
-                district_name=district,
-                root_city_name=name,
-                current_depth=1,
-                max_depth=max_depth
-            )
+            # Import each district
+            for district in district_pages:
+                import_district(
+                    district_name=district,
+                    root_city_name=name,
+                    current_depth=1,
+                    max_depth=max_depth
+                )
 
     return result
 
@@ -271,13 +278,14 @@ async def _geocode_city(name: str, result: Dict[str, Any]) -> Dict[str, Any]:
     return result
 
 
-async def _geocode_missing_addresses(name: str, result: Dict[str, Any]) -> Dict[str, Any]:
+async def _geocode_missing_addresses(name: str, result: Dict[str, Any], pbf_file: str = None) -> Dict[str, Any]:
     """
     Geocode missing addresses for POIs with coordinates.
 
     Args:
         name: Name of the city
         result: Result dictionary from import and geocoding
+        pbf_file: Optional OSM PBF file to take nearby addresses from before asking Mapbox
 
     Returns:
         Updated result dictionary with address geocoding information
@@ -292,7 +300,7 @@ async def _geocode_missing_addresses(name: str, result: Dict[str, Any]) -> Dict[
 
         # Geocode missing addresses
         geocode_addresses_async = sync_to_async(geocode_missing_addresses, thread_sensitive=True)
-        addresses_result = await geocode_addresses_async(city.id)
+        addresses_result = await geocode_addresses_async(city.id, pbf_file)
 
         # Add address geocoding result to our main result
         result['address_geocoding'] = addresses_result
@@ -309,6 +317,43 @@ async def _geocode_missing_addresses(name: str, result: Dict[str, Any]) -> Dict[
     return result
 
 
+async def _fill_details_from_osm(name: str, pbf_file: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fill missing hours, phone, website and address fields from matched OSM features.
+
+    Args:
+        name: Name of the city
+        pbf_file: Path to the OSM PBF file
+        result: Result dictionary from import and geocoding
+
+    Returns:
+        Updated result dictionary with OSM details information
+    """
+    logger = get_run_logger()
+    logger.info(f"Filling POI details from OSM for {name}")
+
+    try:
+        # Get the city ID
+        get_city = sync_to_async(City.objects.get, thread_sensitive=True)
+        city = await get_city(name=name)
+
+        fill_details_async = sync_to_async(fill_details_from_osm, thread_sensitive=True)
+        details_result = await fill_details_async(city.id, pbf_file)
+
+        result['osm_details'] = details_result
+
+        logger.info(f"OSM details for {name}: {details_result.get('status', 'unknown')}, "
+                   f"Updated {details_result.get('updated_count', 0)} POIs")
+    except City.DoesNotExist:
+        logger.error(f"City {name} not found in database for OSM details")
+        result['osm_details'] = {'status': 'error', 'message': f"City {name} not found in database"}
+    except Exception as e:
+        logger.error(f"Error filling OSM details: {str(e)}")
+        result['osm_details'] = {'status': 'error', 'message': str(e)}
+
+    return result
+
+
 async def _geocode_missing_coordinates(name: str, result: Dict[str, Any]) -> Dict[str, Any]:
     """
     Geocode missing coordinates for POIs with addresses.
@@ -427,91 +472,48 @@ async def _get_pois_needing_osm_ids(name: str) -> List:
         return []
 
 
-def _chunk_pois(pois: List, chunk_size: int = 100) -> List[List]:
+@task(name="find_osm_ids_parallel", retries=2)
+async def find_osm_ids_parallel(city_id: int, pois: List, pbf_file: str,
+                                bounding_box: Optional[List[float]] = None) -> Dict[str, Any]:
     """
-    Split POIs into chunks of the specified size.
-    
-    Args:
-        pois: List of POI objects
-        chunk_size: Size of each chunk
-        
-    Returns:
-        List of POI chunks
-    """
-    chunks = []
-    for i in range(0, len(pois), chunk_size):
-        chunk = pois[i:i + chunk_size]
-        chunks.append(chunk)
-    return chunks
+    Find OSM IDs for all POIs of a city, matching on a pool of worker processes.
 
+    The matching is CPU bound, so it runs in separate processes rather than on the
+    flow's thread pool (where sync_to_async(thread_sensitive=True) serialises it).
+    The database writes are done once by this task.
 
-@task(name="find_osm_ids_chunk", retries=2)
-async def find_osm_ids_chunk(city_id: int, poi_chunk: List, pbf_file: str) -> Dict[str, Any]:
-    """
-    Find OSM IDs for a chunk of POIs.
-    
     Args:
         city_id: ID of the city
-        poi_chunk: Chunk of POI objects
+        pois: POI objects needing OSM IDs
         pbf_file: Path to the OSM PBF file
-        
+        bounding_box: Extent of the city's POIs to load OSM data for
+
     Returns:
-        Dictionary with processing results
+        Dictionary with processing results, including the achieved speed-up
     """
     logger = get_run_logger()
-    logger.info(f"Processing chunk of {len(poi_chunk)} POIs for city {city_id}")
-    
+    max_workers = settings.OSM_MATCH_WORKERS or default_worker_count()
+    logger.info(f"Matching {len(pois)} POIs for city {city_id} on up to {max_workers} processes")
+
     try:
-        # Call the task function
         find_osm_async = sync_to_async(find_osm_ids_local, thread_sensitive=True)
-        result = await find_osm_async(city_id, poi_chunk, pbf_file)
-        
-        logger.info(f"Processed chunk: {result.get('processed_count', 0)} POIs, "
-                   f"found {result.get('updated_count', 0)} OSM IDs")
-        
+        result = await find_osm_async(city_id, pois, pbf_file, bounding_box, max_workers=max_workers)
+
+        logger.info(f"Processed {result.get('processed_count', 0)} POIs, "
+                    f"found {result.get('updated_count', 0)} OSM IDs "
+                    f"({result.get('speedup', 1.0)}x speed-up on {result.get('workers', 1)} workers)")
+
         return result
     except Exception as e:
-        logger.error(f"Error processing POI chunk: {str(e)}")
+        logger.error(f"Error matching POIs to OSM: {str(e)}")
         return {
-            'status': 'error', 
+            'status': 'error',
             'message': str(e),
             'processed_count': 0,
             'updated_count': 0
         }
 
 
-async def _prepare_osm_chunks(name: str) -> List[List]:
-    """
-    Get POIs that need OSM IDs and split them into chunks for parallel processing.
-    
-    Args:
-        name: Name of the city
-        
-    Returns:
-        List of POI chunks ready for parallel processing
-    """
-    logger = get_run_logger()
-    
-    try:
-        # Get POIs that need OSM IDs
-        pois = await _get_pois_needing_osm_ids(name)
-        
-        if not pois:
-            logger.info(f"No POIs need OSM IDs in {name}")
-            return []
-        
-        # Split POIs into chunks of 100
-        poi_chunks = _chunk_pois(pois, chunk_size=100)
-        
-        logger.info(f"Prepared {len(pois)} POIs in {len(poi_chunks)} chunks of up to 100 for parallel processing")
-        
-        return poi_chunks
-        
-    except Exception as e:
-        logger.error(f"Error preparing OSM chunks for {name}: {str(e)}")
-        return []
-
-
 async def _auto_merge_duplicates(name: str, result: Dict[str, Any]) -> Dict[str, Any]:
     """
     Automatically merge duplicate POIs using best-value logic.
@@ -548,7 +550,8 @@ async def _auto_merge_duplicates(name: str, result: Dict[str, Any]) -> Dict[str,
         result['auto_merge'] = merge_result
 
         logger.info(f"Auto-merge for {name}: {merge_result.get('status', 'unknown')}, "
-                   f"Merged {merge_result.get('merged_count', 0)}/{merge_result.get('total_pairs', 0)} pairs")
+                   f"Merged {merge_result.get('merged_count', 0)} POIs in {merge_result.get('cluster_count', 0)} clusters "
+                   f"from {merge_result.get('total_pairs', 0)} pairs")
     except City.DoesNotExist:
         logger.error(f"City {name} not found in database for auto-merge")
         result['auto_merge'] = {'status': 'error', 'message': f"City {name} not found in database"}
@@ -631,21 +634,29 @@ def _format_geocoding_confirmation_message(name: str, result: Dict[str, Any]) ->
     merge_msg = ""
     if result.get('auto_merge', {}).get('status') == 'success':
         merged = result.get('auto_merge', {}).get('merged_count', 0)
+        clusters = result.get('auto_merge', {}).get('cluster_count', 0)
         total = result.get('auto_merge', {}).get('total_pairs', 0)
         errors = len(result.get('auto_merge', {}).get('errors', []))
-        merge_msg = f"Auto-merged {merged} out of {total} duplicate pairs ({errors} errors)."
+        merge_msg = f"Merged {merged} POIs in {clusters} clusters from {total} duplicate pairs ({errors} errors)."
 
     # OSM ID info
     osm_msg = ""
     if result.get('osm_ids', {}).get('status') == 'success':
         updated = result.get('osm_ids', {}).get('updated_count', 0)
         processed = result.get('osm_ids', {}).get('processed_count', 0)
-        chunks = result.get('osm_ids', {}).get('successful_chunks', 0)
-        total_chunks = result.get('osm_ids', {}).get('chunks', 0)
-        osm_msg = f"Found OSM IDs for {updated} out of {processed} POIs using {chunks}/{total_chunks} parallel chunks."
+        workers = result.get('osm_ids', {}).get('workers', 1)
+        speedup = result.get('osm_ids', {}).get('speedup', 1.0)
+        peak_memory = result.get('osm_ids', {}).get('peak_memory_mb', 0)
+        osm_msg = (f"Found OSM IDs for {updated} out of {processed} POIs using {workers} worker processes "
+                   f"({speedup}x speed-up, peak memory {peak_memory} MB).")
     elif result.get('osm_ids', {}).get('status') == 'skipped':
         osm_msg = "OSM ID lookup skipped (no PBF file provided)."
 
+    if result.get('osm_details', {}).get('status') == 'success':
+        filled = result.get('osm_details', {}).get('filled', {})
+        osm_msg += (f" Filled from OSM tags: {filled.get('hours', 0)} hours, {filled.get('phone', 0)} phone numbers, "
+                    f"{filled.get('website', 0)} websites, {filled.get('address', 0)} addresses.")
+
     message = (f"Geocoding, deduplication, and OSM matching complete for {name}.\n\n"
               f"{city_msg}\n"
               f"{address_msg}\n"
@@ -729,8 +740,10 @@ async def import_city(name: str, pbf_file: str = None, max_depth: int = 2) -> Di
         # Step 4: Geocode city coordinates
         result = await _geocode_city(name, result)
         
-        # Step 5: Geocode missing addresses for POIs
-        result = await _geocode_missing_addresses(name, result)
+        # Step 5: Geocode missing addresses for POIs. With a PBF file this waits until
+        # OSM details have been filled, so Mapbox is only asked for what OSM lacks.
+        if not pbf_file:
+            result = await _geocode_missing_addresses(name, result)
         
         # Step 6: Geocode missing coordinates for POIs
         result = await _geocode_missing_coordinates(name, result)
@@ -749,55 +762,39 @@ async def import_city(name: str, pbf_file: str = None, max_depth: int = 2) -> Di
             get_city = sync_to_async(City.objects.get, thread_sensitive=True)
             city = await get_city(name=name)
             
-            # Prepare POI chunks for parallel processing
-            poi_chunks = await _prepare_osm_chunks(name)
+            # Get POIs needing OSM IDs
+            pois = await _get_pois_needing_osm_ids(name)
             
-            if poi_chunks:
-                # Submit tasks in parallel
-                futures = []
-                for chunk in poi_chunks:
-                    future = find_osm_ids_chunk.submit(city.id, chunk, pbf_file)
-                    futures.append(future)
-                
-                # Wait for all futures to complete
-                wait(futures)
-                
-                # Aggregate results
-                total_processed = 0
-                total_updated = 0
-                successful_chunks = 0
-                errors = []
-                
-                for i, future in enumerate(futures):
-                    try:
-                        chunk_result = future.result()
-                        if chunk_result and chunk_result.get('status') == 'success':
-                            successful_chunks += 1
-                            total_processed += chunk_result.get('processed_count', 0)
-                            total_updated += chunk_result.get('updated_count', 0)
-                        else:
-                            error_msg = chunk_result.get('message', 'Unknown error') if chunk_result else 'Task failed'
-                            errors.append(f"Chunk {i+1}: {error_msg}")
-                    except Exception as e:
-                        logger.error(f"Chunk {i+1} failed with exception: {str(e)}")
-                        errors.append(f"Chunk {i+1}: {str(e)}")
+            if pois:
+                # Load OSM data for the extent of all POIs once
+                bounding_box = bounding_box_from_points(
+                    [poi.latitude for poi in pois],
+                    [poi.longitude for poi in pois]
+                )
+
+                osm_result = await find_osm_ids_parallel(city.id, pois, pbf_file, bounding_box)
                 
                 result['osm_ids'] = {
-                    'status': 'success' if successful_chunks > 0 else 'error',
-                    'message': f'Processed {len(poi_chunks)} chunks, {successful_chunks} successful',
-                    'total_pois': sum(len(chunk) for chunk in poi_chunks),
-                    'chunks': len(poi_chunks),
-                    'successful_chunks': successful_chunks,
-                    'processed_count': total_processed,
-                    'updated_count': total_updated,
-                    'errors': errors
+                    **osm_result,
+                    'total_pois': len(pois),
+                    'bounding_box': bounding_box,
                 }
                 
-                logger.info(f"OSM ID lookup complete for {name}: "
-                           f"{total_updated}/{total_processed} POIs matched, "
-                           f"{successful_chunks}/{len(poi_chunks)} chunks successful")
+                if osm_result.get('status') == 'success':
+                    logger.info(f"OSM ID lookup complete for {name}: "
+                               f"{osm_result.get('updated_count', 0)}/{osm_result.get('processed_count', 0)} POIs matched, "
+                               f"{osm_result.get('speedup', 1.0)}x speed-up on {osm_result.get('workers', 1)} workers")
+                else:
+                    logger.error(f"OSM ID lookup failed for {name}: {osm_result.get('message')}")
             else:
                 result['osm_ids'] = {'status': 'success', 'message': 'No POIs need OSM IDs'}
+
+            # Fill hours, phone, website and address from the matched OSM features
+            result = await _fill_details_from_osm(name, pbf_file, result)
+
+            # Geocode the addresses OSM could not provide (step 5, deferred), trying
+            # nearby OSM address points before Mapbox
+            result = await _geocode_missing_addresses(name, result, pbf_file)
         else:
             logger.info("No PBF file provided, skipping OSM ID lookup")
             result['osm_ids'] = {'status': 'skipped', 'message': 'No PBF file provided'}